@@ -1,307 +1,512 @@
-def run_actions(engine, task):
-    """
-    Execute ALL 37 Playwright operations with comprehensive error handling.
-    """
-    for step_idx, step in enumerate(task, 1):
-        try:
-            action = step.get("action")
-            if not action:
-                print(f"\n[Step {step_idx}] Missing 'action' key: {step}")
-                continue
-                
-            handlers = {
-                # === CORE 22 OPERATIONS ===
-                "open": handle_open,
-                "click": handle_click,
-                "type": handle_type,
-                "wait": handle_wait,
-                "wait_seconds": handle_wait_seconds,
-                "wait_for": handle_wait_for,
-                "scroll_to": handle_scroll_to,
-                "scroll_pixels": handle_scroll_pixels,
-                "hover": handle_hover,
-                "double_click": handle_double_click,
-                "right_click": handle_right_click,
-                "drag_drop": handle_drag_drop,
-                "select_option": handle_select_option,
-                "clear": handle_clear,
-                "screenshot": handle_screenshot,
-                "switch_window": handle_switch_window,
-                "back": handle_back,
-                "forward": handle_forward,
-                "refresh": handle_refresh,
-                "close": handle_close,
-                "get_text": handle_get_text,
-                "get_attribute": handle_get_attribute,
-                "assert_visible": handle_assert_visible,
-                "assert_text": handle_assert_text,
-                
-                # === PLAYWRIGHT SUPERPOWERS (15 NEW) ===
-                "mock_api": handle_mock_api,
-                "emulate_mobile": handle_emulate_mobile,
-                "expect_download": handle_expect_download,
-                "pdf": handle_pdf,
-                "start_tracing": handle_start_tracing,
-                "stop_tracing": handle_stop_tracing,
-                "set_geolocation": handle_set_geolocation,
-                "grant_permissions": handle_grant_permissions,
-                "clear_cookies": handle_clear_cookies,
-                "record_video": handle_record_video,
-                "expect_screenshot": handle_expect_screenshot,
-                "intercept_request": handle_intercept_request,
-                "wait_for_response": handle_wait_for_response,
-                "wait_for_request": handle_wait_for_request,
-                "set_download_path": handle_set_download_path
-            }
-            
-            if action in handlers:
-                handlers[action](engine, step, step_idx)
-            else:
-                print(f"\n[Step {step_idx}] Unknown action '{action}': {step}")
-                
-        except Exception as e:
-            print(f"\n❌ Automation failed at step {step_idx}:")
-            print(f"   Action: {step}")
-            print(f"   Error: {str(e)}")
-            print(f"   Type: {type(e).__name__}")
-            break
-    
-    print("\n✅ Automation sequence completed!")
-
-# === CORE 22 HANDLERS ===
-def handle_open(engine, step, step_idx):
-    url = step.get("url")
-    if not url: raise ValueError("Missing 'url'")
-    print(f"[Step {step_idx}] 🌐 Opening: {url}")
-    engine.open(url)
-
-def handle_click(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] 🖱️ Clicking: {selector}")
-    engine.click(selector)
-
-def handle_type(engine, step, step_idx):
-    selector = step.get("selector")
-    value = step.get("value", "")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] ⌨️ Typing '{value[:20]}...' into: {selector}")
-    engine.type(selector, value)
-
-def handle_wait(engine, step, step_idx):
-    seconds = step.get("seconds", 1)
-    print(f"[Step {step_idx}] ⏳ Waiting {seconds}s...")
-    engine.wait_seconds(seconds)
-
-def handle_wait_seconds(engine, step, step_idx):
-    seconds = step.get("seconds", 1)
-    print(f"[Step {step_idx}] ⏳ Waiting {seconds}s...")
-    engine.wait_seconds(seconds)
-
-def handle_wait_for(engine, step, step_idx):
-    selector = step.get("selector")
-    timeout = step.get("timeout", 10)
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] ⌛ Waiting for: {selector}")
-    engine.wait_for_selector(selector, timeout)
-
-def handle_scroll_to(engine, step, step_idx):
-    selector = step.get("selector")
-    pixels = step.get("pixels")
-    if selector:
-        print(f"[Step {step_idx}] 📜 Scrolling to: {selector}")
-        engine.scroll_to_selector(selector)
-    elif pixels:
-        print(f"[Step {step_idx}] 📜 Scrolling {pixels}px")
-        engine.scroll_pixels(pixels)
-    else:
-        raise ValueError("Provide 'selector' or 'pixels'")
-
-def handle_scroll_pixels(engine, step, step_idx):
-    pixels = step.get("pixels")
-    if pixels is None: raise ValueError("Missing 'pixels'")
-    print(f"[Step {step_idx}] 📜 Scrolling {pixels}px")
-    engine.scroll_pixels(pixels)
-
-def handle_hover(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] 🖱️ Hovering: {selector}")
-    engine.hover(selector)
-
-def handle_double_click(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] 🖱️ Double clicking: {selector}")
-    engine.double_click(selector)
-
-def handle_right_click(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] 🖱️ Right clicking: {selector}")
-    engine.right_click(selector)
-
-def handle_drag_drop(engine, step, step_idx):
-    source = step.get("source")
-    target = step.get("target")
-    if not source or not target: raise ValueError("Missing 'source' or 'target'")
-    print(f"[Step {step_idx}] 🖱️ Dragging {source} → {target}")
-    engine.drag_drop(source, target)
-
-def handle_select_option(engine, step, step_idx):
-    selector = step.get("selector")
-    option = step.get("option")
-    method = step.get("method", "text")
-    if not selector or not option: raise ValueError("Missing 'selector' or 'option'")
-    print(f"[Step {step_idx}] 📋 Selecting '{option}' ({method}): {selector}")
-    engine.select_option(selector, option, method)
-
-def handle_clear(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] 🗑️ Clearing: {selector}")
-    engine.clear(selector)
-
-def handle_screenshot(engine, step, step_idx):
-    filename = step.get("filename", f"screenshot_step_{step_idx}.png")
-    print(f"[Step {step_idx}] 📸 Screenshot: {filename}")
-    path = engine.screenshot(filename)
-    print(f"📁 Saved: {path}")
-
-def handle_switch_window(engine, step, step_idx):
-    window = step.get("window", "next")
-    print(f"[Step {step_idx}] 🔄 Switching window: {window}")
-    engine.switch_window(window)
-
-def handle_back(engine, step, step_idx):
-    print(f"[Step {step_idx}] ⬅️ Going back")
-    engine.back()
-
-def handle_forward(engine, step, step_idx):
-    print(f"[Step {step_idx}] ➡️ Going forward")
-    engine.forward()
-
-def handle_refresh(engine, step, step_idx):
-    print(f"[Step {step_idx}] 🔄 Refreshing page")
-    engine.refresh()
-
-def handle_close(engine, step, step_idx):
-    print(f"[Step {step_idx}] ❌ Closing window")
-    engine.close()
-
-def handle_get_text(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    text = engine.get_text(selector)
-    print(f"[Step {step_idx}] 📄 Text: '{text[:50]}...' ({selector})")
-
-def handle_get_attribute(engine, step, step_idx):
-    selector = step.get("selector")
-    attr = step.get("attribute", "value")
-    if not selector: raise ValueError("Missing 'selector'")
-    value = engine.get_attribute(selector, attr)
-    print(f"[Step {step_idx}] 🔍 '{attr}': {value} ({selector})")
-
-def handle_assert_visible(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    visible = engine.is_visible(selector)
-    print(f"[Step {step_idx}] 👁️ '{selector}' = {'✅ VISIBLE' if visible else '❌ HIDDEN'}")
-    if not visible: raise AssertionError(f"Element not visible: {selector}")
-
-def handle_assert_text(engine, step, step_idx):
-    selector = step.get("selector")
-    expected = step.get("expected")
-    if not selector or not expected: raise ValueError("Missing 'selector' or 'expected'")
-    actual = engine.get_text(selector)
-    print(f"[Step {step_idx}] ✅ Text: '{actual[:30]}...' == '{expected}'")
-    if expected not in actual: raise AssertionError(f"Expected '{expected}', got '{actual}'")
-
-# === PLAYWRIGHT SUPERPOWERS HANDLERS (15 NEW) ===
-def handle_mock_api(engine, step, step_idx):
-    url_pattern = step.get("url_pattern")
-    response_data = step.get("response_data", {})
-    if not url_pattern: raise ValueError("Missing 'url_pattern'")
-    print(f"[Step {step_idx}] 🌐 Mocking API: {url_pattern}")
-    engine.mock_api(url_pattern, response_data)
-
-def handle_emulate_mobile(engine, step, step_idx):
-    device = step.get("device_name", "iPhone 12")
-    print(f"[Step {step_idx}] 📱 Emulating: {device}")
-    engine.emulate_mobile(device)
-
-def handle_expect_download(engine, step, step_idx):
-    selector = step.get("selector")
-    if not selector: raise ValueError("Missing 'selector'")
-    print(f"[Step {step_idx}] 📥 Expecting download from: {selector}")
-    filename = engine.expect_download(selector)
-    print(f"📁 Downloaded: {filename}")
-
-def handle_pdf(engine, step, step_idx):
-    filename = step.get("filename")
-    print(f"[Step {step_idx}] 📄 Generating PDF: {filename or 'auto'}")
-    path = engine.pdf(filename)
-    print(f"📁 PDF saved: {path}")
-
-def handle_start_tracing(engine, step, step_idx):
-    name = step.get("name", "trace")
-    print(f"[Step {step_idx}] 📹 Starting trace: {name}")
-    engine.start_tracing(name)
-
-def handle_stop_tracing(engine, step, step_idx):
-    filename = step.get("filename")
-    print(f"[Step {step_idx}] ⏹️ Stopping trace: {filename or 'auto'}")
-    path = engine.stop_tracing(filename)
-    print(f"📁 Trace saved: {path}")
-
-def handle_set_geolocation(engine, step, step_idx):
-    lat = step.get("latitude")
-    lon = step.get("longitude")
-    if lat is None or lon is None: raise ValueError("Missing 'latitude' or 'longitude'")
-    print(f"[Step {step_idx}] 🌍 Setting GPS: {lat}, {lon}")
-    engine.set_geolocation(lat, lon)
-
-def handle_grant_permissions(engine, step, step_idx):
-    perms = step.get("permissions", ["geolocation"])
-    print(f"[Step {step_idx}] 🔓 Granting permissions: {perms}")
-    engine.grant_permissions(perms)
-
-def handle_clear_cookies(engine, step, step_idx):
-    print(f"[Step {step_idx}] 🍪 Clearing cookies")
-    engine.clear_cookies()
-
-def handle_record_video(engine, step, step_idx):
-    output_dir = step.get("output_dir", "videos")
-    print(f"[Step {step_idx}] 🎥 Recording video: {output_dir}")
-    engine.record_video(output_dir)
-
-def handle_expect_screenshot(engine, step, step_idx):
-    selector = step.get("selector")
-    filename = step.get("filename")
-    if not selector or not filename: raise ValueError("Missing 'selector' or 'filename'")
-    print(f"[Step {step_idx}] 👁️ Visual test: {selector}")
-    engine.expect_screenshot(selector, filename)
-
-def handle_intercept_request(engine, step, step_idx):
-    url_pattern = step.get("url_pattern")
-    action = step.get("action", "abort")
-    if not url_pattern: raise ValueError("Missing 'url_pattern'")
-    print(f"[Step {step_idx}] 🚫 Intercepting: {url_pattern} ({action})")
-    engine.intercept_request(url_pattern, action)
-
-def handle_wait_for_response(engine, step, step_idx):
-    url_predicate = step.get("url")
-    if not url_predicate: raise ValueError("Missing 'url'")
-    print(f"[Step {step_idx}] 🌐 Waiting response: {url_predicate}")
-    engine.wait_for_response(url_predicate)
-
-def handle_wait_for_request(engine, step, step_idx):
-    url_predicate = step.get("url")
-    if not url_predicate: raise ValueError("Missing 'url'")
-    print(f"[Step {step_idx}] 🌐 Waiting request: {url_predicate}")
-    engine.wait_for_request(url_predicate)
-
-def handle_set_download_path(engine, step, step_idx):
-    path = step.get("path", "downloads")
-    print(f"[Step {step_idx}] 📁 Download path: {path}")
-    engine.set_download_path(path)
+from checkpoints import CheckpointStore
+from extraction import open_sink
+from metrics import REGISTRY, hooks_for, new_timings
+from retry_policy import Deadline
+from run_result import RunResult, value_key
+from task_compiler import compile_task, WAIT_ACTIONS
+import time
+import uuid
+
+
+def run_actions(engine, task, wait_mode="fixed", metrics=REGISTRY, checkpoint_after=(),
+                resume=False, checkpoints=None, checkpoint_key=None, task_deadline=None):
+    """
+    Run a TASK step by step through the HANDLERS table below, with
+    comprehensive error handling.
+    Returns a RunResult: last completed step, the failure (if any) and every
+    value extracted by get_text/get_attribute (keyed by step "name" or step_<n>).
+
+    `task` is a TASK list or an ExecutionPlan from compile_task(); the whole task
+    is validated before the first step runs (TaskValidationError on any bad step).
+    wait_mode="smart" treats wait/wait_seconds as an upper bound and returns early
+    once the page is ready (next step's selector visible, or DOM stable).
+    Steps carrying "skip_if_session": <name> are skipped when the engine's context
+    was started from (or loaded) that storage snapshot.
+    Steps with "checkpoint": True (or listed in checkpoint_after) save URL, storage
+    state and values so far; resume=True restarts after the last checkpoint.
+    task_deadline (seconds) caps the whole run; later retries get shrinking
+    timeouts and a step's "retry" dict overrides the engine's RetryPolicy.
+    With engine.trace_recorder set, the run is traced and the trace is kept
+    only on failure (or when sampled) - see trace_recorder.TraceRecorder.
+    A http_engine.HybridEngine runs the plan's leading static steps
+    (http_engine.http_prefix) without a browser.
+    Engines with begin_task()/end_task() clean up after the previous task
+    first (extra pages, task routes) and report a resource sample to `metrics`.
+    Every step is recorded into `metrics` (wall/Playwright/sleep/backoff time,
+    attempts, failure type); hooks from metrics.add_hook() / engine.hooks fire
+    around each step.
+    """
+    if wait_mode not in ("fixed", "smart"): raise ValueError(f"Unknown wait_mode '{wait_mode}'")
+    plan = compile_task(task)
+    result = RunResult(total_steps=len(plan))
+    run_id = uuid.uuid4().hex
+    hooks = hooks_for(engine)
+    checkpoint_after = set(checkpoint_after)
+    checkpoint_key = checkpoint_key or plan.digest[:16]
+    if checkpoints is None and (resume or checkpoint_after or any(c.step.get("checkpoint") for c in plan)):
+        checkpoints = CheckpointStore()
+    run_started = time.perf_counter()
+    deadline = Deadline(task_deadline) if task_deadline else None
+    begin_step = getattr(engine, "begin_step", None)
+    route_step = getattr(engine, "route_step", None)
+    recorder = getattr(engine, "trace_recorder", None)
+    begin_task = getattr(engine, "begin_task", None)
+    if begin_task is not None:
+        # Close what the previous task left open, sample resources, recycle past limits
+        sample = begin_task()
+        if metrics and sample:
+            metrics.record_resources(sample)
+
+    resume_after = 0
+    if resume:
+        saved = checkpoints.load(checkpoint_key)
+        if saved:
+            resume_after = saved["step"]
+            result.resumed_from = resume_after
+            result.last_completed_step = resume_after
+            result.values.update(saved["values"])
+            print(f"\n⏩ Resuming after step {resume_after} at {saved['url']}")
+            engine.restore_checkpoint(saved["url"], saved["storage_state"])
+        else:
+            print("\n⏩ No checkpoint to resume from - starting at step 1")
+
+    waited_budget = 0.0
+    waited_actual = 0.0
+    run_stats = getattr(engine, "run_stats", ())
+    for stats in run_stats:
+        stats.reset()
+    if recorder is not None:
+        recorder.begin(run_id)
+    for compiled in plan:
+        step_idx = compiled.index
+        step = compiled.step
+        if step_idx <= resume_after:
+            continue
+        skip_for = step.get("skip_if_session")
+        if skip_for and getattr(engine, "active_snapshot", None) == skip_for:
+            print(f"[Step {step_idx}] ⏭️ Skipped - session '{skip_for}' restored")
+            result.last_completed_step = step_idx
+            continue
+        engine.timings = new_timings()
+        if begin_step is not None:
+            begin_step(compiled.action, step.get("retry"), deadline)
+        for hook in hooks:
+            hook.before_step(engine, compiled)
+        error = None
+        started = time.perf_counter()
+        try:
+            if route_step is not None:
+                # Hybrid engines pick HTTP or browser (starting it if needed) per step
+                route_step(compiled, plan)
+            if compiled.action in WAIT_ACTIONS and (wait_mode == "smart" or step.get("until")):
+                step = compiled.smart_step
+                compiled.handler(engine, step, step_idx)
+                waited_budget += step.get("seconds", 1)
+                waited_actual += time.perf_counter() - started
+            else:
+                value = compiled.handler(engine, step, step_idx)
+                if value is not None:
+                    result.values[value_key(step, step_idx)] = value
+
+        except Exception as e:
+            error = e
+            result.fail(step_idx, e)
+            print(f"\n❌ Automation failed at step {step_idx}:")
+            print(f"   Action: {dict(step)}")
+            print(f"   Error: {str(e)}")
+            print(f"   Type: {type(e).__name__}")
+
+        wall = time.perf_counter() - started
+        record = metrics.record_step(run_id, compiled, engine.timings, wall, error) if metrics else None
+        for hook in hooks:
+            hook.after_step(engine, compiled, record)
+        if error is not None:
+            break
+        result.last_completed_step = step_idx
+        if checkpoints is not None and (step.get("checkpoint") or step_idx in checkpoint_after):
+            url, storage_state = engine.checkpoint_state()
+            path = checkpoints.save(checkpoint_key, step_idx, url, storage_state, result.values)
+            print(f"💾 Checkpoint after step {step_idx}: {path}")
+
+    result.elapsed_seconds = time.perf_counter() - run_started
+    end_task = getattr(engine, "end_task", None)
+    if end_task is not None:
+        end_task()
+    if recorder is not None:
+        artifact = recorder.finish(result, plan)
+        if artifact:
+            result.artifacts.append(artifact)
+    if result.passed and checkpoints is not None:
+        checkpoints.clear(checkpoint_key)
+
+    if waited_budget:
+        print(f"\n⏱️ Smart waits: {waited_actual:.1f}s of {waited_budget:.1f}s budget "
+              f"(saved {max(waited_budget - waited_actual, 0):.1f}s)")
+    for stats in run_stats:
+        line = stats.summary()
+        if line:
+            print(line)
+    if result.passed:
+        print("\n✅ Automation sequence completed!")
+    else:
+        print(f"\n❌ Automation stopped at step {result.failed_step}/{result.total_steps} "
+              f"(last completed: {result.last_completed_step})")
+    return result
+
+# === CORE 22 HANDLERS ===
+def handle_open(engine, step, step_idx):
+    url = step.get("url")
+    wait_until = step.get("wait_until", "networkidle")
+    if not url: raise ValueError("Missing 'url'")
+    print(f"[Step {step_idx}] 🌐 Opening: {url}")
+    engine.open(url, wait_until)
+
+def handle_click(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Clicking: {selector}")
+    engine.click(selector)
+
+def handle_type(engine, step, step_idx):
+    selector = step.get("selector")
+    value = step.get("value", "")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] ⌨️ Typing '{value[:20]}...' into: {selector}")
+    engine.type(selector, value)
+
+def handle_wait(engine, step, step_idx):
+    """wait and wait_seconds - a fixed sleep, or an upper bound when the step has "until" """
+    seconds = step.get("seconds", 1)
+    until = step.get("until")
+    if until:
+        print(f"[Step {step_idx}] ⏳ Waiting up to {seconds}s for {until}...")
+        engine.wait_until_ready(seconds, until, step.get("selector"))
+    else:
+        print(f"[Step {step_idx}] ⏳ Waiting {seconds}s...")
+        engine.wait_seconds(seconds)
+
+def handle_wait_for(engine, step, step_idx):
+    selector = step.get("selector")
+    timeout = step.get("timeout", 10)
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] ⌛ Waiting for: {selector}")
+    engine.wait_for_selector(selector, timeout * 1000)  # step timeout is in seconds
+
+def handle_scroll_to(engine, step, step_idx):
+    selector = step.get("selector")
+    pixels = step.get("pixels")
+    if selector:
+        print(f"[Step {step_idx}] 📜 Scrolling to: {selector}")
+        engine.scroll_to_selector(selector)
+    elif pixels:
+        print(f"[Step {step_idx}] 📜 Scrolling {pixels}px")
+        engine.scroll_pixels(pixels)
+    else:
+        raise ValueError("Provide 'selector' or 'pixels'")
+
+def handle_scroll_pixels(engine, step, step_idx):
+    pixels = step.get("pixels")
+    if pixels is None: raise ValueError("Missing 'pixels'")
+    print(f"[Step {step_idx}] 📜 Scrolling {pixels}px")
+    engine.scroll_pixels(pixels)
+
+def handle_hover(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Hovering: {selector}")
+    engine.hover(selector)
+
+def handle_double_click(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Double clicking: {selector}")
+    engine.double_click(selector)
+
+def handle_right_click(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Right clicking: {selector}")
+    engine.right_click(selector)
+
+def handle_drag_drop(engine, step, step_idx):
+    source = step.get("source")
+    target = step.get("target")
+    if not source or not target: raise ValueError("Missing 'source' or 'target'")
+    print(f"[Step {step_idx}] 🖱️ Dragging {source} → {target}")
+    engine.drag_drop(source, target)
+
+def handle_select_option(engine, step, step_idx):
+    selector = step.get("selector")
+    option = step.get("option")
+    method = step.get("method", "text")
+    if not selector or not option: raise ValueError("Missing 'selector' or 'option'")
+    print(f"[Step {step_idx}] 📋 Selecting '{option}' ({method}): {selector}")
+    engine.select_option(selector, option, method)
+
+def handle_clear(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🗑️ Clearing: {selector}")
+    engine.clear(selector)
+
+def handle_screenshot(engine, step, step_idx):
+    filename = step.get("filename", f"screenshot_step_{step_idx}.png")
+    print(f"[Step {step_idx}] 📸 Screenshot: {filename}")
+    path = engine.screenshot(filename, step.get("format"), step.get("quality"),
+                             step.get("selector"), step.get("full_page", False))
+    print(f"📁 Saving: {path}")
+
+def handle_switch_window(engine, step, step_idx):
+    window = step.get("window", "next")
+    print(f"[Step {step_idx}] 🔄 Switching window: {window}")
+    engine.switch_window(window)
+
+def handle_back(engine, step, step_idx):
+    print(f"[Step {step_idx}] ⬅️ Going back")
+    engine.back()
+
+def handle_forward(engine, step, step_idx):
+    print(f"[Step {step_idx}] ➡️ Going forward")
+    engine.forward()
+
+def handle_refresh(engine, step, step_idx):
+    print(f"[Step {step_idx}] 🔄 Refreshing page")
+    engine.refresh()
+
+def handle_close(engine, step, step_idx):
+    print(f"[Step {step_idx}] ❌ Closing window")
+    engine.close()
+
+def handle_get_text(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    text = engine.get_text(selector)
+    print(f"[Step {step_idx}] 📄 Text: '{text[:50]}...' ({selector})")
+    return text
+
+def handle_get_attribute(engine, step, step_idx):
+    selector = step.get("selector")
+    attr = step.get("attribute", "value")
+    if not selector: raise ValueError("Missing 'selector'")
+    value = engine.get_attribute(selector, attr)
+    print(f"[Step {step_idx}] 🔍 '{attr}': {value} ({selector})")
+    return value
+
+def handle_extract(engine, step, step_idx):
+    fields = step.get("fields")
+    rows = step.get("rows")
+    sink_path = step.get("sink")
+    if not fields: raise ValueError("Missing 'fields'")
+    print(f"[Step {step_idx}] 🧾 Extracting {len(fields)} fields"
+          f"{f' per {rows}' if rows else ''}{f' → {sink_path}' if sink_path else ''}")
+    keep = step.get("return_records", not sink_path)
+    records = []
+    sink = open_sink(sink_path, fields, step.get("append", False)) if sink_path else None
+    count = 0
+    try:
+        for batch in engine.extract(fields, rows, step.get("batch_size", 500)):
+            count += len(batch)
+            if sink:
+                sink.write(batch)
+            if keep:
+                records.extend(batch)
+    finally:
+        if sink:
+            sink.close()
+    print(f"📦 Extracted {count} record(s)")
+    if not rows and keep:
+        return records[0] if records else None
+    if keep:
+        return records
+    return {"sink": sink_path, "records": count}
+
+def handle_assert_visible(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    visible = engine.is_visible(selector)
+    print(f"[Step {step_idx}] 👁️ '{selector}' = {'✅ VISIBLE' if visible else '❌ HIDDEN'}")
+    if not visible: raise AssertionError(f"Element not visible: {selector}")
+
+def handle_assert_text(engine, step, step_idx):
+    selector = step.get("selector")
+    expected = step.get("expected")
+    if not selector or not expected: raise ValueError("Missing 'selector' or 'expected'")
+    actual = engine.get_text(selector)
+    print(f"[Step {step_idx}] ✅ Text: '{actual[:30]}...' == '{expected}'")
+    if expected not in actual: raise AssertionError(f"Expected '{expected}', got '{actual}'")
+
+# === PLAYWRIGHT SUPERPOWERS HANDLERS (15 NEW) ===
+def handle_mock_api(engine, step, step_idx):
+    url_pattern = step.get("url_pattern")
+    response_data = step.get("response_data", {})
+    status = step.get("status", 200)
+    if not url_pattern: raise ValueError("Missing 'url_pattern'")
+    print(f"[Step {step_idx}] 🌐 Mocking API: {url_pattern}")
+    engine.mock_api(url_pattern, response_data, status)
+
+def handle_emulate_mobile(engine, step, step_idx):
+    device = step.get("device_name", "iPhone 12")
+    print(f"[Step {step_idx}] 📱 Emulating: {device}")
+    engine.emulate_mobile(device)
+
+def handle_expect_download(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 📥 Expecting download from: {selector}")
+    filename = engine.expect_download(selector)
+    print(f"📁 Downloaded: {filename}")
+    return filename
+
+def handle_pdf(engine, step, step_idx):
+    filename = step.get("filename")
+    print(f"[Step {step_idx}] 📄 Generating PDF: {filename or 'auto'}")
+    path = engine.pdf(filename)
+    print(f"📁 PDF saved: {path}")
+
+def handle_start_tracing(engine, step, step_idx):
+    name = step.get("name", "trace")
+    print(f"[Step {step_idx}] 📹 Starting trace: {name}")
+    engine.start_tracing(name)
+
+def handle_stop_tracing(engine, step, step_idx):
+    filename = step.get("filename")
+    print(f"[Step {step_idx}] ⏹️ Stopping trace: {filename or 'auto'}")
+    path = engine.stop_tracing(filename)
+    print(f"📁 Trace saved: {path}")
+
+def handle_set_geolocation(engine, step, step_idx):
+    lat = step.get("latitude")
+    lon = step.get("longitude")
+    if lat is None or lon is None: raise ValueError("Missing 'latitude' or 'longitude'")
+    print(f"[Step {step_idx}] 🌍 Setting GPS: {lat}, {lon}")
+    engine.set_geolocation(lat, lon)
+
+def handle_grant_permissions(engine, step, step_idx):
+    perms = step.get("permissions", ["geolocation"])
+    print(f"[Step {step_idx}] 🔓 Granting permissions: {perms}")
+    engine.grant_permissions(perms)
+
+def handle_clear_cookies(engine, step, step_idx):
+    print(f"[Step {step_idx}] 🍪 Clearing cookies")
+    engine.clear_cookies()
+
+def handle_record_video(engine, step, step_idx):
+    output_dir = step.get("output_dir", "videos")
+    print(f"[Step {step_idx}] 🎥 Recording video: {output_dir}")
+    engine.record_video(output_dir)
+
+def handle_expect_screenshot(engine, step, step_idx):
+    selector = step.get("selector")
+    filename = step.get("filename")
+    if not selector or not filename: raise ValueError("Missing 'selector' or 'filename'")
+    print(f"[Step {step_idx}] 👁️ Visual test: {selector}")
+    engine.expect_screenshot(selector, filename, step.get("tolerance", 10),
+                             step.get("max_diff_ratio", 0.001), step.get("ignore", ()))
+
+def handle_intercept_request(engine, step, step_idx):
+    url_pattern = step.get("url_pattern")
+    mode = step.get("mode", "abort")  # "action" is the step's own key
+    if not url_pattern: raise ValueError("Missing 'url_pattern'")
+    print(f"[Step {step_idx}] 🚫 Intercepting: {url_pattern} ({mode})")
+    engine.intercept_request(url_pattern, mode)
+
+def handle_save_storage_state(engine, step, step_idx):
+    name = step.get("name")
+    if not name: raise ValueError("Missing 'name'")
+    print(f"[Step {step_idx}] 🔑 Saving session snapshot: {name}")
+    path = engine.save_storage_state(name, step.get("ttl"), step.get("guard_selector"))
+    print(f"📁 Snapshot saved: {path}")
+
+def handle_load_storage_state(engine, step, step_idx):
+    name = step.get("name")
+    if not name: raise ValueError("Missing 'name'")
+    restored = engine.load_storage_state(name)
+    print(f"[Step {step_idx}] 🔑 Session snapshot '{name}': {'✅ RESTORED' if restored else '❌ MISSING/EXPIRED'}")
+
+def handle_check_session(engine, step, step_idx):
+    name = step.get("name")
+    if not name: raise ValueError("Missing 'name'")
+    print(f"[Step {step_idx}] 🔑 Checking session: {name}")
+    engine.check_session(name, step.get("guard_selector"))
+
+def handle_set_retry_policy(engine, step, step_idx):
+    policy = step.get("policy")
+    actions = step.get("actions")
+    if not policy: raise ValueError("Missing 'policy'")
+    print(f"[Step {step_idx}] 🔁 Retry policy for {', '.join(actions) if actions else 'all actions'}: {policy}")
+    engine.set_retry_policy(policy, actions)
+
+def handle_block_resources(engine, step, step_idx):
+    profile = step.get("profile", "none")
+    print(f"[Step {step_idx}] 🚫 Blocking resources: {profile}")
+    engine.block_resources(profile, step.get("resource_types", ()),
+                           step.get("domains", ()), step.get("url_patterns", ()))
+
+def handle_wait_for_response(engine, step, step_idx):
+    url_predicate = step.get("url")
+    if not url_predicate: raise ValueError("Missing 'url'")
+    print(f"[Step {step_idx}] 🌐 Waiting response: {url_predicate}")
+    engine.wait_for_response(url_predicate)
+
+def handle_wait_for_request(engine, step, step_idx):
+    url_predicate = step.get("url")
+    if not url_predicate: raise ValueError("Missing 'url'")
+    print(f"[Step {step_idx}] 🌐 Waiting request: {url_predicate}")
+    engine.wait_for_request(url_predicate)
+
+def handle_set_download_path(engine, step, step_idx):
+    path = step.get("path", "downloads")
+    print(f"[Step {step_idx}] 📁 Download path: {path}")
+    engine.set_download_path(path)
+
+# === DISPATCH TABLE (resolved once by task_compiler) ===
+HANDLERS = {
+    # === CORE 22 OPERATIONS ===
+    "open": handle_open,
+    "click": handle_click,
+    "type": handle_type,
+    "wait": handle_wait,
+    "wait_seconds": handle_wait,
+    "wait_for": handle_wait_for,
+    "scroll_to": handle_scroll_to,
+    "scroll_pixels": handle_scroll_pixels,
+    "hover": handle_hover,
+    "double_click": handle_double_click,
+    "right_click": handle_right_click,
+    "drag_drop": handle_drag_drop,
+    "select_option": handle_select_option,
+    "clear": handle_clear,
+    "screenshot": handle_screenshot,
+    "switch_window": handle_switch_window,
+    "back": handle_back,
+    "forward": handle_forward,
+    "refresh": handle_refresh,
+    "close": handle_close,
+    "get_text": handle_get_text,
+    "get_attribute": handle_get_attribute,
+    "extract": handle_extract,
+    "assert_visible": handle_assert_visible,
+    "assert_text": handle_assert_text,
+
+    # === PLAYWRIGHT SUPERPOWERS (15 NEW) ===
+    "mock_api": handle_mock_api,
+    "emulate_mobile": handle_emulate_mobile,
+    "expect_download": handle_expect_download,
+    "pdf": handle_pdf,
+    "start_tracing": handle_start_tracing,
+    "stop_tracing": handle_stop_tracing,
+    "set_geolocation": handle_set_geolocation,
+    "grant_permissions": handle_grant_permissions,
+    "clear_cookies": handle_clear_cookies,
+    "record_video": handle_record_video,
+    "expect_screenshot": handle_expect_screenshot,
+    "intercept_request": handle_intercept_request,
+    "block_resources": handle_block_resources,
+    "set_retry_policy": handle_set_retry_policy,
+    "save_storage_state": handle_save_storage_state,
+    "load_storage_state": handle_load_storage_state,
+    "check_session": handle_check_session,
+    "wait_for_response": handle_wait_for_response,
+    "wait_for_request": handle_wait_for_request,
+    "set_download_path": handle_set_download_path
+}
@@ -0,0 +1,753 @@
+import asyncio
+import time
+import uuid
+
+from async_playwright_engine import AsyncPlaywrightEngine
+from checkpoints import CheckpointStore
+from extraction import JsonlSink, open_sink
+from metrics import REGISTRY, hooks_for, new_timings
+from parallel_blocks import ParallelBranchError, branches_of, outcome, summary_line
+from retry_policy import CircuitBreaker, Deadline, DeadlineExceeded
+from row_sources import BadRow
+from run_result import RunResult, value_key
+from screenshot_writer import ScreenshotWriter
+from selector_healing import SelectorCache
+from storage_snapshots import SnapshotStore
+from task_compiler import TaskValidationError, WAIT_ACTIONS, compile_task, compile_template
+
+
+class _RunContext:
+    """What one run_actions call hands down to its steps - and to parallel branches via the engine"""
+    def __init__(self, metrics, deadline, wait_mode):
+        self.run_id = uuid.uuid4().hex
+        self.metrics = metrics
+        self.deadline = deadline
+        self.wait_mode = wait_mode
+        self.waited_budget = 0.0   # smart waits: seconds allowed vs. actually waited
+        self.waited_actual = 0.0
+
+
+def _skipped(engine, compiled, result):
+    skip_for = compiled.step.get("skip_if_session")
+    if skip_for and engine.active_snapshot == skip_for:
+        print(f"[Step {compiled.index}] ⏭️ Skipped - session '{skip_for}' restored")
+        result.last_completed_step = compiled.index
+        return True
+    return False
+
+
+async def _run_step(engine, compiled, result, run):
+    """
+    One step as run_actions runs it, at the top level or inside a parallel
+    branch: retry overrides and the task deadline, hooks, smart waits and a
+    metrics record. Fills `result`; returns the error the step failed with.
+    """
+    step_idx = compiled.index
+    step = compiled.step
+    hooks = hooks_for(engine)
+    engine.timings = new_timings()
+    engine.begin_step(compiled.action, step.get("retry"), run.deadline)
+    for hook in hooks:
+        hook.before_step(engine, compiled)
+    error = None
+    started = time.perf_counter()
+    try:
+        if compiled.action in WAIT_ACTIONS and (run.wait_mode == "smart" or step.get("until")):
+            step = compiled.smart_step
+            await compiled.handler(engine, step, step_idx)
+            run.waited_budget += step.get("seconds", 1)
+            run.waited_actual += time.perf_counter() - started
+        else:
+            value = await compiled.handler(engine, step, step_idx)
+            if value is not None:
+                result.values[value_key(step, step_idx)] = value
+    except Exception as e:
+        error = e
+        result.fail(step_idx, e)
+        print(f"\n❌ Automation failed at step {step_idx}:")
+        print(f"   Action: {dict(step)}")
+        print(f"   Error: {str(e)}")
+        print(f"   Type: {type(e).__name__}")
+
+    wall = time.perf_counter() - started
+    record = run.metrics.record_step(run.run_id, compiled, engine.timings, wall, error) if run.metrics else None
+    for hook in hooks:
+        hook.after_step(engine, compiled, record)
+    if error is None:
+        result.last_completed_step = step_idx
+    return error
+
+
+async def run_actions(engine, task, wait_mode="fixed", metrics=REGISTRY, checkpoint_after=(),
+                      resume=False, checkpoints=None, checkpoint_key=None, task_deadline=None):
+    """
+    Async twin of action_runner.run_actions - returns a RunResult.
+    wait_mode="smart" treats wait/wait_seconds as an upper bound and returns early
+    once the page is ready (also inside parallel branches).
+    task_deadline (seconds) caps the whole run and a step's "retry" dict
+    overrides the engine's RetryPolicy, as in the sync runner. Pages, routes
+    and listeners the previous task left behind are cleaned up first
+    (engine.begin_task); totals are in engine.lifecycle.stats().
+    Every step - parallel branch steps included - is recorded into `metrics`
+    and hooks fire around each step and attempt, and
+    checkpoint_after/resume/checkpoints work as in the sync runner.
+    """
+    if wait_mode not in ("fixed", "smart"): raise ValueError(f"Unknown wait_mode '{wait_mode}'")
+    plan = compile_task(task, HANDLERS)
+    result = RunResult(total_steps=len(plan))
+    checkpoint_after = set(checkpoint_after)
+    checkpoint_key = checkpoint_key or plan.digest[:16]
+    if checkpoints is None and (resume or checkpoint_after or any(c.step.get("checkpoint") for c in plan)):
+        checkpoints = CheckpointStore()
+    run_started = time.perf_counter()
+    run = _RunContext(metrics, Deadline(task_deadline) if task_deadline else None, wait_mode)
+    engine.run_context = run
+    sample = await engine.begin_task()
+    if metrics and sample:
+        metrics.record_resources(sample)
+
+    resume_after = 0
+    if resume:
+        saved = checkpoints.load(checkpoint_key)
+        if saved:
+            resume_after = saved["step"]
+            result.resumed_from = resume_after
+            result.last_completed_step = resume_after
+            result.values.update(saved["values"])
+            print(f"\n⏩ Resuming after step {resume_after} at {saved['url']}")
+            await engine.restore_checkpoint(saved["url"], saved["storage_state"])
+        else:
+            print("\n⏩ No checkpoint to resume from - starting at step 1")
+
+    for stats in engine.run_stats:
+        stats.reset()
+    for compiled in plan:
+        step_idx = compiled.index
+        if step_idx <= resume_after or _skipped(engine, compiled, result):
+            continue
+        if await _run_step(engine, compiled, result, run) is not None:
+            break
+        if checkpoints is not None and (compiled.step.get("checkpoint") or step_idx in checkpoint_after):
+            url, storage_state = await engine.checkpoint_state()
+            path = checkpoints.save(checkpoint_key, step_idx, url, storage_state, result.values)
+            print(f"💾 Checkpoint after step {step_idx}: {path}")
+
+    result.elapsed_seconds = time.perf_counter() - run_started
+    engine.end_task()
+    if result.passed and checkpoints is not None:
+        checkpoints.clear(checkpoint_key)
+    if run.waited_budget:
+        print(f"\n⏱️ Smart waits: {run.waited_actual:.1f}s of {run.waited_budget:.1f}s budget "
+              f"(saved {max(run.waited_budget - run.waited_actual, 0):.1f}s)")
+    for stats in engine.run_stats:
+        line = stats.summary()
+        if line:
+            print(line)
+    if result.passed:
+        print("\n✅ Automation sequence completed!")
+    else:
+        print(f"\n❌ Automation stopped at step {result.failed_step}/{result.total_steps}")
+    return result
+
+
+async def run_tasks(tasks, concurrency=4, timeout=15000, max_retries=3, headless=True,
+                    storage_snapshot=None, snapshot_store=None, retry_policy=None, task_deadline=None,
+                    block_profile=None, wait_mode="fixed", metrics=REGISTRY, checkpoint_after=(),
+                    resume=False, checkpoints=None):
+    """
+    Run many task lists at once - one Chromium process, one isolated
+    BrowserContext per task, at most `concurrency` tasks in flight.
+    With storage_snapshot, every context starts from that one shared, read-only
+    snapshot and its "skip_if_session" steps are skipped. All contexts share
+    one circuit breaker, so a failing site trips it for the whole run.
+    block_profile (see resource_blocking.PROFILES) is applied to every context.
+    wait_mode, metrics and the checkpoint options are passed to run_actions
+    for every task; each task checkpoints under its own key (plan digest and
+    task number), so identical tasks in one run don't overwrite each other.
+    Every entry of "results" is a RunResult - a context that fails to start is
+    recorded as that task's failure.
+    """
+    if concurrency < 1: raise ValueError("'concurrency' must be >= 1")
+    if wait_mode not in ("fixed", "smart"): raise ValueError(f"Unknown wait_mode '{wait_mode}'")
+    # Validate every task list before Chromium is launched
+    tasks = [compile_task(task, HANDLERS) for task in tasks]
+    snapshots = snapshot_store or SnapshotStore()   # shared by every worker's save/load steps
+    state = None
+    if storage_snapshot:
+        state = snapshots.load(storage_snapshot)
+        if state is None:
+            print(f"⚠️ Snapshot '{storage_snapshot}' missing or expired - running setup steps")
+    screenshot_writer = ScreenshotWriter()   # one writer thread for every context
+    engine = AsyncPlaywrightEngine(timeout=timeout, max_retries=max_retries, headless=headless,
+                                   screenshot_writer=screenshot_writer)
+    await engine.start(new_page=False)
+    selector_cache = SelectorCache()   # one shared cache, so contexts don't overwrite each other
+    circuit_breaker = CircuitBreaker()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(task_idx, task):
+        async with semaphore:
+            print(f"\n[Task {task_idx}] ▶️ Starting ({len(task)} steps)")
+            result = RunResult(total_steps=len(task))
+            worker = None
+            try:
+                worker = await AsyncPlaywrightEngine.from_browser(
+                    engine.browser, timeout=timeout, max_retries=max_retries,
+                    storage_state=state, snapshot_name=storage_snapshot, selector_cache=selector_cache,
+                    retry_policy=retry_policy, circuit_breaker=circuit_breaker, block_profile=block_profile,
+                    screenshot_writer=screenshot_writer, snapshot_store=snapshots
+                )
+                result = await run_actions(worker, task, wait_mode, metrics, checkpoint_after, resume,
+                                           checkpoints, f"{task.digest[:16]}_{task_idx}", task_deadline)
+            except Exception as e:
+                result.fail(result.last_completed_step + 1, e)
+            finally:
+                if worker is not None:
+                    await worker.quit()
+            return result
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(run_one(task_idx, task) for task_idx, task in enumerate(tasks, 1)))
+    finally:
+        await engine.quit()
+        screenshot_writer.close()
+    elapsed = time.perf_counter() - started
+
+    passed = sum(1 for result in results if result.passed)
+    tasks_per_minute = len(tasks) / elapsed * 60 if elapsed else 0.0
+    print(f"\n📊 {passed}/{len(tasks)} tasks passed in {elapsed:.1f}s "
+          f"({tasks_per_minute:.1f} tasks/min, concurrency={concurrency})")
+    return {
+        "tasks": len(tasks),
+        "passed": passed,
+        "failed": len(tasks) - passed,
+        "elapsed_seconds": elapsed,
+        "tasks_per_minute": tasks_per_minute,
+        "results": results,
+    }
+
+async def run_rows(task, rows, concurrency=4, output=None, timeout=15000, max_retries=3, headless=True,
+                   storage_snapshot=None, snapshot_store=None, retry_policy=None, task_deadline=None,
+                   block_profile=None, wait_mode="fixed", metrics=REGISTRY, checkpoint_after=(),
+                   resume=False, checkpoints=None):
+    """
+    Run one TASK template once per input row ({{column}} placeholders filled
+    from the row) - one Chromium, one isolated BrowserContext per row.
+    `rows` is any iterable of dicts (e.g. row_sources.iter_rows) and is pulled
+    lazily: at most `concurrency` rows are in flight and nothing more is read
+    ahead. Every row yields exactly one record - a row that doesn't fit the
+    template, or a BadRow from the source, is recorded as failed without opening
+    a context. Records stream to `output` (.jsonl) in completion order, or are
+    returned when no output is given. If reading `rows` itself fails, the rows
+    already in flight finish and are recorded before the error is raised.
+    wait_mode, metrics and the checkpoint options are passed to run_actions
+    for every row, keyed by the rendered plan's digest and the row number.
+    """
+    if concurrency < 1: raise ValueError("'concurrency' must be >= 1")
+    if wait_mode not in ("fixed", "smart"): raise ValueError(f"Unknown wait_mode '{wait_mode}'")
+    template = compile_template(task, HANDLERS)
+    snapshots = snapshot_store or SnapshotStore()   # shared by every worker's save/load steps
+    state = None
+    if storage_snapshot:
+        state = snapshots.load(storage_snapshot)
+        if state is None:
+            print(f"⚠️ Snapshot '{storage_snapshot}' missing or expired - running setup steps")
+    sink = JsonlSink(output) if output else None
+    records = []
+    counts = {"rows": 0, "passed": 0}
+
+    screenshot_writer = ScreenshotWriter()   # one writer thread for every context
+    engine = AsyncPlaywrightEngine(timeout=timeout, max_retries=max_retries, headless=headless,
+                                   screenshot_writer=screenshot_writer)
+    await engine.start(new_page=False)
+    selector_cache = SelectorCache()
+    circuit_breaker = CircuitBreaker()
+
+    async def run_row(row_idx, row):
+        result = RunResult(total_steps=len(template))
+        if isinstance(row, BadRow):
+            result.fail(0, row)
+            return row_idx, None, result
+        try:
+            plan = template.render(row)
+        except TaskValidationError as e:
+            result.fail(0, e)
+            return row_idx, row, result
+        print(f"\n[Row {row_idx}] ▶️ Starting ({len(plan)} steps)")
+        worker = None
+        try:
+            worker = await AsyncPlaywrightEngine.from_browser(
+                engine.browser, timeout=timeout, max_retries=max_retries,
+                storage_state=state, snapshot_name=storage_snapshot, selector_cache=selector_cache,
+                retry_policy=retry_policy, circuit_breaker=circuit_breaker, block_profile=block_profile,
+                screenshot_writer=screenshot_writer, snapshot_store=snapshots
+            )
+            result = await run_actions(worker, plan, wait_mode, metrics, checkpoint_after, resume,
+                                       checkpoints, f"{plan.digest[:16]}_{row_idx}", task_deadline)
+        except Exception as e:
+            result.fail(result.last_completed_step + 1, e)
+        finally:
+            if worker is not None:
+                await worker.quit()
+        return row_idx, row, result
+
+    def emit(done):
+        for finished in done:
+            row_idx, row, result = finished.result()
+            record = {"row": row_idx, "input": row, **result.as_dict()}
+            counts["passed"] += result.passed
+            if sink:
+                sink.write([record])
+            else:
+                records.append(record)
+
+    started = time.perf_counter()
+    in_flight = set()
+    try:
+        try:
+            for row_idx, row in enumerate(rows, 1):
+                if len(in_flight) >= concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    emit(done)
+                in_flight.add(asyncio.ensure_future(run_row(row_idx, row)))
+                counts["rows"] = row_idx
+        except Exception:
+            # The source itself failed - record the rows already started, then stop
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight)
+                emit(done)
+            raise
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            emit(done)
+    finally:
+        for pending in in_flight:
+            pending.cancel()
+        # Let cancelled rows close their contexts before the browser goes away
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        await engine.quit()
+        screenshot_writer.close()
+        if sink:
+            sink.close()
+    elapsed = time.perf_counter() - started
+
+    rows_per_minute = counts["rows"] / elapsed * 60 if elapsed else 0.0
+    print(f"\n📊 {counts['passed']}/{counts['rows']} rows passed in {elapsed:.1f}s "
+          f"({rows_per_minute:.1f} rows/min, concurrency={concurrency})")
+    summary = {
+        "rows": counts["rows"],
+        "passed": counts["passed"],
+        "failed": counts["rows"] - counts["passed"],
+        "elapsed_seconds": elapsed,
+        "rows_per_minute": rows_per_minute,
+    }
+    if sink:
+        summary["output"] = sink.path
+    else:
+        summary["results"] = sorted(records, key=lambda record: record["row"])
+    return summary
+
+async def _run_branch(engine, plan, result, run):
+    """Steps of one parallel branch on the engine's (bound) page, run like top-level steps"""
+    for compiled in plan:
+        if _skipped(engine, compiled, result):
+            continue
+        if await _run_step(engine, compiled, result, run) is not None:
+            break
+    return result
+
+# === CORE 22 HANDLERS ===
+async def handle_open(engine, step, step_idx):
+    url = step.get("url")
+    if not url: raise ValueError("Missing 'url'")
+    wait_until = step.get("wait_until", "networkidle")
+    print(f"[Step {step_idx}] 🌐 Opening: {url}")
+    await engine.open(url, wait_until)
+
+async def handle_click(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Clicking: {selector}")
+    await engine.click(selector)
+
+async def handle_type(engine, step, step_idx):
+    selector = step.get("selector")
+    value = step.get("value", "")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] ⌨️ Typing '{value[:20]}...' into: {selector}")
+    await engine.type(selector, value)
+
+async def handle_wait(engine, step, step_idx):
+    """wait and wait_seconds - a fixed sleep, or an upper bound when the step has "until" """
+    seconds = step.get("seconds", 1)
+    until = step.get("until")
+    if until:
+        print(f"[Step {step_idx}] ⏳ Waiting up to {seconds}s for {until}...")
+        await engine.wait_until_ready(seconds, until, step.get("selector"))
+    else:
+        print(f"[Step {step_idx}] ⏳ Waiting {seconds}s...")
+        await engine.wait_seconds(seconds)
+
+async def handle_wait_for(engine, step, step_idx):
+    selector = step.get("selector")
+    timeout = step.get("timeout", 10)
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] ⌛ Waiting for: {selector}")
+    await engine.wait_for_selector(selector, timeout * 1000)  # step timeout is in seconds
+
+async def handle_scroll_to(engine, step, step_idx):
+    selector = step.get("selector")
+    pixels = step.get("pixels")
+    if selector:
+        print(f"[Step {step_idx}] 📜 Scrolling to: {selector}")
+        await engine.scroll_to_selector(selector)
+    elif pixels:
+        print(f"[Step {step_idx}] 📜 Scrolling {pixels}px")
+        await engine.scroll_pixels(pixels)
+    else:
+        raise ValueError("Provide 'selector' or 'pixels'")
+
+async def handle_scroll_pixels(engine, step, step_idx):
+    pixels = step.get("pixels")
+    if pixels is None: raise ValueError("Missing 'pixels'")
+    print(f"[Step {step_idx}] 📜 Scrolling {pixels}px")
+    await engine.scroll_pixels(pixels)
+
+async def handle_hover(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Hovering: {selector}")
+    await engine.hover(selector)
+
+async def handle_double_click(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Double clicking: {selector}")
+    await engine.double_click(selector)
+
+async def handle_right_click(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🖱️ Right clicking: {selector}")
+    await engine.right_click(selector)
+
+async def handle_drag_drop(engine, step, step_idx):
+    source = step.get("source")
+    target = step.get("target")
+    if not source or not target: raise ValueError("Missing 'source' or 'target'")
+    print(f"[Step {step_idx}] 🖱️ Dragging {source} → {target}")
+    await engine.drag_drop(source, target)
+
+async def handle_select_option(engine, step, step_idx):
+    selector = step.get("selector")
+    option = step.get("option")
+    method = step.get("method", "text")
+    if not selector or not option: raise ValueError("Missing 'selector' or 'option'")
+    print(f"[Step {step_idx}] 📋 Selecting '{option}' ({method}): {selector}")
+    await engine.select_option(selector, option, method)
+
+async def handle_clear(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 🗑️ Clearing: {selector}")
+    await engine.clear(selector)
+
+async def handle_screenshot(engine, step, step_idx):
+    filename = step.get("filename", f"screenshot_step_{step_idx}.png")
+    print(f"[Step {step_idx}] 📸 Screenshot: {filename}")
+    path = await engine.screenshot(filename, step.get("format"), step.get("quality"),
+                                   step.get("selector"), step.get("full_page", False))
+    print(f"📁 Saving: {path}")
+
+async def handle_switch_window(engine, step, step_idx):
+    window = step.get("window", "next")
+    print(f"[Step {step_idx}] 🔄 Switching window: {window}")
+    await engine.switch_window(window)
+
+async def handle_back(engine, step, step_idx):
+    print(f"[Step {step_idx}] ⬅️ Going back")
+    await engine.back()
+
+async def handle_forward(engine, step, step_idx):
+    print(f"[Step {step_idx}] ➡️ Going forward")
+    await engine.forward()
+
+async def handle_refresh(engine, step, step_idx):
+    print(f"[Step {step_idx}] 🔄 Refreshing page")
+    await engine.refresh()
+
+async def handle_close(engine, step, step_idx):
+    print(f"[Step {step_idx}] ❌ Closing window")
+    await engine.close()
+
+async def handle_get_text(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    text = await engine.get_text(selector)
+    print(f"[Step {step_idx}] 📄 Text: '{text[:50]}...' ({selector})")
+    return text
+
+async def handle_get_attribute(engine, step, step_idx):
+    selector = step.get("selector")
+    attr = step.get("attribute", "value")
+    if not selector: raise ValueError("Missing 'selector'")
+    value = await engine.get_attribute(selector, attr)
+    print(f"[Step {step_idx}] 🔍 '{attr}': {value} ({selector})")
+    return value
+
+async def handle_extract(engine, step, step_idx):
+    fields = step.get("fields")
+    rows = step.get("rows")
+    sink_path = step.get("sink")
+    if not fields: raise ValueError("Missing 'fields'")
+    print(f"[Step {step_idx}] 🧾 Extracting {len(fields)} fields"
+          f"{f' per {rows}' if rows else ''}{f' → {sink_path}' if sink_path else ''}")
+    keep = step.get("return_records", not sink_path)
+    records = []
+    sink = open_sink(sink_path, fields, step.get("append", False)) if sink_path else None
+    count = 0
+    try:
+        async for batch in engine.extract(fields, rows, step.get("batch_size", 500)):
+            count += len(batch)
+            if sink:
+                sink.write(batch)
+            if keep:
+                records.extend(batch)
+    finally:
+        if sink:
+            sink.close()
+    print(f"📦 Extracted {count} record(s)")
+    if not rows and keep:
+        return records[0] if records else None
+    if keep:
+        return records
+    return {"sink": sink_path, "records": count}
+
+async def handle_assert_visible(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    visible = await engine.is_visible(selector)
+    print(f"[Step {step_idx}] 👁️ '{selector}' = {'✅ VISIBLE' if visible else '❌ HIDDEN'}")
+    if not visible: raise AssertionError(f"Element not visible: {selector}")
+
+async def handle_assert_text(engine, step, step_idx):
+    selector = step.get("selector")
+    expected = step.get("expected")
+    if not selector or not expected: raise ValueError("Missing 'selector' or 'expected'")
+    actual = await engine.get_text(selector)
+    print(f"[Step {step_idx}] ✅ Text: '{actual[:30]}...' == '{expected}'")
+    if expected not in actual: raise AssertionError(f"Expected '{expected}', got '{actual}'")
+
+# === PLAYWRIGHT SUPERPOWERS HANDLERS (15 NEW) ===
+async def handle_mock_api(engine, step, step_idx):
+    url_pattern = step.get("url_pattern")
+    response_data = step.get("response_data", {})
+    status = step.get("status", 200)
+    if not url_pattern: raise ValueError("Missing 'url_pattern'")
+    print(f"[Step {step_idx}] 🌐 Mocking API: {url_pattern}")
+    await engine.mock_api(url_pattern, response_data, status)
+
+async def handle_emulate_mobile(engine, step, step_idx):
+    device = step.get("device_name", "iPhone 12")
+    print(f"[Step {step_idx}] 📱 Emulating: {device}")
+    await engine.emulate_mobile(device)
+
+async def handle_expect_download(engine, step, step_idx):
+    selector = step.get("selector")
+    if not selector: raise ValueError("Missing 'selector'")
+    print(f"[Step {step_idx}] 📥 Expecting download from: {selector}")
+    filename = await engine.expect_download(selector)
+    print(f"📁 Downloaded: {filename}")
+    return filename
+
+async def handle_pdf(engine, step, step_idx):
+    filename = step.get("filename")
+    print(f"[Step {step_idx}] 📄 Generating PDF: {filename or 'auto'}")
+    path = await engine.pdf(filename)
+    print(f"📁 PDF saved: {path}")
+
+async def handle_start_tracing(engine, step, step_idx):
+    name = step.get("name", "trace")
+    print(f"[Step {step_idx}] 📹 Starting trace: {name}")
+    await engine.start_tracing(name)
+
+async def handle_stop_tracing(engine, step, step_idx):
+    filename = step.get("filename")
+    print(f"[Step {step_idx}] ⏹️ Stopping trace: {filename or 'auto'}")
+    path = await engine.stop_tracing(filename)
+    print(f"📁 Trace saved: {path}")
+
+async def handle_set_geolocation(engine, step, step_idx):
+    lat = step.get("latitude")
+    lon = step.get("longitude")
+    if lat is None or lon is None: raise ValueError("Missing 'latitude' or 'longitude'")
+    print(f"[Step {step_idx}] 🌍 Setting GPS: {lat}, {lon}")
+    await engine.set_geolocation(lat, lon)
+
+async def handle_grant_permissions(engine, step, step_idx):
+    perms = step.get("permissions", ["geolocation"])
+    print(f"[Step {step_idx}] 🔓 Granting permissions: {perms}")
+    await engine.grant_permissions(perms)
+
+async def handle_clear_cookies(engine, step, step_idx):
+    print(f"[Step {step_idx}] 🍪 Clearing cookies")
+    await engine.clear_cookies()
+
+async def handle_record_video(engine, step, step_idx):
+    output_dir = step.get("output_dir", "videos")
+    print(f"[Step {step_idx}] 🎥 Recording video: {output_dir}")
+    await engine.record_video(output_dir)
+
+async def handle_expect_screenshot(engine, step, step_idx):
+    selector = step.get("selector")
+    filename = step.get("filename")
+    if not selector or not filename: raise ValueError("Missing 'selector' or 'filename'")
+    print(f"[Step {step_idx}] 👁️ Visual test: {selector}")
+    await engine.expect_screenshot(selector, filename, step.get("tolerance", 10),
+                                   step.get("max_diff_ratio", 0.001), step.get("ignore", ()))
+
+async def handle_intercept_request(engine, step, step_idx):
+    url_pattern = step.get("url_pattern")
+    mode = step.get("mode", "abort")  # "action" is the step's own key
+    if not url_pattern: raise ValueError("Missing 'url_pattern'")
+    print(f"[Step {step_idx}] 🚫 Intercepting: {url_pattern} ({mode})")
+    await engine.intercept_request(url_pattern, mode)
+
+async def handle_wait_for_response(engine, step, step_idx):
+    url_predicate = step.get("url")
+    if not url_predicate: raise ValueError("Missing 'url'")
+    print(f"[Step {step_idx}] 🌐 Waiting response: {url_predicate}")
+    await engine.wait_for_response(url_predicate)
+
+async def handle_wait_for_request(engine, step, step_idx):
+    url_predicate = step.get("url")
+    if not url_predicate: raise ValueError("Missing 'url'")
+    print(f"[Step {step_idx}] 🌐 Waiting request: {url_predicate}")
+    await engine.wait_for_request(url_predicate)
+
+async def handle_set_download_path(engine, step, step_idx):
+    path = step.get("path", "downloads")
+    print(f"[Step {step_idx}] 📁 Download path: {path}")
+    await engine.set_download_path(path)
+
+async def handle_save_storage_state(engine, step, step_idx):
+    name = step.get("name")
+    if not name: raise ValueError("Missing 'name'")
+    print(f"[Step {step_idx}] 🔑 Saving session snapshot: {name}")
+    path = await engine.save_storage_state(name, step.get("ttl"), step.get("guard_selector"))
+    print(f"📁 Snapshot saved: {path}")
+
+async def handle_load_storage_state(engine, step, step_idx):
+    name = step.get("name")
+    if not name: raise ValueError("Missing 'name'")
+    restored = await engine.load_storage_state(name)
+    print(f"[Step {step_idx}] 🔑 Session snapshot '{name}': {'✅ RESTORED' if restored else '❌ MISSING/EXPIRED'}")
+
+async def handle_check_session(engine, step, step_idx):
+    name = step.get("name")
+    if not name: raise ValueError("Missing 'name'")
+    print(f"[Step {step_idx}] 🔑 Checking session: {name}")
+    await engine.check_session(name, step.get("guard_selector"))
+
+async def handle_set_retry_policy(engine, step, step_idx):
+    policy = step.get("policy")
+    actions = step.get("actions")
+    if not policy: raise ValueError("Missing 'policy'")
+    print(f"[Step {step_idx}] 🔁 Retry policy for {', '.join(actions) if actions else 'all actions'}: {policy}")
+    engine.set_retry_policy(policy, actions)
+
+async def handle_block_resources(engine, step, step_idx):
+    profile = step.get("profile", "none")
+    print(f"[Step {step_idx}] 🚫 Blocking resources: {profile}")
+    await engine.block_resources(profile, step.get("resource_types", ()),
+                                 step.get("domains", ()), step.get("url_patterns", ()))
+
+async def handle_parallel(engine, step, step_idx):
+    mode = step.get("mode", "fail_fast")
+    branches = branches_of(step)
+    print(f"[Step {step_idx}] 🔀 {len(branches)} branches ({mode}), concurrently on one page each")
+    results = {}
+
+    async def run_branch(name, steps, timeout):
+        plan = compile_task(steps, HANDLERS)
+        result = results[name] = RunResult(total_steps=len(plan))
+        started = time.perf_counter()
+        page = await engine.context.new_page()
+        try:
+            runner = _run_branch(engine.bind_page(page), plan, result, engine.run_context)
+            await (asyncio.wait_for(runner, timeout) if timeout else runner)
+        except asyncio.TimeoutError:
+            result.fail(result.last_completed_step + 1,
+                        DeadlineExceeded(f"branch exceeded its {timeout}s timeout"))
+        finally:
+            result.elapsed_seconds = time.perf_counter() - started
+            await page.close()
+        return name, result
+
+    pending = [asyncio.ensure_future(run_branch(*branch)) for branch in branches]
+    try:
+        for finished in asyncio.as_completed(pending):
+            name, result = await finished
+            if mode == "fail_fast" and not result.passed:
+                raise ParallelBranchError(name, result)
+    finally:
+        # fail_fast: stop the other branches (their pages close as they unwind)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    print(summary_line(results))
+    return {name: outcome(results[name]) for name, *_ in branches}
+
+# === DISPATCH TABLE (resolved once by task_compiler) ===
+HANDLERS = {
+    # === CORE 22 OPERATIONS ===
+    "open": handle_open,
+    "click": handle_click,
+    "type": handle_type,
+    "wait": handle_wait,
+    "wait_seconds": handle_wait,
+    "wait_for": handle_wait_for,
+    "scroll_to": handle_scroll_to,
+    "scroll_pixels": handle_scroll_pixels,
+    "hover": handle_hover,
+    "double_click": handle_double_click,
+    "right_click": handle_right_click,
+    "drag_drop": handle_drag_drop,
+    "select_option": handle_select_option,
+    "clear": handle_clear,
+    "screenshot": handle_screenshot,
+    "switch_window": handle_switch_window,
+    "back": handle_back,
+    "forward": handle_forward,
+    "refresh": handle_refresh,
+    "close": handle_close,
+    "get_text": handle_get_text,
+    "get_attribute": handle_get_attribute,
+    "extract": handle_extract,
+    "assert_visible": handle_assert_visible,
+    "assert_text": handle_assert_text,
+
+    # === PLAYWRIGHT SUPERPOWERS (15 NEW) ===
+    "mock_api": handle_mock_api,
+    "emulate_mobile": handle_emulate_mobile,
+    "expect_download": handle_expect_download,
+    "pdf": handle_pdf,
+    "start_tracing": handle_start_tracing,
+    "stop_tracing": handle_stop_tracing,
+    "set_geolocation": handle_set_geolocation,
+    "grant_permissions": handle_grant_permissions,
+    "clear_cookies": handle_clear_cookies,
+    "record_video": handle_record_video,
+    "expect_screenshot": handle_expect_screenshot,
+    "intercept_request": handle_intercept_request,
+    "save_storage_state": handle_save_storage_state,
+    "load_storage_state": handle_load_storage_state,
+    "check_session": handle_check_session,
+    "wait_for_response": handle_wait_for_response,
+    "wait_for_request": handle_wait_for_request,
+    "set_download_path": handle_set_download_path,
+    "set_retry_policy": handle_set_retry_policy,
+    "block_resources": handle_block_resources,
+    "parallel": handle_parallel
+}
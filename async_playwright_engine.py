@@ -0,0 +1,641 @@
+from playwright.async_api import async_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+
+from engine_core import EngineCore, RetryAttempts
+from engine_lifecycle import AsyncEngineLifecycle
+from extraction import EXTRACT_JS, normalize_fields
+from metrics import new_timings
+from process_stats import browser_root_pids
+from resource_blocking import BlockingStats, get_profile
+from screenshot_writer import ScreenshotWriter, format_for
+import visual_diff
+from retry_policy import CircuitBreaker, RetryPolicy
+from selector_healing import PROBE_JS, SelectorCache, is_candidate_list
+from storage_snapshots import SessionExpiredError, SnapshotStore
+
+
+class AsyncPlaywrightEngine(EngineCore):
+    """
+    asyncio twin of PlaywrightEngine - same action surface, every method is awaitable.
+
+    engine = await AsyncPlaywrightEngine().start()                 # owns Playwright + Chromium
+    worker = await AsyncPlaywrightEngine.from_browser(browser)     # own context in a shared Chromium
+
+    Retries follow the same RetryPolicy / Deadline / CircuitBreaker rules as
+    PlaywrightEngine; workers of one run share a circuit breaker. Pages,
+    routes and listeners are tracked by an AsyncEngineLifecycle and cleaned
+    up between tasks, as in PlaywrightEngine.begin_task().
+    """
+    def __init__(self, timeout=15000, max_retries=3, headless=False, selector_cache=None,
+                 retry_policy=None, action_policies=None, circuit_breaker=None, screenshot_writer=None,
+                 lifecycle=None, snapshot_store=None):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.headless = headless
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries)
+        self.action_policies = dict(action_policies or {})   # action -> RetryPolicy
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._step_policy = self.retry_policy
+        self._step_deadline = None
+        self._task_deadline = None
+        self._timeouts_clamped = False
+        self.run_context = None   # set by run_actions, read by parallel branches
+        self.timings = new_timings()   # reset by run_actions before every step
+        self.hooks = []                # metrics.Hook instances for this engine only
+
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self._owns_browser = False
+        self._shares_context = False   # a bind_page() engine - the context belongs to its parent
+        self._context_options = {"viewport": None}
+        self._browser_pids = []   # root PIDs of the Chromium we launched, for RSS sampling
+        self.lifecycle = lifecycle or AsyncEngineLifecycle()   # pages/routes/listeners, cleaned between tasks
+        self.snapshots = snapshot_store or SnapshotStore()
+        self.active_snapshot = None    # steps with "skip_if_session" == this are skipped
+        self.selector_cache = selector_cache or SelectorCache()
+        self.blocking = None
+        self._base_blocking = None   # profile set outside a task - restored between tasks
+        self._blocking_route = None  # None, "task" or "persistent" - the route _route_blocking is on
+        self.blocking_stats = BlockingStats()
+        self.run_stats = [self.blocking_stats]   # objects with reset()/summary(), reported per run
+
+        Path("screenshots").mkdir(exist_ok=True)
+        Path("downloads").mkdir(exist_ok=True)
+        Path("traces").mkdir(exist_ok=True)
+        self.download_dir = "downloads"
+        self._explicit_trace = None   # name of a start_tracing step's trace
+        # A writer passed in is shared (e.g. by every run_tasks worker) and closed by its owner
+        self._owns_writer = screenshot_writer is None
+        self.screenshot_writer = screenshot_writer or ScreenshotWriter()
+
+    async def start(self, new_page=True):
+        self.playwright = await async_playwright().start()
+        self.browser = await self._launch_browser()
+        self._owns_browser = True
+        if new_page:
+            await self._new_context()
+        return self
+
+    @classmethod
+    async def from_browser(cls, browser, timeout=15000, max_retries=3, storage_state=None,
+                           snapshot_name=None, selector_cache=None, retry_policy=None,
+                           circuit_breaker=None, block_profile=None, screenshot_writer=None,
+                           snapshot_store=None):
+        """Isolated BrowserContext + page inside an already running browser"""
+        engine = cls(timeout=timeout, max_retries=max_retries, selector_cache=selector_cache,
+                     retry_policy=retry_policy, circuit_breaker=circuit_breaker,
+                     screenshot_writer=screenshot_writer, snapshot_store=snapshot_store)
+        engine.browser = browser
+        await engine._new_context(storage_state)
+        if block_profile:
+            await engine.block_resources(block_profile)
+        if storage_state is not None:
+            engine.active_snapshot = snapshot_name
+        return engine
+
+    async def _new_context(self, storage_state=None):
+        self.context = await self.browser.new_context(storage_state=storage_state, **self._context_options)
+        self.page = await self.context.new_page()
+        self.lifecycle.watch(self.context)
+
+    # === RETRY POLICY ===
+    async def _retry_operation(self, func, *args, **kwargs):
+        """See PlaywrightEngine._retry_operation - backoff sleeps without blocking other tasks"""
+        attempts = RetryAttempts(self, func.__name__, args)
+        try:
+            for _ in attempts:
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    wait_time = attempts.failed(e)
+                    await asyncio.sleep(wait_time)
+                    attempts.backed_off(wait_time)
+                else:
+                    return attempts.succeeded(result)
+        finally:
+            attempts.close()
+
+    def bind_page(self, page):
+        """
+        Engine for one parallel branch, driving `page` in this engine's context.
+        Shared with this engine: browser, context (and so its routes), selector
+        cache, circuit breaker, screenshot writer and blocking stats. The branch's
+        own: its page, retry policies and step/task deadlines - a set_retry_policy
+        step in one branch doesn't change the others. Routes it adds are tracked
+        by this engine's lifecycle. Never quit() a bound engine.
+        """
+        bound = type(self)(timeout=self.timeout, max_retries=self.max_retries, headless=self.headless,
+                           selector_cache=self.selector_cache, retry_policy=self.retry_policy,
+                           action_policies=self.action_policies, circuit_breaker=self.circuit_breaker,
+                           screenshot_writer=self.screenshot_writer, lifecycle=self.lifecycle,
+                           snapshot_store=self.snapshots)
+        bound.browser = self.browser
+        bound.context = self.context
+        bound._shares_context = True
+        bound.page = page
+        bound.active_snapshot = self.active_snapshot
+        bound.blocking = self.blocking
+        bound.blocking_stats = self.blocking_stats
+        bound.run_stats = []   # reported by the engine that owns the run
+        bound.run_context = self.run_context   # task deadline, wait mode, metrics
+        bound.hooks = self.hooks
+        return bound
+
+    async def _resolve(self, selector, state="visible", timeout=None, wait=True):
+        """See PlaywrightEngine._resolve - candidate lists resolve in one page query"""
+        if not is_candidate_list(selector):
+            return selector
+        origin, candidates, in_page = self._candidate_order(selector)
+        if not wait:
+            index = (await self.page.evaluate(PROBE_JS, [candidates, state]) if in_page
+                     else await self._probe_locators(candidates, state))
+        else:
+            timeout = self._clamp(self.timeout if timeout is None else timeout)
+            try:
+                if in_page:
+                    handle = await self.page.wait_for_function(PROBE_JS, arg=[candidates, state],
+                                                               timeout=timeout, polling=100)
+                    index = await handle.json_value()
+                else:
+                    index = await self._probe_locators(candidates, state, timeout)
+            except PlaywrightTimeoutError:
+                raise self._no_candidate(candidates, state, timeout)
+        return self._record_winner(origin, selector, candidates, index)
+
+    async def _probe_locators(self, candidates, state, timeout=None):
+        """See PlaywrightEngine._probe_locators"""
+        for pause in self._probe_rounds(timeout):
+            await asyncio.sleep(pause)
+            for index, candidate in enumerate(candidates, 1):
+                locator = self.page.locator(candidate).first
+                try:
+                    if await locator.count() if state == "attached" else await locator.is_visible():
+                        return index
+                except PlaywrightError:
+                    if self.page.is_closed():
+                        raise
+                    # otherwise an invalid selector - never matches, as in PROBE_JS
+        return 0
+
+    async def open(self, url, wait_until="networkidle"):
+        await self._retry_operation(self._open_impl, url, wait_until)
+
+    async def _open_impl(self, url, wait_until="networkidle"):
+        await self.page.goto(url, wait_until=wait_until)
+
+    async def click(self, selector):
+        await self._retry_operation(self._click_impl, selector)
+
+    async def _click_impl(self, selector):
+        await self.page.click(await self._resolve(selector), timeout=self._clamp(self.timeout))
+
+    async def type(self, selector, value):
+        await self._retry_operation(self._type_impl, selector, value)
+
+    async def _type_impl(self, selector, value):
+        selector = await self._resolve(selector, timeout=5000)
+        await self.page.wait_for_selector(selector, timeout=self._clamp(5000))
+        await self.page.click(selector)
+        await self.page.fill(selector, value)
+
+    async def wait_seconds(self, seconds):
+        await asyncio.sleep(seconds)
+        self.timings["sleep"] += seconds
+
+    async def wait_until_ready(self, seconds, until="dom_stable", selector=None, quiet_ms=500):
+        """See PlaywrightEngine.wait_until_ready - returns seconds waited"""
+        started = time.perf_counter()
+        timeout_ms = max(int(seconds * 1000), 1)
+        try:
+            if until == "selector":
+                if not selector: raise ValueError("until='selector' needs a 'selector'")
+                if is_candidate_list(selector):
+                    await self._resolve(selector, timeout=timeout_ms)
+                else:
+                    await self.page.locator(selector).first.wait_for(state="visible", timeout=timeout_ms)
+            elif until == "navigation":
+                await self.page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            elif until == "network_idle":
+                await self.page.wait_for_load_state("networkidle", timeout=timeout_ms)
+            elif until == "dom_stable":
+                await self.page.wait_for_function(self._DOM_STABLE_JS, arg=quiet_ms,
+                                                  timeout=timeout_ms, polling=100)
+            else:
+                raise ValueError(f"Unknown wait condition '{until}'")
+        except PlaywrightTimeoutError:
+            pass  # upper bound reached - same outcome as the fixed sleep
+        waited = time.perf_counter() - started
+        self.timings["sleep"] += waited
+        return waited
+
+    async def wait_for_selector(self, selector, timeout=10000):
+        await self._retry_operation(self._wait_selector_impl, selector, timeout)
+
+    async def _wait_selector_impl(self, selector, timeout):
+        await self.page.wait_for_selector(await self._resolve(selector, timeout=timeout), timeout=self._clamp(timeout))
+
+    async def scroll_to_selector(self, selector):
+        await self._retry_operation(self._scroll_selector_impl, selector)
+
+    async def _scroll_selector_impl(self, selector):
+        await self.page.eval_on_selector(await self._resolve(selector, "attached"), "el => el.scrollIntoView({block: 'center'})")
+
+    async def scroll_pixels(self, pixels):
+        await self._retry_operation(self._scroll_pixels_impl, pixels)
+
+    async def _scroll_pixels_impl(self, pixels):
+        await self.page.evaluate(f"window.scrollBy(0, {pixels})")
+
+    async def hover(self, selector):
+        await self._retry_operation(self._hover_impl, selector)
+
+    async def _hover_impl(self, selector):
+        await self.page.hover(await self._resolve(selector))
+
+    async def double_click(self, selector):
+        await self._retry_operation(self._dblclick_impl, selector)
+
+    async def _dblclick_impl(self, selector):
+        await self.page.dblclick(await self._resolve(selector))
+
+    async def right_click(self, selector):
+        await self._retry_operation(self._rightclick_impl, selector)
+
+    async def _rightclick_impl(self, selector):
+        await self.page.click(await self._resolve(selector), button="right")
+
+    async def drag_drop(self, source_selector, target_selector):
+        await self._retry_operation(self._dragdrop_impl, source_selector, target_selector)
+
+    async def _dragdrop_impl(self, source_selector, target_selector):
+        await self.page.drag_and_drop(await self._resolve(source_selector),
+                                       await self._resolve(target_selector))
+
+    async def select_option(self, selector, option, method="text"):
+        await self._retry_operation(self._select_impl, selector, option, method)
+
+    async def _select_impl(self, selector, option, method):
+        selector = await self._resolve(selector)
+        if method == "text":
+            await self.page.select_option(selector, label=option)
+        elif method == "value":
+            await self.page.select_option(selector, value=option)
+        else:
+            await self.page.select_option(selector, index=int(option))
+
+    async def clear(self, selector):
+        await self._retry_operation(self._clear_impl, selector)
+
+    async def _clear_impl(self, selector):
+        await self.page.fill(await self._resolve(selector), "")
+
+    async def screenshot(self, filename=None, fmt=None, quality=None, selector=None, full_page=False):
+        """See PlaywrightEngine.screenshot - the disk write happens on the writer thread"""
+        return await self._retry_operation(self._screenshot_impl, filename, fmt, quality, selector, full_page)
+
+    async def _screenshot_impl(self, filename, fmt=None, quality=None, selector=None, full_page=False):
+        if not filename:
+            filename = f"screenshot_{int(time.time())}.png"
+        fmt = format_for(filename, fmt)
+        options = {"type": "jpeg" if fmt == "jpeg" else "png"}
+        if fmt == "jpeg" and quality:
+            options["quality"] = quality
+        if selector:
+            data = await self.page.locator(await self._resolve(selector)).first.screenshot(**options)
+        else:
+            data = await self.page.screenshot(full_page=full_page, **options)
+        # submit() blocks while the writer's queue is full - keep that off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.screenshot_writer.submit, f"screenshots/{filename}", data, fmt, quality)
+
+    async def expect_screenshot(self, selector, filename, tolerance=10, max_diff_ratio=0.001, ignore=()):
+        """See PlaywrightEngine.expect_screenshot - the pixel diff runs in a worker thread"""
+        mask_selectors = [item for item in ignore if isinstance(item, str)]
+        regions = [tuple(item) for item in ignore if not isinstance(item, str)]
+        data = await self._retry_operation(self._element_png_impl, selector, mask_selectors)
+        baseline_path = Path("baselines") / filename
+        if not baseline_path.exists():
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_bytes(data)
+            print(f"🆕 Baseline created: {baseline_path}")
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        ratio, mask, actual = await loop.run_in_executor(
+            None, visual_diff.compare, baseline_path.read_bytes(), data, tolerance, regions)
+        print(f"👁️ Visual diff: {ratio:.4%} of pixels differ (limit {max_diff_ratio:.4%})")
+        if ratio > max_diff_ratio:
+            diff_path = Path("screenshots") / f"diff_{Path(filename).stem}.png"
+            await loop.run_in_executor(None, visual_diff.write_diff_image, diff_path, actual, mask)
+            raise AssertionError(f"Screenshot mismatch for {selector}: {ratio:.4%} differ "
+                                 f"(diff: {diff_path})")
+        return ratio
+
+    async def _element_png_impl(self, selector, mask_selectors):
+        masks = [self.page.locator(s) for s in mask_selectors]
+        return await self.page.locator(await self._resolve(selector)).first.screenshot(
+            type="png", mask=masks, animations="disabled")
+
+    async def switch_window(self, window):
+        await self._retry_operation(self._switch_impl, window)
+
+    async def _switch_impl(self, window):
+        if window == "next":
+            await self.context.pages[-1].bring_to_front()
+
+    async def back(self):
+        await self._retry_operation(self._back_impl)
+
+    async def _back_impl(self):
+        await self.page.go_back()
+
+    async def forward(self):
+        await self._retry_operation(self._forward_impl)
+
+    async def _forward_impl(self):
+        await self.page.go_forward()
+
+    async def refresh(self):
+        await self._retry_operation(self._refresh_impl)
+
+    async def _refresh_impl(self):
+        await self.page.reload()
+
+    async def close(self):
+        await self._retry_operation(self._close_impl)
+
+    async def _close_impl(self):
+        """Close the current page and carry on in the newest remaining one (a blank page if none)"""
+        await self.page.close()
+        pages = [page for page in self.context.pages if not page.is_closed()]
+        self.page = pages[-1] if pages else await self.context.new_page()
+
+    async def set_download_path(self, path):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self.download_dir = path
+
+    async def expect_download(self, selector):
+        return await self._retry_operation(self._download_impl, selector)
+
+    async def _download_impl(self, selector):
+        async with self.page.expect_download(timeout=self._clamp(self.timeout)) as download_info:
+            await self.page.click(await self._resolve(selector), timeout=self._clamp(self.timeout))
+        download = await download_info.value
+        path = str(Path(self.download_dir) / download.suggested_filename)
+        await download.save_as(path)
+        return path
+
+    async def get_text(self, selector):
+        return await self._retry_operation(self._get_text_impl, selector)
+
+    async def _get_text_impl(self, selector):
+        return await self.page.inner_text(await self._resolve(selector, "attached"))
+
+    async def get_attribute(self, selector, attr):
+        return await self._retry_operation(self._get_attr_impl, selector, attr)
+
+    async def _get_attr_impl(self, selector, attr):
+        return await self.page.get_attribute(await self._resolve(selector, "attached"), attr)
+
+    async def extract(self, fields, row_selector=None, batch_size=500):
+        """Async generator of record batches - see PlaywrightEngine.extract"""
+        fields = normalize_fields(fields)
+        key = uuid.uuid4().hex   # names this extraction's row list in the page
+        offset = 0
+        while True:
+            batch = await self._retry_operation(self._extract_impl, fields, row_selector, key, offset, batch_size)
+            if batch["records"]:
+                yield batch["records"]
+            offset += len(batch["records"])
+            if not batch["records"] or offset >= batch["total"]:
+                return
+
+    async def _extract_impl(self, fields, row_selector, key, offset, limit):
+        return await self.page.evaluate(EXTRACT_JS, [row_selector, fields, key, offset, limit])
+
+    async def is_visible(self, selector):
+        return await self._retry_operation(self._is_visible_impl, selector)
+
+    async def _is_visible_impl(self, selector):
+        selector = await self._resolve(selector, wait=False)
+        return selector is not None and await self.page.is_visible(selector)
+
+    # === TRACING & VIDEO ===
+    async def start_tracing(self, name="trace"):
+        await self.context.tracing.start(name=name, screenshots=True, snapshots=True, sources=False)
+        self._explicit_trace = name
+
+    async def stop_tracing(self, filename=None):
+        """Write the trace started by start_tracing to traces/ - returns its path"""
+        if self._explicit_trace is None:
+            print("ℹ️ No start_tracing trace to stop")
+            return None
+        filename = filename or f"{self._explicit_trace}_{int(time.time())}.zip"
+        path = str(Path("traces") / filename)
+        await self.context.tracing.stop(path=path)
+        self._explicit_trace = None
+        return path
+
+    async def record_video(self, output_dir="videos"):
+        """See PlaywrightEngine.record_video - the session moves into a new recording context"""
+        if self._shares_context:
+            raise RuntimeError("record_video can't replace the context shared by parallel branches")
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        self._context_options["record_video_dir"] = output_dir
+        url = self.page.url
+        await self._replace_context()
+        if url and url != "about:blank":
+            await self.open(url)
+
+    # === SESSION SNAPSHOTS ===
+    async def save_storage_state(self, name, ttl=None, guard_selector=None):
+        state = await self.context.storage_state()
+        path = self.snapshots.save_state(name, state, ttl, guard_selector)
+        self.active_snapshot = name
+        return path
+
+    async def load_storage_state(self, name):
+        """Apply a snapshot to the running context - False if missing or expired"""
+        state = self.snapshots.load(name)
+        if state is None:
+            return False
+        await self.apply_storage_state(state)
+        self.active_snapshot = name
+        return True
+
+    async def apply_storage_state(self, state):
+        """See PlaywrightEngine.apply_storage_state"""
+        if state.get("cookies"):
+            await self.context.add_cookies(state["cookies"])
+        origins = self._local_storage_items(state)
+        if not origins:
+            return
+
+        async def blank(route):
+            await route.fulfill(status=200, content_type="text/html", body=self._BLANK_DOCUMENT)
+
+        page = await self.context.new_page()
+        try:
+            await page.route("**/*", blank)
+            for origin, items in origins:
+                await page.goto(origin.rstrip("/") + "/", wait_until="domcontentloaded")
+                await page.evaluate(self._SET_LOCAL_STORAGE_JS, items)
+        finally:
+            await page.close()
+
+    async def check_session(self, name, guard_selector=None):
+        """Invalidate `name` and raise SessionExpiredError if its guard selector is visible"""
+        guard_selector = guard_selector or self.snapshots.guard_selector(name)
+        if not guard_selector:
+            return True
+        if await self.page.is_visible(guard_selector):
+            self.snapshots.invalidate(name)
+            if self.active_snapshot == name:
+                self.active_snapshot = None
+            raise SessionExpiredError(f"Session '{name}' expired ({guard_selector} visible)")
+        return True
+
+    # === CHECKPOINTS ===
+    async def checkpoint_state(self):
+        return self.page.url, await self.context.storage_state()
+
+    async def restore_checkpoint(self, url, storage_state):
+        if storage_state:
+            await self.apply_storage_state(storage_state)
+        if url and url != "about:blank":
+            await self.open(url)
+
+    # === NETWORK ===
+    async def block_resources(self, profile, resource_types=(), domains=(), url_patterns=()):
+        """See PlaywrightEngine.block_resources"""
+        blocking = get_profile(profile).merged(resource_types, domains, url_patterns)
+        if not self.lifecycle.task_active:
+            self._base_blocking = blocking
+            if self._blocking_route != "persistent":
+                await self._route_blocking_profile(persistent=True)
+        elif self._blocking_route is None:
+            await self._route_blocking_profile(persistent=False)
+        self.blocking = blocking
+        print(f"🚫 Blocking profile: {blocking.name}")
+
+    async def _route_blocking_profile(self, persistent):
+        await self.lifecycle.route(self.context, "**/*", self._route_blocking, persistent=persistent)
+        self._blocking_route = "persistent" if persistent else "task"
+
+    async def _route_blocking(self, route):
+        request = route.request
+        if self.blocking is None:
+            await route.fallback()   # a task's profile was dropped between tasks
+            return
+        reason = self.blocking.match(request.url, request.resource_type)
+        self.blocking_stats.record(reason)
+        if reason:
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    async def mock_api(self, url_pattern, response_data, status=200):
+        body = json.dumps(response_data)
+
+        async def fulfill(route):
+            await route.fulfill(status=status, content_type="application/json", body=body)
+        await self.lifecycle.route(self.context, url_pattern, fulfill)
+
+    async def intercept_request(self, url_pattern, action="abort"):
+        """See PlaywrightEngine.intercept_request"""
+        if action == "abort":
+            await self.lifecycle.route(self.context, url_pattern, lambda route: route.abort())
+        elif action == "continue":
+            await self.lifecycle.route(self.context, url_pattern, lambda route: route.fallback())
+        elif action == "network":
+            await self.lifecycle.route(self.context, url_pattern, lambda route: route.continue_())
+        else:
+            raise ValueError(f"Unknown intercept action '{action}' (use 'abort', 'continue' or 'network')")
+
+    # === LIFECYCLE ===
+    async def _launch_browser(self):
+        marker = f"--pw-engine={uuid.uuid4().hex}"   # tags this Chromium's command line
+        browser = await self.playwright.chromium.launch(headless=self.headless, args=[marker])
+        self._browser_pids = browser_root_pids(marker)   # one /proc scan per launch, not per task
+        return browser
+
+    def browser_pids(self):
+        """Root PIDs of the Chromium this engine launched ([] for a from_browser worker)"""
+        return self._browser_pids
+
+    async def begin_task(self):
+        """See PlaywrightEngine.begin_task - returns the resource sample"""
+        lifecycle = self.lifecycle
+        sample = lifecycle.sample(self.context, self.browser_pids())
+        self.page = self._live_page() or await self.context.new_page()
+        await lifecycle.cleanup(self.context, self.page)
+        if self._blocking_route == "task":
+            self._blocking_route = None
+        self.blocking = self._base_blocking
+        due = lifecycle.recycle_due(sample)
+        if due:
+            await self.recycle(*due)
+        lifecycle.start_task()
+        return sample
+
+    def end_task(self):
+        self.lifecycle.end_task()
+
+    async def recycle(self, scope="context", reason=""):
+        """
+        Move to a fresh context - or a relaunched Chromium (scope="browser",
+        only for an engine that launched it) - keeping the session. Task routes
+        are dropped, the blocking profile is reinstalled.
+        """
+        relaunch = scope == "browser" and self._owns_browser
+        print(f"♻️ Recycling {'browser' if relaunch else 'context'}{f': {reason}' if reason else ''}")
+        await self._replace_context(relaunch)
+        self.lifecycle.counters["browser_recycles" if relaunch else "context_recycles"] += 1
+
+    async def _replace_context(self, relaunch=False):
+        """
+        Carry the storage state over into a new context - on a relaunched
+        Chromium with relaunch=True. The blocking profile is reinstalled; task
+        routes (mock_api, intercept_request) are not.
+        """
+        state = await self.context.storage_state()
+        old_context = self.context
+        self.lifecycle.forget(old_context)
+        try:
+            await old_context.close()
+            if relaunch:
+                await self.browser.close()
+        except Exception as e:
+            print(f"⚠️ Closing the old {'browser' if relaunch else 'context'} failed: {str(e)[:80]}")
+        if relaunch:
+            self.browser = await self._launch_browser()
+        await self._new_context(state)
+        self._blocking_route = None
+        if self.blocking is not None:
+            await self._route_blocking_profile(persistent=self._base_blocking is not None)
+
+    async def _shutdown(self, what, func):
+        try:
+            await func()
+        except Exception as e:
+            print(f"⚠️ {what} failed during quit: {type(e).__name__}: {str(e)[:80]}")
+
+    async def quit(self):
+        """See PlaywrightEngine.quit - a failing step is logged and the rest still run"""
+        loop = asyncio.get_running_loop()
+        writer = self.screenshot_writer
+        await self._shutdown("Screenshot writer flush", lambda: loop.run_in_executor(None, writer.flush))
+        if self._owns_writer:
+            await self._shutdown("Screenshot writer close", lambda: loop.run_in_executor(None, writer.close))
+        if self._owns_browser:
+            await self._shutdown("Browser close", self.browser.close)
+            await self._shutdown("Playwright stop", self.playwright.stop)
+        elif self.context:
+            self.lifecycle.forget(self.context)
+            await self._shutdown("Context close", self.context.close)
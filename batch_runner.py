@@ -0,0 +1,289 @@
+"""
+Run a directory or manifest of task files across a pool of worker processes.
+
+    python batch_runner.py tasks/ --workers 4 --task-timeout 300
+    python batch_runner.py manifest.txt --report batch_report.json --prometheus batch.prom
+
+Each worker owns its own Chromium (a one-browser BrowserPool) and pulls the next
+task as soon as it is free, so one slow task never leaves other workers idle.
+A worker that crashes or overruns --task-timeout is killed and replaced; only
+its current task is marked failed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import runpy
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from pathlib import Path
+
+TASK_SUFFIXES = (".json", ".py")
+
+
+def discover_tasks(source):
+    """Task file paths from a directory, or a manifest (.txt one-per-line, or .json list)"""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(str(p) for p in source.iterdir()
+                      if p.suffix in TASK_SUFFIXES and not p.name.startswith(("_", ".")))
+    if source.suffix == ".json":
+        with open(source) as f:
+            entries = json.load(f)
+        if entries and isinstance(entries[0], dict):
+            return [str(source)]   # a task file itself, not a manifest
+    else:
+        with open(source) as f:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [str((source.parent / entry).resolve()) if not os.path.isabs(entry) else entry
+            for entry in entries]
+
+
+def load_task(path):
+    """TASK list from a .json file or a .py module defining TASK"""
+    if path.endswith(".py"):
+        namespace = runpy.run_path(path)
+        if "TASK" not in namespace: raise ValueError(f"{path} does not define TASK")
+        return namespace["TASK"]
+    with open(path) as f:
+        return json.load(f)
+
+
+def _worker_main(conn, options):
+    # Imported here so the parent process never loads Playwright
+    from action_runner import run_actions
+    from browser_pool import BrowserPool
+    from metrics import REGISTRY
+    from task_compiler import compile_task
+    from trace_recorder import TraceRecorder
+
+    recorder = None
+    if options["trace_sample"] is not None:
+        recorder = TraceRecorder(sample_rate=options["trace_sample"])
+    pool = BrowserPool(size=1, contexts_per_browser=1, headless=options["headless"],
+                       max_retries=options["max_retries"], recycle_after=options["recycle_after"],
+                       trace_recorder=recorder)
+    try:
+        while True:
+            path = conn.recv()
+            if path is None:
+                break
+            REGISTRY.reset()
+            if recorder is not None:
+                recorder.last_run = None
+            try:
+                plan = compile_task(load_task(path))
+                with pool.lease() as engine:
+                    result = run_actions(engine, plan, wait_mode=options["wait_mode"])
+                payload = result.as_dict()
+            except Exception as e:
+                payload = {"passed": False, "error": str(e), "error_type": type(e).__name__}
+            if recorder is not None and recorder.last_run:
+                payload["trace"] = recorder.last_run
+            conn.send(("done", path, payload, list(REGISTRY.records)))
+    finally:
+        pool.close()
+
+
+class _Worker:
+    def __init__(self, worker_id, options):
+        self.worker_id = worker_id
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main, args=(child_conn, options), name=f"pw-worker-{worker_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+        self.completed = 0
+
+    def assign(self, path):
+        self.conn.send(path)
+        self.task = path
+        self.started = time.monotonic()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def run_batch(task_paths, workers=None, task_timeout=None, headless=True, max_retries=3,
+              wait_mode="fixed", recycle_after=200, trace_sample=None):
+    """
+    Run every task file; returns (report dict, merged MetricsRegistry).
+    trace_sample (0-1) traces every task, keeping failed ones plus that share of passing ones.
+    """
+    from metrics import MetricsRegistry
+
+    options = {"headless": headless, "max_retries": max_retries, "wait_mode": wait_mode,
+               "recycle_after": recycle_after, "trace_sample": trace_sample}
+    pending = deque(task_paths)
+    worker_count = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    pool = {}
+    next_id = 0
+    results = []
+    merged = MetricsRegistry()
+    counts = {"crashed": 0, "timed_out": 0, "restarts": 0}
+
+    def spawn():
+        nonlocal next_id
+        next_id += 1
+        pool[next_id] = _Worker(next_id, options)
+
+    def finish(worker, payload):
+        results.append({"task": worker.task, "worker": worker.worker_id,
+                        "seconds": time.monotonic() - worker.started, **payload})
+        worker.task = None
+        worker.started = None
+
+    def replace(worker, payload):
+        finish(worker, payload)
+        worker.kill()
+        del pool[worker.worker_id]
+        if pending:
+            counts["restarts"] += 1
+            spawn()
+
+    started = time.perf_counter()
+    for _ in range(worker_count):
+        spawn()
+    print(f"🚀 {len(pending)} tasks across {worker_count} workers")
+
+    while pending or any(w.task for w in pool.values()):
+        for worker in list(pool.values()):
+            if worker.task is None and pending:
+                if not worker.process.is_alive():
+                    # Died while idle (e.g. browser failed to launch) - nothing to report
+                    worker.kill()
+                    del pool[worker.worker_id]
+                    counts["restarts"] += 1
+                    spawn()
+                    continue
+                worker.assign(pending.popleft())
+
+        busy = [w for w in pool.values() if w.task]
+        handles = {}
+        for worker in busy:
+            handles[worker.conn] = worker
+            handles[worker.process.sentinel] = worker
+        for ready in wait(list(handles), timeout=0.5):
+            worker = handles[ready]
+            if worker.worker_id not in pool or worker.task is None:
+                continue
+            if ready is worker.conn:
+                try:
+                    _, path, payload, records = worker.conn.recv()
+                except (EOFError, OSError):
+                    continue   # died mid-send - handled as a crash below
+                for record in records:
+                    merged.ingest(record)
+                worker.completed += 1
+                status = "✅" if payload.get("passed") else "❌"
+                print(f"{status} [worker {worker.worker_id}] {path}")
+                finish(worker, payload)
+
+        now = time.monotonic()
+        for worker in list(pool.values()):
+            if worker.task is None:
+                continue
+            if not worker.process.is_alive():
+                counts["crashed"] += 1
+                print(f"💥 [worker {worker.worker_id}] crashed on {worker.task} "
+                      f"(exit {worker.process.exitcode})")
+                replace(worker, {"passed": False, "error_type": "WorkerCrashed",
+                                 "error": f"worker exited with code {worker.process.exitcode}"})
+            elif task_timeout and now - worker.started > task_timeout:
+                counts["timed_out"] += 1
+                print(f"⏰ [worker {worker.worker_id}] {worker.task} exceeded {task_timeout}s")
+                replace(worker, {"passed": False, "error_type": "TaskTimeout",
+                                 "error": f"exceeded {task_timeout}s"})
+
+    for worker in pool.values():
+        try:
+            worker.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for worker in pool.values():
+        worker.process.join(30)
+        if worker.process.is_alive():
+            worker.kill()
+
+    elapsed = time.perf_counter() - started
+    passed = sum(1 for r in results if r.get("passed"))
+    report = {
+        "tasks": len(results),
+        "passed": passed,
+        "failed": len(results) - passed,
+        **counts,
+        "workers": worker_count,
+        "elapsed_seconds": elapsed,
+        "tasks_per_minute": len(results) / elapsed * 60 if elapsed else 0.0,
+        "actions": {action: {"count": hist.count, "total_seconds": hist.sum}
+                    for action, hist in merged.by_action.items()},
+        "results": results,
+    }
+    traced = [r["trace"] for r in results if r.get("trace")]
+    if traced:
+        report["tracing"] = {
+            "sample_rate": trace_sample,
+            "runs": len(traced),
+            "retained": sum(1 for t in traced if t["retained"]),
+            "bytes_written": sum(t["bytes_written"] for t in traced),
+            "tracing_ms_per_run": sum(t["tracing_seconds"] for t in traced) / len(traced) * 1000,
+            "cpu_seconds_per_run": sum(t["cpu_seconds"] for t in traced) / len(traced),
+            "peak_rss_mb": max(t["rss_mb"] for t in traced),
+        }
+    print(f"\n📊 {passed}/{len(results)} passed in {elapsed:.1f}s "
+          f"({report['tasks_per_minute']:.1f} tasks/min, {counts['crashed']} crashed, "
+          f"{counts['timed_out']} timed out)")
+    return report, merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run task files across worker processes")
+    parser.add_argument("source", help="directory of .json/.py task files, or a manifest")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--task-timeout", type=float, default=None, help="seconds before a task's worker is killed")
+    parser.add_argument("--headed", action="store_true", help="show the browser windows")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--wait-mode", choices=("fixed", "smart"), default="fixed")
+    parser.add_argument("--recycle-after", type=int, default=200, help="tasks per browser before relaunch")
+    parser.add_argument("--trace-sample", type=float, default=None,
+                        help="trace tasks; keep failures plus this share (0-1) of passing runs in traces/")
+    parser.add_argument("--report", default="batch_report.json", help="merged JSON report path")
+    parser.add_argument("--metrics-jsonl", default=None, help="write merged step records as JSON lines")
+    parser.add_argument("--prometheus", default=None, help="write merged metrics in Prometheus text format")
+    args = parser.parse_args(argv)
+
+    task_paths = discover_tasks(args.source)
+    if not task_paths:
+        parser.error(f"no task files found in {args.source}")
+
+    report, merged = run_batch(task_paths, workers=args.workers, task_timeout=args.task_timeout,
+                               headless=not args.headed, max_retries=args.max_retries,
+                               wait_mode=args.wait_mode, recycle_after=args.recycle_after,
+                               trace_sample=args.trace_sample)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    if "tracing" in report:
+        t = report["tracing"]
+        print(f"🎞️ Tracing: {t['retained']}/{t['runs']} retained, {t['bytes_written'] / (1024 * 1024):.1f} MB, "
+              f"{t['tracing_ms_per_run']:.0f} ms tracing and {t['cpu_seconds_per_run']:.2f}s CPU per run, "
+              f"peak RSS {t['peak_rss_mb']:.0f} MB")
+    print(f"📁 Report: {args.report}")
+    if args.metrics_jsonl:
+        merged.export_jsonl(args.metrics_jsonl)
+    if args.prometheus:
+        with open(args.prometheus, "w") as f:
+            f.write(merged.to_prometheus())
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
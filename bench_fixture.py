@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local pages built to exercise each action run_actions supports. Every page is
+# generated in-process so benchmarks never touch the network.
+PAGES = {
+    "/": """<h1 id="title">Benchmark fixture</h1>
+<a id="to-list" href="/list?n=50">list</a> <a href="/form">form</a> <a href="/drag">drag</a>
+<a href="/slow">slow</a> <a href="/delayed">delayed</a> <a href="/download">download</a>""",
+
+    "/slow": """<link rel="stylesheet" href="/asset/slow.css?ms=300">
+<script src="/asset/slow.js?ms=300"></script>
+<img src="/asset/pixel.png?ms=200" width="1" height="1">
+<h1 id="title">Slow page</h1>""",
+
+    "/delayed": """<h1 id="title">Delayed element</h1>
+<script>setTimeout(() => {
+  const el = document.createElement('button'); el.id = 'late'; el.textContent = 'Late';
+  document.body.appendChild(el);
+}, 800);</script>""",
+
+    "/form": """<h1 id="title">Form</h1>
+<input id="name" value="prefilled">
+<select id="choice"><option value="a">Alpha</option><option value="b">Beta</option></select>
+<button id="submit" onclick="document.getElementById('out').textContent = 'sent ' + document.getElementById('name').value">Send</button>
+<button id="dbl" ondblclick="this.textContent = 'double'">dbl</button>
+<button id="ctx" oncontextmenu="this.textContent = 'right'; return false">ctx</button>
+<div id="hover" onmouseover="this.textContent = 'hovered'">hover me</div>
+<p id="out" data-state="idle">waiting</p>
+<div style="height: 3000px"></div><p id="footer">footer</p>""",
+
+    "/drag": """<div id="source" draggable="true" style="width:80px;height:80px;background:#09c">drag</div>
+<div id="target" style="width:120px;height:120px;background:#eee;margin-top:40px"
+     ondragover="event.preventDefault()" ondrop="this.textContent = 'dropped'">drop</div>""",
+
+    "/download": """<a id="file" href="/asset/report.csv" download>report.csv</a>""",
+}
+
+
+def _list_page(n):
+    rows = "".join(
+        f'<li class="row"><span class="title">Item {i}</span> '
+        f'<a class="link" href="/item/{i}">open</a> <span class="price">{i * 3 % 97}.99</span></li>'
+        for i in range(n)
+    )
+    return f'<h1 id="title">List of {n}</h1><ul id="rows">{rows}</ul>'
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        delay_ms = int(query.get("ms", ["0"])[0])
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        path = parts.path
+        if path in PAGES:
+            self._send(200, f"<!doctype html><html><body>{PAGES[path]}</body></html>")
+        elif path == "/list":
+            n = int(query.get("n", ["1000"])[0])
+            self._send(200, f"<!doctype html><html><body>{_list_page(n)}</body></html>")
+        elif path.startswith("/item/"):
+            item = path.rsplit("/", 1)[1]
+            self._send(200, f'<!doctype html><html><body><h1 id="title">Item {item}</h1></body></html>')
+        elif path == "/asset/slow.css":
+            self._send(200, "body { font-family: sans-serif; }", "text/css")
+        elif path == "/asset/slow.js":
+            self._send(200, "window.__slowLoaded = true;", "application/javascript")
+        elif path == "/asset/pixel.png":
+            self._send(200, _PIXEL_PNG, "image/png")
+        elif path == "/asset/report.csv":
+            self._send(200, "id,value\n" + "".join(f"{i},{i * i}\n" for i in range(1000)), "text/csv",
+                       {"Content-Disposition": 'attachment; filename="report.csv"'})
+        elif path == "/api/data":
+            self._send(200, json.dumps({"items": list(range(20))}), "application/json")
+        else:
+            self._send(404, "not found", "text/plain")
+
+
+_PIXEL_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+class FixtureServer:
+    """
+    with FixtureServer() as base_url:
+        engine.open(f"{base_url}/form")
+    """
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), _FixtureHandler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with FixtureServer(port=8765) as base_url:
+        print(f"🧪 Fixture site on {base_url} - Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,342 @@
+"""
+Offline benchmark suite - every page comes from bench_fixture, so runs are
+repeatable and never touch the network.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.2
+
+Reports p50/p95 latency per action (one scenario per action run_actions
+supports), PlaywrightEngine startup time, multi-task throughput through
+async_action_runner.run_tasks, and a static task on the browser vs the
+HTTP fast path (http_engine.HybridEngine, needs lxml). With --baseline, any latency more than
+--threshold slower (or throughput more than --threshold lower) than the
+baseline is a regression and the exit code is 1.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import tempfile
+import time
+
+from bench_fixture import FixtureServer
+
+# name -> (setup steps, measured step). "{base}" is the fixture server URL.
+# The setup runs on every iteration so each measurement starts from the same page.
+SCENARIOS = {
+    "open": ([], {"action": "open", "url": "{base}/", "wait_until": "load"}),
+    "open_slow_resources": ([], {"action": "open", "url": "{base}/slow", "wait_until": "networkidle"}),
+    "click": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+              {"action": "click", "selector": "#submit"}),
+    "type": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+             {"action": "type", "selector": "#name", "value": "benchmark run"}),
+    "clear": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+              {"action": "clear", "selector": "#name"}),
+    "hover": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+              {"action": "hover", "selector": "#hover"}),
+    "double_click": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                     {"action": "double_click", "selector": "#dbl"}),
+    "right_click": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                    {"action": "right_click", "selector": "#ctx"}),
+    "select_option": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                      {"action": "select_option", "selector": "#choice", "option": "Beta"}),
+    "scroll_to": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                  {"action": "scroll_to", "selector": "#footer"}),
+    "scroll_pixels": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                      {"action": "scroll_pixels", "pixels": 800}),
+    "drag_drop": ([{"action": "open", "url": "{base}/drag", "wait_until": "load"}],
+                  {"action": "drag_drop", "source": "#source", "target": "#target"}),
+    "wait_for_delayed": ([{"action": "open", "url": "{base}/delayed", "wait_until": "domcontentloaded"}],
+                         {"action": "wait_for", "selector": "#late", "timeout": 5}),
+    "wait_until_selector": ([{"action": "open", "url": "{base}/delayed", "wait_until": "domcontentloaded"}],
+                            {"action": "wait", "seconds": 5, "until": "selector", "selector": "#late"}),
+    "get_text": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                 {"action": "get_text", "selector": "#title"}),
+    "get_attribute": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                      {"action": "get_attribute", "selector": "#out", "attribute": "data-state"}),
+    "assert_visible": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                       {"action": "assert_visible", "selector": "#title"}),
+    "assert_text": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                    {"action": "assert_text", "selector": "#title", "expected": "Form"}),
+    "extract_1000_rows": ([{"action": "open", "url": "{base}/list?n=1000", "wait_until": "load"}],
+                          {"action": "extract", "rows": "li.row",
+                           "fields": {"title": ".title", "href": {"selector": ".link", "attribute": "href"},
+                                      "price": ".price"}}),
+    "screenshot": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                   {"action": "screenshot", "filename": "bench_screenshot.png"}),
+    "expect_download": ([{"action": "open", "url": "{base}/download", "wait_until": "load"}],
+                        {"action": "expect_download", "selector": "#file"}),
+    "back": ([{"action": "open", "url": "{base}/", "wait_until": "load"},
+              {"action": "open", "url": "{base}/form", "wait_until": "load"}],
+             {"action": "back"}),
+    "refresh": ([{"action": "open", "url": "{base}/form", "wait_until": "load"}],
+                {"action": "refresh"}),
+}
+
+# Multi-task throughput: a short realistic task repeated across contexts
+THROUGHPUT_TASK = [
+    {"action": "open", "url": "{base}/form", "wait_until": "load"},
+    {"action": "type", "selector": "#name", "value": "throughput"},
+    {"action": "click", "selector": "#submit"},
+    {"action": "get_text", "selector": "#out"},
+]
+
+# Server-rendered reads only - the whole task can skip the browser (see http_engine)
+STATIC_TASK = [
+    {"action": "open", "url": "{base}/list?n=200"},
+    {"action": "get_text", "selector": "#title", "name": "title"},
+    {"action": "extract", "name": "rows", "rows": "li.row",
+     "fields": {"title": ".title", "href": {"selector": ".link", "property": "href"}, "price": ".price"}},
+]
+
+# Latency differences below this never count as a regression (timer noise)
+MIN_REGRESSION_MS = 5.0
+
+
+def _substitute(value, base):
+    if isinstance(value, str):
+        return value.replace("{base}", base)
+    if isinstance(value, dict):
+        return {k: _substitute(v, base) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, base) for v in value]
+    return value
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _latency_summary(samples):
+    millis = [s * 1000 for s in samples]
+    return {"samples": len(millis), "p50_ms": percentile(millis, 50),
+            "p95_ms": percentile(millis, 95), "min_ms": min(millis), "max_ms": max(millis)}
+
+
+def bench_actions(base, iterations=20, warmup=2, only=None):
+    """p50/p95 of each scenario's measured step, one shared engine for all scenarios"""
+    from action_runner import run_actions
+    from metrics import MetricsRegistry
+    from playwright_engine import PlaywrightEngine
+    from task_compiler import compile_task
+
+    results = {}
+    engine = PlaywrightEngine(headless=True)
+    engine.set_download_path("downloads")
+    try:
+        for name, (setup, measured) in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            plan = compile_task(_substitute(setup + [measured], base))
+            measured_idx = len(setup) + 1   # step indexes are 1-based
+            registry = MetricsRegistry()
+            failures = 0
+            for i in range(warmup + iterations):
+                if i == warmup:
+                    registry.reset()
+                    failures = 0
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    result = run_actions(engine, plan, metrics=registry)
+                if not result.passed:
+                    failures += 1
+            samples = [r["wall"] for r in registry.records if r["step"] == measured_idx and not r["failure"]]
+            if not samples:
+                print(f"❌ {name}: no successful samples ({failures} failed runs)")
+                results[name] = {"action": measured["action"], "samples": 0, "failures": failures}
+                continue
+            results[name] = {"action": measured["action"], "failures": failures, **_latency_summary(samples)}
+            print(f"⏱️ {name:<22} p50 {results[name]['p50_ms']:8.1f}ms  p95 {results[name]['p95_ms']:8.1f}ms"
+                  f"{f'  ({failures} failed)' if failures else ''}")
+    finally:
+        engine.quit()
+    return results
+
+
+def bench_startup(runs=5, connect=False):
+    """
+    Time to construct a ready PlaywrightEngine (Playwright + Chromium + page);
+    with connect=True, attaching to the browser_daemon instead of launching.
+    """
+    from playwright_engine import PlaywrightEngine
+
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            engine = PlaywrightEngine(headless=True, connect=connect)
+        samples.append(time.perf_counter() - started)
+        engine.quit()
+    summary = _latency_summary(samples)
+    label = "startup (daemon)" if connect else "startup"
+    print(f"🚀 {label:<22} p50 {summary['p50_ms']:8.1f}ms  p95 {summary['p95_ms']:8.1f}ms")
+    return summary
+
+
+def bench_throughput(base, tasks=24, concurrency=4):
+    """Tasks per minute for `tasks` copies of THROUGHPUT_TASK through run_tasks"""
+    from async_action_runner import run_tasks
+
+    task_list = [_substitute(THROUGHPUT_TASK, base) for _ in range(tasks)]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = asyncio.run(run_tasks(task_list, concurrency=concurrency))
+    summary = {"tasks": report["tasks"], "concurrency": concurrency, "passed": report["passed"],
+               "elapsed_seconds": report["elapsed_seconds"], "tasks_per_minute": report["tasks_per_minute"]}
+    print(f"📈 throughput             {summary['tasks_per_minute']:.1f} tasks/min "
+          f"({summary['passed']}/{summary['tasks']} passed, concurrency {concurrency})")
+    return summary
+
+
+def bench_fast_path(base, runs=10):
+    """
+    STATIC_TASK end to end (engine start to quit) on a PlaywrightEngine and on
+    a HybridEngine, which never needs the browser for it - plus whether both
+    returned the same values.
+    """
+    from action_runner import run_actions
+    from http_engine import HybridEngine
+    from playwright_engine import PlaywrightEngine
+    from task_compiler import compile_task
+
+    plan = compile_task(_substitute(STATIC_TASK, base))
+    factories = {"browser": lambda: PlaywrightEngine(headless=True),
+                 "http": lambda: HybridEngine(lambda: PlaywrightEngine(headless=True))}
+    summary = {}
+    values = {}
+    for label, factory in factories.items():
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                engine = factory()
+                try:
+                    result = run_actions(engine, plan, metrics=None)
+                finally:
+                    engine.quit()
+            samples.append(time.perf_counter() - started)
+            values[label] = result.values if result.passed else None
+        summary[label] = _latency_summary(samples)
+        print(f"⚡ static task ({label:<7})  p50 {summary[label]['p50_ms']:8.1f}ms  "
+              f"p95 {summary[label]['p95_ms']:8.1f}ms")
+    summary["matches_browser"] = values["http"] is not None and values["http"] == values["browser"]
+    print(f"⚡ fast path {summary['browser']['p50_ms'] / summary['http']['p50_ms']:.1f}x faster, "
+          f"results {'match' if summary['matches_browser'] else 'DIFFER from'} the browser")
+    return summary
+
+
+def compare(current, baseline, threshold=0.2, min_ms=MIN_REGRESSION_MS):
+    """List of regression descriptions (empty when current is within threshold of baseline)"""
+    regressions = []
+
+    def check_latency(label, now, before):
+        for key in ("p50_ms", "p95_ms"):
+            if key not in now or key not in before:
+                continue
+            if now[key] > before[key] * (1 + threshold) and now[key] - before[key] > min_ms:
+                # A 0ms baseline (too fast to measure) has no meaningful ratio
+                change = f"+{(now[key] / before[key] - 1) * 100:.0f}%" if before[key] else "was 0ms"
+                regressions.append(f"{label} {key}: {before[key]:.1f} -> {now[key]:.1f}ms ({change})")
+
+    for name, now in current.get("actions", {}).items():
+        before = baseline.get("actions", {}).get(name)
+        if before:
+            check_latency(name, now, before)
+    for key in ("startup", "startup_daemon"):
+        if current.get(key) and baseline.get(key):
+            check_latency(key, current[key], baseline[key])
+    if current.get("fast_path"):
+        if not current["fast_path"]["matches_browser"]:
+            regressions.append("fast_path: HTTP results differ from the browser's")
+        if baseline.get("fast_path"):
+            check_latency("fast_path", current["fast_path"]["http"], baseline["fast_path"]["http"])
+    now = (current.get("throughput") or {}).get("tasks_per_minute")
+    before = (baseline.get("throughput") or {}).get("tasks_per_minute")
+    if now is not None and before and now < before / (1 + threshold):
+        regressions.append(f"throughput: {before:.1f} -> {now:.1f} tasks/min "
+                           f"({(now / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark engine actions against a local fixture site")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to save results")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown ratio before a metric counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--iterations", type=int, default=20, help="measured runs per action scenario")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured runs per scenario")
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--daemon", action="store_true",
+                        help="also time startup when attaching to browser_daemon (started if needed)")
+    parser.add_argument("--tasks", type=int, default=24, help="tasks in the throughput run (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fast-path-runs", type=int, default=10,
+                        help="runs of the static task per engine for the HTTP fast path (0 to skip)")
+    parser.add_argument("--only", nargs="*", default=None, help="scenario names to run (default: all)")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    unknown = set(args.only or ()) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    if args.fast_path_runs:
+        import http_engine
+        if not http_engine.available():
+            print("ℹ️ Skipping the HTTP fast path comparison - pip install lxml cssselect")
+            args.fast_path_runs = 0
+
+    if args.daemon:
+        import browser_daemon
+        # Keep the daemon's state in the real working directory, not the scratch one
+        browser_daemon.STATE_DIR = browser_daemon.STATE_DIR.resolve()
+        browser_daemon.start(headless=True)
+
+    # Screenshots/downloads land in a scratch directory, not the working tree
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="pw-bench-") as scratch, FixtureServer() as base:
+        os.chdir(scratch)
+        try:
+            print(f"🧪 Fixture site on {base}")
+            results = {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "iterations": args.iterations,
+                "actions": bench_actions(base, args.iterations, args.warmup, args.only),
+                "startup": bench_startup(args.startup_runs) if args.startup_runs else None,
+                "startup_daemon": bench_startup(args.startup_runs, connect=True)
+                                  if args.startup_runs and args.daemon else None,
+                "throughput": bench_throughput(base, args.tasks, args.concurrency) if args.tasks else None,
+                "fast_path": bench_fast_path(base, args.fast_path_runs) if args.fast_path_runs else None,
+            }
+        finally:
+            os.chdir(cwd)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📁 Results: {output}")
+
+    if not baseline_path:
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) vs {baseline_path} (threshold {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print(f"\n✅ No regressions vs {baseline_path} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
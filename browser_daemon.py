@@ -0,0 +1,293 @@
+"""
+Keep one Chromium running between CLI invocations.
+
+    python browser_daemon.py start --headless --viewport 1280x800 --idle-timeout 900
+    python browser_daemon.py status
+    python browser_daemon.py stop
+
+The daemon runs Playwright's browser server (`python -m playwright launch-server`)
+and records its websocket endpoint in .browser_daemon/state.json. Engines
+created with PlaywrightEngine(connect=True) attach over that websocket and
+only create a fresh context, instead of launching Chromium themselves. Each
+connected engine holds a lease file; once no lease is held for
+--idle-timeout seconds the daemon stops the browser and exits.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlsplit
+
+STATE_DIR = Path(os.environ.get("PW_DAEMON_DIR", ".browser_daemon"))
+DEFAULT_IDLE_TIMEOUT = 600
+CHECK_INTERVAL = 5
+
+
+def _state_file(state_dir=None):
+    return Path(state_dir or STATE_DIR) / "state.json"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_state(state_dir=None):
+    """The running daemon's state dict, or None"""
+    try:
+        with open(_state_file(state_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(state, state_dir=None):
+    target = _state_file(state_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, target)
+
+
+def health(state_dir=None, timeout=2.0):
+    """(ok, reason) - daemon and browser server processes alive and the websocket port accepting"""
+    state = read_state(state_dir)
+    if state is None:
+        return False, "not running"
+    if not _pid_alive(state["pid"]):
+        return False, f"daemon process {state['pid']} is gone"
+    if not _pid_alive(state["server_pid"]):
+        return False, f"browser server process {state['server_pid']} is gone"
+    parts = urlsplit(state["ws_endpoint"])
+    try:
+        with socket.create_connection((parts.hostname, parts.port), timeout=timeout):
+            pass
+    except OSError as e:
+        return False, f"websocket port not accepting connections: {e}"
+    return True, "ok"
+
+
+# === LEASES ===
+def acquire_lease(state_dir=None):
+    """Mark this process as a user of the daemon - returns the lease path for release_lease()"""
+    lease_dir = Path(state_dir or STATE_DIR) / "leases"
+    lease_dir.mkdir(parents=True, exist_ok=True)
+    lease = lease_dir / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    lease.write_text(str(time.time()))
+    return str(lease)
+
+
+def release_lease(lease):
+    try:
+        os.unlink(lease)
+    except FileNotFoundError:
+        pass
+
+
+def _live_leases(lease_dir):
+    """Leases whose process is still running - leftovers of crashed clients are removed"""
+    live = 0
+    for lease in lease_dir.glob("*"):
+        pid = lease.name.split("-", 1)[0]
+        if pid.isdigit() and _pid_alive(int(pid)):
+            live += 1
+        else:
+            release_lease(lease)
+    return live
+
+
+# === DAEMON PROCESS ===
+def _launch_server(options, state_dir):
+    """Start `python -m playwright launch-server` - returns (process, ws endpoint)"""
+    config = Path(state_dir) / "server_config.json"
+    with open(config, "w") as f:
+        json.dump({"headless": options["headless"], "args": options["args"], "host": "127.0.0.1"}, f)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "playwright", "launch-server", "--browser", "chromium", "--config", str(config)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        start_new_session=True,   # own process group, so the node driver dies with it
+    )
+    ws_endpoint = server.stdout.readline().strip()
+    if not ws_endpoint.startswith("ws"):
+        _kill_server(server)
+        raise RuntimeError(f"browser server did not report a websocket endpoint (got {ws_endpoint!r})")
+    # Keep reading, or the server blocks once the pipe buffer fills up
+    threading.Thread(target=_forward_output, args=(server.stdout,), name="browser-server-output",
+                     daemon=True).start()
+    return server, ws_endpoint
+
+
+def _forward_output(stream):
+    """Copy the browser server's output to ours - daemon.log when started by start()"""
+    for line in stream:
+        print(f"[browser server] {line.rstrip()}", flush=True)
+    stream.close()
+
+
+def _kill_server(server):
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(server.pid, signal.SIGTERM)
+        else:
+            server.terminate()
+        server.wait(10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        server.kill()
+
+
+def serve(options, state_dir=None):
+    """Daemon main loop: run the browser server, restart it if it dies, exit when idle"""
+    state_dir = Path(state_dir or STATE_DIR)
+    lease_dir = state_dir / "leases"
+    lease_dir.mkdir(parents=True, exist_ok=True)
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    server, ws_endpoint = _launch_server(options, state_dir)
+    state = {"pid": os.getpid(), "server_pid": server.pid, "ws_endpoint": ws_endpoint,
+             "started": time.time(), "restarts": 0, **options}
+    _write_state(state, state_dir)
+    last_active = time.monotonic()
+    try:
+        while not stopping:
+            time.sleep(CHECK_INTERVAL)
+            if server.poll() is not None:
+                # Health check failed - bring the browser back under a new endpoint
+                try:
+                    server, ws_endpoint = _launch_server(options, state_dir)
+                except Exception as e:
+                    # Keep the dead server - the next check tries again
+                    print(f"⚠️ Browser server restart failed: {e}", flush=True)
+                else:
+                    state.update(server_pid=server.pid, ws_endpoint=ws_endpoint, restarts=state["restarts"] + 1)
+                    _write_state(state, state_dir)
+            if _live_leases(lease_dir):
+                last_active = time.monotonic()
+            elif options["idle_timeout"] and time.monotonic() - last_active > options["idle_timeout"]:
+                break
+    finally:
+        _kill_server(server)
+        current = read_state(state_dir)
+        if current and current.get("pid") == os.getpid():
+            _state_file(state_dir).unlink()
+
+
+def start(headless=True, args=(), viewport=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, state_dir=None,
+          wait=30.0):
+    """Start the daemon in the background (no-op if a healthy one is running) - returns its state"""
+    ok, _ = health(state_dir)
+    if ok:
+        return read_state(state_dir)
+    state_dir = Path(state_dir or STATE_DIR)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    if read_state(state_dir):
+        stop(state_dir)   # unhealthy daemon - replace it
+        _state_file(state_dir).unlink(missing_ok=True)
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--state-dir", str(state_dir),
+               "--idle-timeout", str(idle_timeout), "--headless" if headless else "--headed"]
+    if viewport:
+        command += ["--viewport", f"{viewport['width']}x{viewport['height']}"]
+    for arg in args:
+        command.append(f"--arg={arg}")
+    with open(state_dir / "daemon.log", "a") as log:
+        daemon = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                                  start_new_session=True)
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        ok, reason = health(state_dir)
+        if ok:
+            return read_state(state_dir)
+        if daemon.poll() is not None:
+            reason = f"daemon exited with code {daemon.returncode}"
+            break
+        time.sleep(0.1)
+    raise RuntimeError(f"Browser daemon failed to start ({reason}) - see {state_dir / 'daemon.log'}")
+
+
+def stop(state_dir=None, wait=15.0):
+    """Ask the daemon to shut down - False if none was running"""
+    state = read_state(state_dir)
+    if state is None or not _pid_alive(state["pid"]):
+        return False
+    os.kill(state["pid"], signal.SIGTERM)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline and _pid_alive(state["pid"]):
+        time.sleep(0.1)
+    return True
+
+
+def ensure_running(headless=None, state_dir=None):
+    """
+    State of a healthy daemon, starting one with default settings if needed.
+    headless=None takes the running daemon as it is (a new one is headless).
+    """
+    ok, _ = health(state_dir)
+    if ok:
+        state = read_state(state_dir)
+        if headless is not None and state.get("headless") != headless:
+            # One shared browser - its mode was fixed when the daemon started
+            print(f"⚠️ Browser daemon runs with headless={state.get('headless')}, not headless={headless} - "
+                  f"reusing it (run 'python browser_daemon.py stop' to change)")
+        return state
+    print("🛰️ No browser daemon running - starting one")
+    return start(headless=True if headless is None else headless, state_dir=state_dir)
+
+
+def _viewport(value):
+    if not value:
+        return None
+    width, _, height = value.lower().partition("x")
+    return {"width": int(width), "height": int(height)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-lived Chromium shared by PlaywrightEngine(connect=True)")
+    parser.add_argument("command", choices=("start", "stop", "status", "serve"))
+    parser.add_argument("--headless", dest="headless", action="store_true", default=True)
+    parser.add_argument("--headed", dest="headless", action="store_false")
+    parser.add_argument("--viewport", default=None, help="WIDTHxHEIGHT for new contexts (default: window size)")
+    parser.add_argument("--arg", dest="args", action="append", default=[], help="extra Chromium launch arg")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="seconds without a connected engine before shutdown (0 = never)")
+    parser.add_argument("--state-dir", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve({"headless": args.headless, "args": args.args, "viewport": _viewport(args.viewport),
+               "idle_timeout": args.idle_timeout}, args.state_dir)
+        return 0
+    if args.command == "start":
+        state = start(args.headless, args.args, _viewport(args.viewport), args.idle_timeout, args.state_dir)
+        print(f"🛰️ Browser daemon {state['pid']} at {state['ws_endpoint']}")
+        return 0
+    if args.command == "stop":
+        print("🛑 Browser daemon stopped" if stop(args.state_dir) else "ℹ️ No browser daemon running")
+        return 0
+    ok, reason = health(args.state_dir)
+    state = read_state(args.state_dir)
+    if not ok:
+        print(f"❌ Browser daemon unhealthy: {reason}")
+        return 1
+    leases = _live_leases(Path(args.state_dir or STATE_DIR) / "leases")
+    print(f"✅ Browser daemon {state['pid']} at {state['ws_endpoint']} - up {time.time() - state['started']:.0f}s, "
+          f"{leases} connected, {state['restarts']} restarts, headless={state['headless']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+from playwright.sync_api import sync_playwright
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import uuid
+
+from playwright_engine import PlaywrightEngine
+from process_stats import browser_rss_mb
+from screenshot_writer import ScreenshotWriter
+from selector_healing import SelectorCache
+
+
+class _PooledBrowser:
+    def __init__(self, browser, marker):
+        self.browser = browser
+        self.marker = marker
+        self.idle = []          # warm contexts ready to lease
+        self.leased = 0
+        self.tasks = 0
+        self.retiring = False
+
+
+class BrowserPool:
+    """
+    Keeps `size` warm Chromium browsers with pre-created contexts.
+
+    pool = BrowserPool(size=2, contexts_per_browser=2, recycle_after=200, max_rss_mb=1500)
+    with pool.lease() as engine:
+        run_actions(engine, TASK)
+    print(pool.stats())
+
+    Contexts are reset (cookies, storage, routes, extra pages, permissions) when
+    returned. A browser is recycled after `recycle_after` tasks or once its process
+    tree grows past `max_rss_mb`. Leased engines share the pool's selector cache
+    and screenshot writer thread.
+    """
+    def __init__(self, size=2, contexts_per_browser=2, recycle_after=200, max_rss_mb=None,
+                 headless=True, timeout=15000, max_retries=3, launch_args=None, trace_recorder=None):
+        if size < 1: raise ValueError("'size' must be >= 1")
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.headless = headless
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.launch_args = list(launch_args or [])
+        self.trace_recorder = trace_recorder   # traces one lease at a time (e.g. a batch worker)
+
+        self.playwright = None
+        self._browsers = []
+        self._owners = {}       # id(context) -> _PooledBrowser
+        self._origins = {}      # id(context) -> origins touched, for storage reset
+        self.selector_cache = SelectorCache()   # shared by every leased engine
+        self.screenshot_writer = None           # one writer thread for every lease, from start()
+        self._counters = {"hits": 0, "misses": 0, "recycles": 0, "resets": 0, "reset_failures": 0}
+
+    def start(self):
+        if self.playwright is None:
+            self.playwright = sync_playwright().start()
+            self.screenshot_writer = ScreenshotWriter()
+            for _ in range(self.size):
+                self._browsers.append(self._launch())
+        return self
+
+    def _launch(self):
+        marker = f"--pw-pool={uuid.uuid4().hex}"
+        browser = self.playwright.chromium.launch(
+            headless=self.headless, args=self.launch_args + [marker]
+        )
+        pooled = _PooledBrowser(browser, marker)
+        for _ in range(self.contexts_per_browser):
+            pooled.idle.append(self._new_context(pooled))
+        return pooled
+
+    def _new_context(self, pooled):
+        context = pooled.browser.new_context(viewport=None)
+        origins = set()
+        self._owners[id(context)] = pooled
+        self._origins[id(context)] = origins
+
+        def track(page):
+            page.on("framenavigated", lambda frame: self._remember_origin(origins, frame.url))
+
+        context.on("page", track)
+        track(context.new_page())
+        return context
+
+    @staticmethod
+    def _remember_origin(origins, url):
+        parts = urlsplit(url)
+        if parts.scheme in ("http", "https"):
+            origins.add(f"{parts.scheme}://{parts.netloc}")
+
+    def acquire(self):
+        self.start()
+        candidates = [b for b in self._browsers if not b.retiring]
+        if not candidates:
+            # Every browser is draining towards a recycle - bring up its replacement early
+            candidates = [self._launch()]
+            self._browsers.append(candidates[0])
+        warm = [b for b in candidates if b.idle]
+        if warm:
+            pooled = min(warm, key=lambda b: b.leased)
+            context = pooled.idle.pop()
+            self._counters["hits"] += 1
+        else:
+            pooled = min(candidates, key=lambda b: b.leased)
+            context = self._new_context(pooled)
+            self._counters["misses"] += 1
+        pooled.leased += 1
+        return PlaywrightEngine(timeout=self.timeout, max_retries=self.max_retries, context=context,
+                                selector_cache=self.selector_cache, trace_recorder=self.trace_recorder,
+                                screenshot_writer=self.screenshot_writer)
+
+    def release(self, engine):
+        context = engine.context
+        pooled = self._owners.get(id(context))
+        if pooled is None:
+            raise ValueError("Engine was not leased from this pool")
+        pooled.leased -= 1
+        pooled.tasks += 1
+        # Stops tracing, flushes the shared screenshot writer, detaches the engine's listeners/routes
+        engine.quit()
+
+        if self._should_recycle(pooled):
+            pooled.retiring = True
+            self._forget(context)
+            if pooled.leased == 0:
+                self._recycle(pooled)
+            return
+
+        if self._reset_context(context):
+            pooled.idle.append(context)
+        else:
+            self._forget(context)
+            try:
+                context.close()
+            except Exception:
+                pass
+            pooled.idle.append(self._new_context(pooled))
+
+    @contextmanager
+    def lease(self):
+        engine = self.acquire()
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def _should_recycle(self, pooled):
+        if pooled.retiring:
+            return True
+        if self.recycle_after and pooled.tasks >= self.recycle_after:
+            return True
+        if self.max_rss_mb:
+            rss = browser_rss_mb(pooled.marker)
+            if rss is not None and rss > self.max_rss_mb:
+                print(f"♻️ Browser RSS {rss:.0f}MB > {self.max_rss_mb}MB")
+                return True
+        return False
+
+    def _recycle(self, pooled):
+        for context in pooled.idle:
+            self._forget(context)
+        try:
+            pooled.browser.close()
+        except Exception as e:
+            print(f"⚠️ Browser close failed during recycle: {str(e)[:50]}")
+        self._browsers.remove(pooled)
+        if sum(1 for b in self._browsers if not b.retiring) < self.size:
+            self._browsers.append(self._launch())
+        self._counters["recycles"] += 1
+        print(f"♻️ Recycled browser after {pooled.tasks} tasks")
+
+    def _forget(self, context):
+        self._owners.pop(id(context), None)
+        self._origins.pop(id(context), None)
+
+    def _reset_context(self, context):
+        """Scrub a returned context back to a clean state - False if it must be replaced"""
+        try:
+            pages = context.pages
+            for page in pages[1:]:
+                page.close()
+            page = pages[0] if pages else context.new_page()
+
+            context.unroute_all(behavior="ignoreErrors")
+            context.clear_cookies()
+            context.clear_permissions()
+
+            origins = self._origins.get(id(context), set())
+            if origins:
+                cdp = context.new_cdp_session(page)
+                try:
+                    for origin in origins:
+                        cdp.send("Storage.clearDataForOrigin",
+                                 {"origin": origin, "storageTypes": "all"})
+                finally:
+                    cdp.detach()
+                origins.clear()
+
+            page.goto("about:blank")
+            self._counters["resets"] += 1
+            return True
+        except Exception as e:
+            print(f"⚠️ Context reset failed, replacing: {str(e)[:50]}")
+            self._counters["reset_failures"] += 1
+            return False
+
+    def stats(self):
+        leases = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_ratio": self._counters["hits"] / leases if leases else 0.0,
+            "browsers": len(self._browsers),
+            "idle_contexts": sum(len(b.idle) for b in self._browsers),
+            "leased_contexts": sum(b.leased for b in self._browsers),
+        }
+
+    def close(self):
+        for pooled in self._browsers:
+            try:
+                pooled.browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        self._owners.clear()
+        self._origins.clear()
+        if self.screenshot_writer is not None:
+            self.screenshot_writer.close()
+            self.screenshot_writer = None
+        if self.playwright is not None:
+            self.playwright.stop()
+            self.playwright = None
@@ -0,0 +1,45 @@
+import json
+import os
+import time
+from pathlib import Path
+
+
+class CheckpointStore:
+    """
+    One resumable checkpoint per task key: the last good step index, page URL,
+    storage state and extracted values so far.
+    """
+    def __init__(self, path="checkpoints"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, key):
+        return self.path / f"{key}.json"
+
+    def save(self, key, step_idx, url, storage_state, values):
+        record = {
+            "saved_at": time.time(),
+            "step": step_idx,
+            "url": url,
+            "storage_state": storage_state,
+            "values": values,
+        }
+        target = self._file(key)
+        tmp = target.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp, target)
+        return str(target)
+
+    def load(self, key):
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def clear(self, key):
+        try:
+            self._file(key).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,217 @@
+import time
+from urllib.parse import urlsplit
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from metrics import hooks_for
+from retry_policy import FATAL, Deadline, DeadlineExceeded, classify, is_site_failure
+from selector_healing import LOCATOR_POLL_INTERVAL, needs_locator_probe
+
+PLAYWRIGHT_DEFAULT_TIMEOUT = 30000
+
+
+class RetryAttempts:
+    """
+    Bookkeeping for one _retry_operation call, shared by both engines:
+    deadlines, default timeouts, timings, hooks, the circuit breaker and the
+    retry/backoff decision. The engine only makes the call and sleeps:
+
+        attempts = RetryAttempts(engine, func.__name__, args)
+        try:
+            for _ in attempts:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    wait_time = attempts.failed(e)   # re-raises e when it must not be retried
+                    time.sleep(wait_time)
+                    attempts.backed_off(wait_time)
+                else:
+                    return attempts.succeeded(result)
+        finally:
+            attempts.close()
+    """
+    def __init__(self, engine, operation, args):
+        self.engine = engine
+        self.operation = operation
+        self.policy = engine._step_policy
+        self.deadline = engine._deadline()
+        self.hooks = hooks_for(engine)
+        self.origin = engine._origin(operation, args)
+        self.attempt = 0
+        self._probe = engine.circuit_breaker.check(self.origin)
+        self._started = None
+
+    def __iter__(self):
+        engine = self.engine
+        for attempt in range(1, self.policy.max_attempts + 1):
+            if self.deadline is not None:
+                if self.deadline.expired():
+                    raise DeadlineExceeded(f"{self.operation}: time budget exhausted before attempt {attempt}")
+                # Calls without an explicit timeout inherit the remaining budget
+                engine._set_default_timeouts(engine._clamp(PLAYWRIGHT_DEFAULT_TIMEOUT))
+            elif engine._timeouts_clamped:
+                engine._set_default_timeouts(PLAYWRIGHT_DEFAULT_TIMEOUT)
+            self.attempt = attempt
+            engine.timings["attempts"] += 1
+            for hook in self.hooks:
+                hook.before_attempt(engine, self.operation, attempt)
+            self._started = time.perf_counter()
+            yield attempt
+
+    def _elapsed(self):
+        elapsed = time.perf_counter() - self._started
+        self.engine.timings["playwright"] += elapsed
+        return elapsed
+
+    def succeeded(self, result):
+        elapsed = self._elapsed()
+        for hook in self.hooks:
+            hook.after_attempt(self.engine, self.operation, self.attempt, elapsed, None)
+        self.engine.circuit_breaker.record_success(self.origin)
+        print(f"✅ SUCCESS on attempt {self.attempt}")
+        return result
+
+    def failed(self, error):
+        """Seconds to back off before the next attempt - raises `error` if there is none"""
+        elapsed = self._elapsed()
+        for hook in self.hooks:
+            hook.after_attempt(self.engine, self.operation, self.attempt, elapsed, error)
+        if is_site_failure(error, self.operation):
+            self.engine.circuit_breaker.record_failure(self.origin)
+        max_attempts = self.policy.max_attempts
+        print(f"⚠️ Attempt {self.attempt}/{max_attempts} failed: {str(error)[:50]}")
+        if classify(error) == FATAL:
+            print(f"❌ FATAL {type(error).__name__} - not retrying")
+            raise error
+        if self.attempt >= max_attempts:
+            print(f"❌ FINAL FAILURE after {max_attempts} attempts")
+            raise error
+        wait_time = self.policy.backoff(self.attempt)
+        if self.deadline is not None and self.deadline.remaining() <= wait_time:
+            print("❌ Out of time budget - not retrying")
+            raise error
+        print(f"⏳ Retrying in {wait_time:.1f}s...")
+        for hook in self.hooks:
+            hook.on_backoff(self.engine, self.operation, wait_time)
+        return wait_time
+
+    def backed_off(self, wait_time):
+        self.engine.timings["backoff"] += wait_time
+
+    def close(self):
+        if self._probe is not None:
+            # No success/site-failure verdict - release the half-open slot
+            self.engine.circuit_breaker.end_probe(self.origin, self._probe)
+
+
+class EngineCore:
+    """
+    The parts of PlaywrightEngine and AsyncPlaywrightEngine that never touch
+    Playwright's sync/async API: retry policy and deadline bookkeeping,
+    candidate-selector ordering and storage-state preparation. Subclasses set
+    up retry_policy, action_policies, circuit_breaker, selector_cache, timings,
+    hooks, page and context, and keep only the Playwright calls themselves.
+    """
+    # Installed once per document - records the time of the last DOM mutation
+    _DOM_STABLE_JS = """quietMs => {
+        if (window.__pwLastMutation === undefined) {
+            window.__pwLastMutation = performance.now();
+            new MutationObserver(() => { window.__pwLastMutation = performance.now(); })
+                .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+            return false;
+        }
+        return performance.now() - window.__pwLastMutation >= quietMs;
+    }"""
+
+    # Served in place of the origin's real page while its localStorage is written
+    _BLANK_DOCUMENT = "<!doctype html><title></title>"
+    _SET_LOCAL_STORAGE_JS = "items => { for (const [k, v] of items) localStorage.setItem(k, v); }"
+
+    # === RETRY POLICY ===
+    def set_retry_policy(self, options, actions=None):
+        """Default policy (actions=None) or a policy for specific actions, from a dict"""
+        if not actions:
+            self.retry_policy = self.retry_policy.with_overrides(options)
+            return
+        for action in actions:
+            base = self.action_policies.get(action, self.retry_policy)
+            self.action_policies[action] = base.with_overrides(options)
+
+    def begin_step(self, action, overrides=None, task_deadline=None):
+        """Called by run_actions before each step - picks the policy and deadlines"""
+        policy = self.action_policies.get(action, self.retry_policy).with_overrides(overrides)
+        self._step_policy = policy
+        self._step_deadline = Deadline(policy.step_deadline) if policy.step_deadline else None
+        self._task_deadline = task_deadline
+
+    def _deadline(self):
+        return Deadline.earliest(self._step_deadline, self._task_deadline)
+
+    def _clamp(self, timeout_ms):
+        """Shrink a Playwright timeout to what is left of the step/task budget"""
+        deadline = self._deadline()
+        if deadline is None:
+            return timeout_ms
+        return max(min(timeout_ms, int(deadline.remaining() * 1000)), 1)
+
+    def _set_default_timeouts(self, timeout_ms):
+        # Plain calls in both Playwright APIs
+        self.page.set_default_timeout(timeout_ms)
+        self.page.set_default_navigation_timeout(timeout_ms)
+        self._timeouts_clamped = timeout_ms != PLAYWRIGHT_DEFAULT_TIMEOUT
+
+    def _origin(self, operation, args):
+        url = args[0] if operation == "_open_impl" and args else self.page.url
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}" if parts.scheme in ("http", "https") else None
+
+    # === SELF-HEALING SELECTORS ===
+    def _candidate_order(self, selector):
+        """(origin, candidates with last run's winner first, whether PROBE_JS can probe them)"""
+        origin = self._origin(None, ())
+        candidates = self.selector_cache.order(origin, selector)
+        return origin, candidates, not needs_locator_probe(candidates)
+
+    def _record_winner(self, origin, selector, candidates, index):
+        """The candidate at 1-based `index` (None for 0), remembered in selector_cache"""
+        if not index:
+            return None
+        winner = candidates[index - 1]
+        self.selector_cache.record(origin, list(selector), winner)
+        if winner != selector[0]:
+            print(f"🩹 Fallback selector matched: {winner}")
+        return winner
+
+    @staticmethod
+    def _no_candidate(candidates, state, timeout):
+        return PlaywrightTimeoutError(f"None of {len(candidates)} candidate selectors "
+                                      f"{state} within {timeout}ms: {candidates}")
+
+    @staticmethod
+    def _probe_rounds(timeout):
+        """
+        Pauses (seconds) before each _probe_locators pass: one pass when
+        `timeout` is None, else passes until `timeout` (ms) runs out.
+        """
+        yield 0
+        if timeout is None:
+            return
+        deadline = Deadline(timeout / 1000)
+        while not deadline.expired():
+            yield LOCATOR_POLL_INTERVAL
+        raise PlaywrightTimeoutError(f"Timeout {timeout}ms exceeded")
+
+    # === SESSIONS & PAGES ===
+    @staticmethod
+    def _local_storage_items(state):
+        """[(origin, [[key, value], ...])] for every origin of a storage_state with localStorage"""
+        origins = [(origin["origin"], [[item["name"], item["value"]] for item in origin.get("localStorage", [])])
+                   for origin in state.get("origins", [])]
+        return [(origin, items) for origin, items in origins if items]
+
+    def _live_page(self):
+        """The engine's page, or the first page still open if it was closed (None if none are)"""
+        if not self.page.is_closed():
+            return self.page
+        pages = [page for page in self.context.pages if not page.is_closed()]
+        return pages[0] if pages else None
@@ -0,0 +1,196 @@
+import time
+
+from process_stats import chromium_memory_mb
+
+
+class EngineLifecycle:
+    """
+    Everything a PlaywrightEngine registers on its context - routes and
+    listeners - plus the pages the context opens, so a long-running engine can
+    be cleaned up between tasks.
+
+    Routes and listeners added while a task runs are task-scoped: the next
+    begin_task() removes them and closes every page but the engine's own.
+    Ones added outside a task (engine setup, block_profile) stay. Each
+    begin_task() also samples open pages and browser/renderer RSS, and the
+    engine is recycled once a limit is exceeded:
+
+        max_pages            pages a task left open       -> fresh context
+        max_renderer_rss_mb  renderer processes' RSS      -> fresh context
+        max_browser_rss_mb   whole Chromium process tree  -> relaunch Chromium
+        recycle_after        tasks run in one context     -> fresh context
+    """
+    COUNTERS = ("tasks", "pages_opened", "pages_closed", "routes_removed", "listeners_removed",
+                "context_recycles", "browser_recycles", "cleanup_errors")
+
+    def __init__(self, max_pages=None, max_renderer_rss_mb=None, max_browser_rss_mb=None, recycle_after=None):
+        self.max_pages = max_pages
+        self.max_renderer_rss_mb = max_renderer_rss_mb
+        self.max_browser_rss_mb = max_browser_rss_mb
+        self.recycle_after = recycle_after
+        self.task_active = False
+        self.context_tasks = 0   # tasks since the current context was created
+        self._routes = []        # (context, pattern, handler, task_scoped)
+        self._listeners = []     # (target, event, handler, task_scoped)
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self._reported = {}
+        self.peaks = {"pages": 0, "browser_rss_mb": 0.0, "renderer_rss_mb": 0.0}
+        self.last_sample = None
+
+    # === TRACKING ===
+    def route(self, context, pattern, handler, persistent=None):
+        """context.route(), remembered - persistent defaults to "registered outside a task" """
+        context.route(pattern, handler)
+        self._routes.append((context, pattern, handler, self.task_active if persistent is None else not persistent))
+
+    def on(self, target, event, handler, persistent=None):
+        """target.on(), remembered the same way as route()"""
+        target.on(event, handler)
+        self._listeners.append((target, event, handler, self.task_active if persistent is None else not persistent))
+
+    def watch(self, context):
+        """Count the pages a context opens (popups, target=_blank links...)"""
+        self.on(context, "page", self._page_opened, persistent=True)
+
+    def _page_opened(self, page):
+        self.counters["pages_opened"] += 1
+
+    def forget(self, context):
+        """Drop everything registered on a context that is being closed"""
+        self._routes = [entry for entry in self._routes if entry[0] is not context]
+        self._listeners = [entry for entry in self._listeners
+                           if entry[0] is not context and getattr(entry[0], "context", None) is not context]
+        self.context_tasks = 0
+
+    # === BETWEEN TASKS ===
+    def _cleanup_error(self, what, error):
+        self.counters["cleanup_errors"] += 1
+        print(f"⚠️ Could not {what}: {str(error)[:80]}")
+
+    def cleanup(self, context, keep_page):
+        """Close every page but keep_page and remove task-scoped routes and listeners"""
+        for page in list(context.pages):
+            if page is keep_page:
+                continue
+            try:
+                page.close()
+                self.counters["pages_closed"] += 1
+            except Exception as e:
+                self._cleanup_error("close a leftover page", e)
+        self._remove(self._task_scoped)
+
+    def detach(self, context):
+        """Remove everything registered on a context that outlives the engine (a pool lease)"""
+        self._remove(self._on_context(context))
+        self.context_tasks = 0
+
+    @staticmethod
+    def _task_scoped(target, task_scoped):
+        return task_scoped
+
+    @staticmethod
+    def _on_context(context):
+        return lambda target, task_scoped: target is context or getattr(target, "context", None) is context
+
+    def _take(self, select):
+        """Stop tracking the routes and listeners `select` picks - returns them for removal"""
+        routes = [entry for entry in self._routes if select(entry[0], entry[3])]
+        listeners = [entry for entry in self._listeners if select(entry[0], entry[3])]
+        self._routes = [entry for entry in self._routes if entry not in routes]
+        self._listeners = [entry for entry in self._listeners if entry not in listeners]
+        return routes, listeners
+
+    def _remove(self, select):
+        routes, listeners = self._take(select)
+        for context, pattern, handler, _ in routes:
+            try:
+                context.unroute(pattern, handler)
+                self.counters["routes_removed"] += 1
+            except Exception as e:
+                self._cleanup_error(f"remove route {pattern}", e)
+        for target, event, handler, _ in listeners:
+            self._remove_listener(target, event, handler)
+
+    def _remove_listener(self, target, event, handler):
+        try:
+            target.remove_listener(event, handler)
+            self.counters["listeners_removed"] += 1
+        except Exception as e:
+            self._cleanup_error(f"remove '{event}' listener", e)
+
+    def sample(self, context, browser_pids=()):
+        """Open pages, tracked routes/listeners and Chromium RSS right now, plus counter increments"""
+        sample = {"ts": time.time(), "pages": len(context.pages), "routes": len(self._routes),
+                  "listeners": len(self._listeners), "browser_rss_mb": None, "renderer_rss_mb": None,
+                  "renderers": None}
+        if browser_pids:
+            sample.update(chromium_memory_mb(browser_pids) or {})
+        for key in self.peaks:
+            if sample[key] is not None:
+                self.peaks[key] = max(self.peaks[key], sample[key])
+        self.last_sample = sample
+        # Counter increments since the previous sample - registries sum them across engines
+        delta = {key: value - self._reported.get(key, 0) for key, value in self.counters.items()}
+        self._reported = dict(self.counters)
+        return {**sample, "counters": delta}
+
+    def recycle_due(self, sample):
+        """("browser" | "context", reason) when a limit is exceeded, else None"""
+        if self.max_browser_rss_mb and (sample["browser_rss_mb"] or 0) > self.max_browser_rss_mb:
+            return "browser", f"browser RSS {sample['browser_rss_mb']:.0f}MB > {self.max_browser_rss_mb}MB"
+        if self.max_renderer_rss_mb and (sample["renderer_rss_mb"] or 0) > self.max_renderer_rss_mb:
+            return "context", f"renderer RSS {sample['renderer_rss_mb']:.0f}MB > {self.max_renderer_rss_mb}MB"
+        if self.max_pages and sample["pages"] > self.max_pages:
+            return "context", f"{sample['pages']} pages open > {self.max_pages}"
+        if self.recycle_after and self.context_tasks >= self.recycle_after:
+            return "context", f"{self.context_tasks} tasks in this context"
+        return None
+
+    def start_task(self):
+        self.task_active = True
+        self.context_tasks += 1
+        self.counters["tasks"] += 1
+
+    def end_task(self):
+        self.task_active = False
+
+    def stats(self):
+        return {**self.counters, **{f"peak_{key}": value for key, value in self.peaks.items()},
+                "last_sample": self.last_sample}
+
+
+class AsyncEngineLifecycle(EngineLifecycle):
+    """
+    EngineLifecycle for AsyncPlaywrightEngine - route(), cleanup() and detach()
+    are awaitable because the async API's route/unroute/close are. Listeners
+    (page.on / remove_listener) are plain calls in both APIs.
+    """
+    async def route(self, context, pattern, handler, persistent=None):
+        await context.route(pattern, handler)
+        self._routes.append((context, pattern, handler, self.task_active if persistent is None else not persistent))
+
+    async def cleanup(self, context, keep_page):
+        for page in list(context.pages):
+            if page is keep_page:
+                continue
+            try:
+                await page.close()
+                self.counters["pages_closed"] += 1
+            except Exception as e:
+                self._cleanup_error("close a leftover page", e)
+        await self._remove(self._task_scoped)
+
+    async def detach(self, context):
+        await self._remove(self._on_context(context))
+        self.context_tasks = 0
+
+    async def _remove(self, select):
+        routes, listeners = self._take(select)
+        for context, pattern, handler, _ in routes:
+            try:
+                await context.unroute(pattern, handler)
+                self.counters["routes_removed"] += 1
+            except Exception as e:
+                self._cleanup_error(f"remove route {pattern}", e)
+        for target, event, handler, _ in listeners:
+            self._remove_listener(target, event, handler)
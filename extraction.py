@@ -0,0 +1,102 @@
+import csv
+import json
+from pathlib import Path
+
+# One in-page pass: every field of every row in [offset, offset + limit).
+# Field values match the single-selector actions: innerText (get_text),
+# getAttribute (get_attribute) or a DOM property. The batch at offset 0 keeps
+# the matched rows under `key`; later batches slice that fixed list, so rows
+# the page adds or removes meanwhile can't shift the offsets. The last batch
+# drops the list (a navigation drops it too - that batch then fails).
+EXTRACT_JS = """([rowSelector, fields, key, offset, limit]) => {
+    const pick = (root, spec) => {
+        const el = spec.selector ? root.querySelector(spec.selector) : root;
+        if (!el) return null;
+        if (spec.attribute) return el.getAttribute(spec.attribute);
+        if (spec.property) { const v = el[spec.property]; return v === undefined ? null : v; }
+        return el.innerText;
+    };
+    const snapshots = window.__pwExtractRows || (window.__pwExtractRows = {});
+    if (offset === 0) {
+        snapshots[key] = rowSelector ? Array.from(document.querySelectorAll(rowSelector)) : [document];
+    }
+    const all = snapshots[key];
+    if (!all) throw new Error("extract: the matched rows are gone - the page navigated between batches");
+    const rows = all.slice(offset, offset + limit);
+    if (offset + limit >= all.length) delete snapshots[key];
+    return {
+        total: all.length,
+        records: rows.map(row => {
+            const record = {};
+            for (const [name, spec] of Object.entries(fields)) record[name] = pick(row, spec);
+            return record;
+        }),
+    };
+}"""
+
+
+def normalize_fields(fields):
+    """{"name": "css"} or {"name": {"selector", "attribute"|"property"}} -> uniform dicts"""
+    if not isinstance(fields, dict) or not fields:
+        raise ValueError("'fields' must be a non-empty dict of name -> selector/spec")
+    normalized = {}
+    for name, spec in fields.items():
+        if isinstance(spec, str):
+            spec = {"selector": spec}
+        if not isinstance(spec, dict):
+            raise ValueError(f"field '{name}' must be a selector string or a dict")
+        unknown = set(spec) - {"selector", "attribute", "property"}
+        if unknown:
+            raise ValueError(f"field '{name}' has unknown key(s): {', '.join(sorted(unknown))}")
+        if spec.get("attribute") and spec.get("property"):
+            raise ValueError(f"field '{name}' takes 'attribute' or 'property', not both")
+        normalized[name] = {"selector": spec.get("selector") or "",
+                            "attribute": spec.get("attribute"),
+                            "property": spec.get("property")}
+    return normalized
+
+
+class JsonlSink:
+    def __init__(self, path, append=False):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a" if append else "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += len(records)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CsvSink:
+    def __init__(self, path, fieldnames, append=False):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        write_header = not append or not Path(self.path).exists() or Path(self.path).stat().st_size == 0
+        self._file = open(self.path, "a" if append else "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=list(fieldnames))
+        if write_header:
+            self._writer.writeheader()
+        self.count = 0
+
+    def write(self, records):
+        self._writer.writerows(records)
+        self.count += len(records)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def open_sink(path, fieldnames, append=False):
+    """JSONL or CSV sink, picked by file extension"""
+    if str(path).endswith(".csv"):
+        return CsvSink(path, fieldnames, append)
+    if str(path).endswith((".jsonl", ".ndjson")):
+        return JsonlSink(path, append)
+    raise ValueError(f"Unsupported sink '{path}' (use .jsonl or .csv)")
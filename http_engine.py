@@ -0,0 +1,634 @@
+"""
+Browserless fast path for server-rendered pages.
+
+HttpEngine answers open / get_text / get_attribute / extract from the raw
+HTML: one keep-alive HTTP fetch plus an lxml parse instead of a Chromium page
+waiting for networkidle. HybridEngine runs the leading static steps of a plan
+(see http_prefix) over HTTP and only starts the PlaywrightEngine when
+a step needs JS or interaction, or when the static HTML can't answer a read.
+"""
+import gzip
+import http.client
+import re
+import ssl
+import threading
+import time
+import urllib.request
+import zlib
+from http.cookiejar import CookieJar
+from urllib.parse import urljoin, urlsplit
+
+from extraction import normalize_fields
+from metrics import new_timings
+from retry_policy import DeadlineExceeded, RetryPolicy
+from selector_healing import LOCATOR_ONLY
+
+try:
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector, SelectorError
+except ImportError:
+    lxml_html = None
+    CSSSelector = None
+    SelectorError = None
+
+# Steps the HTTP path can run; everything else needs the browser
+HTTP_ACTIONS = ("open", "get_text", "get_attribute", "assert_text", "extract", "wait", "wait_seconds")
+# DOM properties extract can compute without a browser
+HTTP_PROPERTIES = ("textContent", "innerText", "href", "src", "id", "className", "title", "tagName")
+# Prefixes PROBE_JS understands but lxml's CSSSelector doesn't (see selector_healing.LOCATOR_ONLY)
+_ENGINE_PREFIXES = ("css=", "xpath=", "//")
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate",
+}
+MAX_REDIRECTS = 10
+SELECTOR_CACHE_SIZE = 512
+
+
+def available():
+    return lxml_html is not None
+
+
+def _require():
+    if lxml_html is None:
+        raise RuntimeError("The HTTP fast path needs lxml and cssselect: pip install lxml cssselect")
+
+
+class NeedsBrowser(Exception):
+    """The static HTML can't answer this call - run it in the browser instead"""
+
+
+# === ELIGIBILITY (used by task_compiler) ===
+def is_static_selector(selector):
+    """Plain CSS that lxml can evaluate - not a candidate list or Playwright selector syntax"""
+    if not isinstance(selector, str) or not selector.strip():
+        return False
+    selector = selector.strip()
+    return not selector.startswith(_ENGINE_PREFIXES) and not LOCATOR_ONLY.search(selector)
+
+
+def http_eligible(step):
+    """Can this step run on the HTTP path? ("browser": True on a step forces the browser)"""
+    action = step.get("action")
+    if action not in HTTP_ACTIONS or step.get("browser") or step.get("checkpoint") or step.get("skip_if_session"):
+        return False
+    selector = step.get("selector")
+    if selector is not None and not is_static_selector(selector):
+        return False
+    if action == "extract":
+        rows = step.get("rows")
+        if rows is not None and not is_static_selector(rows):
+            return False
+        try:
+            fields = normalize_fields(step.get("fields"))
+        except ValueError:
+            return False
+        for spec in fields.values():
+            if not spec["selector"] and not rows:
+                return False   # the document itself - only meaningful in a browser
+            if spec["selector"] and not is_static_selector(spec["selector"]):
+                return False
+            if spec["property"] and spec["property"] not in HTTP_PROPERTIES:
+                return False
+    return True
+
+
+def http_prefix(steps):
+    """How many leading CompiledSteps can run over HTTP - 0 unless the plan starts with open"""
+    count = 0
+    for compiled in steps:
+        if not http_eligible(compiled.step):
+            break
+        count += 1
+    return count if count and steps[0].action == "open" else 0
+
+
+# === innerText ===
+_BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "caption", "center", "dd", "details", "dialog", "div",
+    "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hgroup", "hr", "legend", "li", "main", "menu", "nav", "ol", "pre", "section", "summary",
+    "table", "tbody", "tfoot", "thead", "tr", "ul",
+))
+_NOT_RENDERED = frozenset(("script", "style", "template", "noscript", "head", "title", "meta", "link",
+                           "base", "iframe", "object", "embed", "audio", "video", "img", "input",
+                           "select", "textarea"))
+_PRESERVE_TAGS = frozenset(("pre", "textarea", "listing", "plaintext", "xmp"))
+_COLLAPSIBLE = re.compile(r"[ \t\n\r\f]+")
+_DISPLAY_NONE = re.compile(r"display\s*:\s*none", re.I)
+
+
+def _hidden(element):
+    return element.get("hidden") is not None or bool(_DISPLAY_NONE.search(element.get("style") or ""))
+
+
+def _collect(element, items, preserve):
+    tag = element.tag.lower() if isinstance(element.tag, str) else None
+    if tag is None or tag in _NOT_RENDERED or _hidden(element):
+        return
+    if tag == "br":
+        items.append(("\n", True))
+        return
+    preserve = preserve or tag in _PRESERVE_TAGS
+    breaks = 2 if tag == "p" else 1 if tag in _BLOCK_TAGS else 0
+    if breaks:
+        items.append(breaks)
+    if element.text:
+        items.append((element.text, preserve))
+    for child in element:
+        _collect(child, items, preserve)
+        if tag == "tr" and child.tag in ("td", "th") and child.getnext() is not None:
+            items.append(("\t", True))
+        if child.tail:
+            items.append((child.tail, preserve))
+    if breaks:
+        items.append(breaks)
+
+
+def inner_text(element):
+    """
+    HTMLElement.innerText for server HTML without stylesheets: whitespace
+    collapsed, line breaks around block elements (two around <p>), <br> as
+    a newline, tabs between table cells, hidden/non-rendered content skipped.
+    Like the browser, an element that is itself hidden returns its textContent.
+    """
+    if _hidden(element):
+        return element.text_content()
+    items = []
+    _collect(element, items, False)
+    out = []
+    pending = 0   # required line breaks before the next text
+    for item in items:
+        if isinstance(item, int):
+            if out:
+                pending = max(pending, item)
+            continue
+        text, preserve = item
+        if not preserve:
+            text = _COLLAPSIBLE.sub(" ", text)
+            if pending or not out or out[-1].endswith(("\n", " ", "\t")):
+                text = text.lstrip(" ")
+        if not text:
+            continue
+        if pending or text.startswith("\n"):
+            if out:
+                out[-1] = out[-1].rstrip(" ")
+            out.append("\n" * pending)
+            pending = 0
+        out.append(text)
+    return "".join(out).rstrip(" ")
+
+
+# === CONNECTIONS ===
+class ConnectionPool:
+    """Keep-alive http.client connections, up to `per_origin` idle ones per scheme/host/port"""
+    def __init__(self, per_origin=4, timeout=15.0):
+        self.per_origin = per_origin
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+        self.opened = 0
+        self.reused = 0
+
+    def _checkout(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            self.reused += 1
+            return conn, True
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self.opened += 1
+        return conn, False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.per_origin:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, url, headers, timeout=None):
+        """GET url - returns (response, body bytes)"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise NeedsBrowser(f"not an http(s) URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            conn, reused = self._checkout(key, timeout)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (ConnectionError, http.client.HTTPException):
+                conn.close()
+                if reused:
+                    continue   # the server dropped an idle keep-alive socket - retry on a fresh one
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return response, body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+# === ENGINE ===
+class HttpEngine:
+    """
+    The read-only part of PlaywrightEngine's surface, served from static HTML.
+    Anything the HTML can't answer (non-HTML responses, error statuses, meta
+    refresh, selectors that match nothing) raises NeedsBrowser rather than
+    returning a result the browser might not agree with.
+    """
+    def __init__(self, timeout=15000, max_retries=3, pool=None, headers=None, retry_policy=None):
+        _require()
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries)
+        self._step_policy = self.retry_policy
+        self._task_deadline = None
+        self.pool = pool or ConnectionPool(timeout=timeout / 1000)
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.cookies = CookieJar()
+        self.url = None
+        self.document = None
+        self.timings = new_timings()
+        self._selectors = {}
+        self.reset()
+
+    def reset(self):
+        self.fetches = 0
+        self.bytes = 0
+        self.fallbacks = 0   # counted by HybridEngine
+        self._pool_base = (self.pool.reused, self.pool.opened)   # the pool may be shared
+
+    def summary(self):
+        if not self.fetches and not self.fallbacks:
+            return None
+        return (f"⚡ HTTP fast path: {self.fetches} page(s), {self.bytes / 1024:.0f} KB, "
+                f"{self.pool.reused - self._pool_base[0]} reused / "
+                f"{self.pool.opened - self._pool_base[1]} opened connections, "
+                f"{self.fallbacks} fallback(s) to the browser")
+
+    def begin_step(self, action, overrides=None, task_deadline=None):
+        self._step_policy = self.retry_policy.with_overrides(overrides)
+        self._task_deadline = task_deadline
+
+    # === FETCH ===
+    def _fetch(self, url):
+        """Follow redirects like the browser - returns (final url, response, body)"""
+        for _ in range(MAX_REDIRECTS + 1):
+            request = urllib.request.Request(url, headers=self.headers)
+            self.cookies.add_cookie_header(request)
+            timeout = self.timeout / 1000
+            if self._task_deadline is not None:
+                if self._task_deadline.expired():
+                    raise DeadlineExceeded(f"open {url}: time budget exhausted")
+                timeout = max(min(timeout, self._task_deadline.remaining()), 0.001)
+            response, body = self.pool.request(url, dict(request.header_items()), timeout)
+            self.cookies.extract_cookies(response, request)
+            self.fetches += 1
+            self.bytes += len(body)
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return url, response, body
+        raise NeedsBrowser(f"more than {MAX_REDIRECTS} redirects from {url}")
+
+    def _load(self, url):
+        final_url, response, body = self._fetch(url)
+        if response.status >= 500:
+            raise _RetryableStatus(f"HTTP {response.status} from {final_url}")
+        if response.status >= 400:
+            raise NeedsBrowser(f"HTTP {response.status} from {final_url}")
+        content_type = response.getheader("Content-Type", "")
+        if "html" not in content_type.lower():
+            raise NeedsBrowser(f"not an HTML page ({content_type or 'no content type'})")
+        encoding = (response.getheader("Content-Encoding") or "").lower()
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        elif encoding not in ("", "identity"):
+            raise NeedsBrowser(f"unsupported content encoding '{encoding}'")
+        charset = re.search(r"charset=([\w-]+)", content_type, re.I)
+        try:
+            parser = lxml_html.HTMLParser(encoding=charset.group(1)) if charset else None
+            document = lxml_html.document_fromstring(body, parser=parser, base_url=final_url)
+        except LookupError:
+            raise NeedsBrowser(f"unknown charset '{charset.group(1)}' from {final_url}")
+        except Exception as e:
+            raise NeedsBrowser(f"could not parse {final_url}: {e}")
+        for meta in document.iter("meta"):
+            if (meta.get("http-equiv") or "").lower() == "refresh":
+                raise NeedsBrowser(f"{final_url} redirects with <meta http-equiv=refresh>")
+        return final_url, document
+
+    def open(self, url, wait_until="networkidle"):
+        """Fetch and parse url - wait_until is accepted for parity; static HTML is ready on arrival"""
+        policy = self._step_policy
+        for attempt in range(policy.max_attempts):
+            self.timings["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                self.url, self.document = self._load(url)
+                self.timings["playwright"] += time.perf_counter() - started
+                print(f"⚡ Fetched {self.url} without a browser")
+                return
+            except DeadlineExceeded:
+                raise   # a TimeoutError, so an OSError - but the task is over, not the fetch
+            except (OSError, http.client.HTTPException, _RetryableStatus) as e:
+                self.timings["playwright"] += time.perf_counter() - started
+                print(f"⚠️ Attempt {attempt + 1}/{policy.max_attempts} failed: {str(e)[:50]}")
+                if attempt == policy.max_attempts - 1:
+                    raise NeedsBrowser(f"could not fetch {url}: {e}")
+                wait_time = policy.backoff(attempt + 1)
+                if self._task_deadline is not None:
+                    wait_time = max(min(wait_time, self._task_deadline.remaining()), 0.0)
+                print(f"⏳ Retrying in {wait_time:.1f}s...")
+                time.sleep(wait_time)
+                self.timings["backoff"] += wait_time
+
+    def wait_seconds(self, seconds):
+        time.sleep(seconds)
+        self.timings["sleep"] += seconds
+
+    def wait_until_ready(self, seconds, until="dom_stable", selector=None, quiet_ms=500):
+        """A fetched document never changes - ready at once (a missing selector surfaces on the read)"""
+        return 0.0
+
+    # === QUERIES ===
+    def _compiled(self, selector):
+        compiled = self._selectors.get(selector)
+        if compiled is None:
+            try:
+                compiled = CSSSelector(selector)
+            except SelectorError as e:
+                raise NeedsBrowser(f"selector not supported without a browser: {selector} ({e})")
+            if len(self._selectors) >= SELECTOR_CACHE_SIZE:
+                self._selectors.clear()
+            self._selectors[selector] = compiled
+        return compiled
+
+    def _select(self, root, selector):
+        """querySelectorAll semantics - descendants of root only"""
+        if not is_static_selector(selector):
+            raise NeedsBrowser(f"selector not supported without a browser: {selector}")
+        return [el for el in self._compiled(selector)(root) if el is not root]
+
+    def _first(self, selector):
+        if self.document is None:
+            raise NeedsBrowser("no page fetched yet")
+        matches = self._select(self.document, selector)
+        if not matches:
+            # Maybe rendered by JS - the browser gets to wait for it
+            raise NeedsBrowser(f"'{selector}' not in the server-rendered HTML")
+        return matches[0]
+
+    def get_text(self, selector):
+        return inner_text(self._first(selector))
+
+    def get_attribute(self, selector, attr):
+        return self._first(selector).get(attr.lower())
+
+    def _property(self, el, name):
+        tag = el.tag.lower()
+        if name == "textContent":
+            return el.text_content()
+        if name == "innerText":
+            return inner_text(el)
+        if name == "tagName":
+            return tag.upper()
+        if name in ("id", "title", "className"):
+            return el.get("class" if name == "className" else name) or ""
+        if (name == "href" and tag in ("a", "area", "link", "base")) or (
+                name == "src" and tag in ("img", "script", "iframe", "source", "audio", "video", "embed", "track")):
+            value = el.get(name)
+            return urljoin(self.url, value.strip()) if value is not None else ""
+        if name in HTTP_PROPERTIES:
+            return None   # not a property of this element - undefined in the browser
+        raise NeedsBrowser(f"property '{name}' needs a browser")
+
+    def _pick(self, root, spec):
+        if spec["selector"]:
+            matches = self._select(root, spec["selector"])
+            if not matches:
+                return None
+            el = matches[0]
+        else:
+            el = root
+        if spec["attribute"]:
+            return el.get(spec["attribute"].lower())
+        if spec["property"]:
+            return self._property(el, spec["property"])
+        return inner_text(el)
+
+    def extract(self, fields, row_selector=None, batch_size=500):
+        """Same records as PlaywrightEngine.extract, in batches of batch_size"""
+        fields = normalize_fields(fields)
+        if self.document is None:
+            raise NeedsBrowser("no page fetched yet")
+        rows = self._select(self.document, row_selector) if row_selector else [self.document]
+        if row_selector and not rows:
+            raise NeedsBrowser(f"no '{row_selector}' rows in the server-rendered HTML")
+        started = time.perf_counter()
+        records = [{name: self._pick(row, spec) for name, spec in fields.items()} for row in rows]
+        self.timings["playwright"] += time.perf_counter() - started
+        # A field that is empty everywhere is probably filled in by JS
+        for name in fields:
+            if all(record[name] is None for record in records):
+                raise NeedsBrowser(f"field '{name}' not in the server-rendered HTML")
+        for offset in range(0, len(records), batch_size):
+            yield records[offset:offset + batch_size]
+
+    def quit(self):
+        self.pool.close()
+
+
+class HybridEngine:
+    """
+    PlaywrightEngine stand-in for run_actions: the plan's leading static
+    steps (http_prefix) run on an HttpEngine; the browser is
+    created by browser_factory() only when a step needs it. On a fallback the
+    browser reopens the current URL first, so later steps see the same page.
+    A fallback inside the prefix lasts until the prefix's next open; steps
+    after the prefix always run on the browser, even static ones.
+    """
+    def __init__(self, browser_factory, http=None, timeout=15000, max_retries=3, trace_recorder=None):
+        self.http = http or HttpEngine(timeout, max_retries)
+        self._browser_factory = browser_factory
+        self.browser = None
+        # The browser's recorder, if any - a run that never starts it just has no trace
+        self.trace_recorder = trace_recorder
+        self.hooks = []
+        self.run_stats = [self.http]
+        self._timings = new_timings()
+        self._step_args = (None, None, None)
+        self._on_http = False
+        self._plan = None
+        self._http_steps = 0
+
+    @property
+    def timings(self):
+        return self._timings
+
+    @timings.setter
+    def timings(self, value):
+        self._timings = value
+        self.http.timings = value
+        if self.browser is not None:
+            self.browser.timings = value
+
+    @property
+    def active_snapshot(self):
+        return self.browser.active_snapshot if self.browser is not None else None
+
+    def _ensure_browser(self):
+        if self.browser is None:
+            print("🌐 Starting the browser for steps the HTTP path can't run")
+            self.browser = self._browser_factory()
+            self.browser.timings = self._timings
+            if hasattr(self.browser, "begin_task"):
+                self.browser.begin_task()   # started mid-task - its routes belong to this task
+            self.browser.begin_step(*self._step_args)
+            self.run_stats.extend(self.browser.run_stats)   # same list run_actions reports from
+        return self.browser
+
+    def route_step(self, compiled, plan):
+        """Called by run_actions before each step of `plan` - HTTP for the plan's static prefix"""
+        if plan is not self._plan:
+            self._plan = plan
+            self._http_steps = http_prefix(plan.steps)
+        fast = compiled.index <= self._http_steps
+        if fast and compiled.action == "open":
+            self._on_http = True
+        elif not fast and self._on_http:
+            self._to_browser(f"'{compiled.action}' needs a browser")
+
+    def _to_browser(self, reason):
+        self._on_http = False
+        print(f"🌐 Switching to the browser: {reason}")
+        browser = self._ensure_browser()
+        if self.http.url:
+            browser.open(self.http.url)
+        return browser
+
+    def _fall_back(self, error, reopen=True):
+        self.http.fallbacks += 1
+        if reopen:
+            return self._to_browser(str(error))
+        self._on_http = False
+        print(f"🌐 Switching to the browser: {error}")
+        return self._ensure_browser()
+
+    def begin_task(self):
+        if self.browser is not None:
+            return self.browser.begin_task()
+        return None
+
+    def end_task(self):
+        if self.browser is not None:
+            self.browser.end_task()
+
+    def begin_step(self, action, overrides=None, task_deadline=None):
+        self._step_args = (action, overrides, task_deadline)
+        self.http.begin_step(action, overrides, task_deadline)
+        if self.browser is not None:
+            self.browser.begin_step(action, overrides, task_deadline)
+
+    # === FAST-PATH METHODS ===
+    def open(self, url, wait_until="networkidle"):
+        if self._on_http:
+            try:
+                return self.http.open(url, wait_until)
+            except NeedsBrowser as e:
+                return self._fall_back(e, reopen=False).open(url, wait_until)
+        return self._ensure_browser().open(url, wait_until)
+
+    def get_text(self, selector):
+        if self._on_http:
+            try:
+                return self.http.get_text(selector)
+            except NeedsBrowser as e:
+                return self._fall_back(e).get_text(selector)
+        return self._ensure_browser().get_text(selector)
+
+    def get_attribute(self, selector, attr):
+        if self._on_http:
+            try:
+                return self.http.get_attribute(selector, attr)
+            except NeedsBrowser as e:
+                return self._fall_back(e).get_attribute(selector, attr)
+        return self._ensure_browser().get_attribute(selector, attr)
+
+    def extract(self, fields, row_selector=None, batch_size=500):
+        if self._on_http:
+            try:
+                # Materialized first, so a fallback never follows batches already yielded
+                batches = list(self.http.extract(fields, row_selector, batch_size))
+            except NeedsBrowser as e:
+                return self._fall_back(e).extract(fields, row_selector, batch_size)
+            return iter(batches)
+        return self._ensure_browser().extract(fields, row_selector, batch_size)
+
+    def wait_seconds(self, seconds):
+        if self._on_http:
+            return self.http.wait_seconds(seconds)
+        return self._ensure_browser().wait_seconds(seconds)
+
+    def wait_until_ready(self, seconds, until="dom_stable", selector=None, quiet_ms=500):
+        if self._on_http:
+            return self.http.wait_until_ready(seconds, until, selector, quiet_ms)
+        return self._ensure_browser().wait_until_ready(seconds, until, selector, quiet_ms)
+
+    # === BROWSER-ONLY ===
+    def checkpoint_state(self):
+        if self._on_http:
+            return self.http.url, None
+        return self._ensure_browser().checkpoint_state()
+
+    def restore_checkpoint(self, url, storage_state):
+        self._on_http = False
+        self._ensure_browser().restore_checkpoint(url, storage_state)
+
+    def __getattr__(self, name):
+        # Everything else (click, type, screenshot, page, context...) is the browser's
+        if name.startswith("__") or "browser" not in self.__dict__:
+            raise AttributeError(name)
+        if self._on_http:
+            return getattr(self._to_browser(f"'{name}' needs a browser"), name)
+        return getattr(self._ensure_browser(), name)
+
+    def quit(self):
+        self.http.quit()
+        if self.browser is not None:
+            self.browser.quit()
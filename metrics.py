@@ -0,0 +1,263 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) for the latency histograms
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PHASES = ("playwright", "sleep", "backoff")
+
+# Selector labels are bounded: long selectors are shortened with a hash suffix and
+# once max_selectors series exist, new selectors share the OTHER_SELECTORS series
+MAX_SELECTOR_LABEL = 64
+OTHER_SELECTORS = "__other__"
+
+# Engine resource sample keys exported as gauges (see engine_lifecycle)
+RESOURCE_GAUGES = (
+    ("pages", "engine_open_pages", "Pages open in the engine's context when the latest task began"),
+    ("routes", "engine_routes", "Routes the engine has registered"),
+    ("listeners", "engine_listeners", "Event listeners the engine has registered"),
+    ("browser_rss_mb", "browser_rss_megabytes", "RSS of the whole Chromium process tree"),
+    ("renderer_rss_mb", "renderer_rss_megabytes", "RSS of Chromium renderer processes"),
+    ("renderers", "browser_renderer_processes", "Chromium renderer processes"),
+)
+
+_GLOBAL_HOOKS = []
+
+
+class Hook:
+    """
+    Base class for profilers/tracers - override any subset of these.
+    Attach with engine.hooks.append(hook) or metrics.add_hook(hook) for every engine.
+    """
+    def before_step(self, engine, compiled):
+        pass
+
+    def after_step(self, engine, compiled, record):
+        pass
+
+    def before_attempt(self, engine, operation, attempt):
+        pass
+
+    def after_attempt(self, engine, operation, attempt, duration, error):
+        pass
+
+    def on_backoff(self, engine, operation, seconds):
+        pass
+
+
+def add_hook(hook):
+    _GLOBAL_HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    _GLOBAL_HOOKS.remove(hook)
+
+
+def hooks_for(engine):
+    return list(getattr(engine, "hooks", ())) + _GLOBAL_HOOKS
+
+
+def selector_label(selector):
+    """Prometheus label for a selector - at most MAX_SELECTOR_LABEL chars, stable across runs"""
+    if len(selector) <= MAX_SELECTOR_LABEL:
+        return selector
+    digest = hashlib.sha1(selector.encode()).hexdigest()[:10]
+    return f"{selector[:MAX_SELECTOR_LABEL - 11]}~{digest}"
+
+
+def new_timings():
+    """Per-step accumulator the engine fills in while a step runs"""
+    return {"playwright": 0.0, "sleep": 0.0, "backoff": 0.0, "attempts": 0}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            yield bound, running
+
+
+class MetricsRegistry:
+    """
+    Aggregates step records across runs: latency histograms per action and per
+    selector, phase totals, attempts and failures. Export with export_jsonl()
+    or to_prometheus(). Pass jsonl_path to stream every record as it happens
+    (the file stays open until close()).
+    Records keep the full selector; the per-selector histograms are capped at
+    max_selectors series (see selector_label).
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_records=10000, jsonl_path=None, max_selectors=200):
+        self.buckets = tuple(buckets)
+        self.max_selectors = max_selectors
+        self.records = deque(maxlen=keep_records)
+        self.jsonl_path = jsonl_path
+        self._jsonl = None   # opened on the first streamed record
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.by_action = {}
+        self.by_selector = {}
+        self.phase_totals = {}     # (action, phase) -> seconds
+        self.attempts = {}         # action -> attempts
+        self.failures = {}         # (action, error type) -> count
+        self.resources = {}        # latest engine resource sample (pages, RSS...)
+        self.lifecycle = {}        # engine lifecycle counter -> total
+        self.records.clear()
+
+    def record_step(self, run_id, compiled, timings, wall, error=None):
+        step = compiled.step
+        selector = step.get("selector")
+        if isinstance(selector, (list, tuple)):
+            selector = " || ".join(selector)   # candidate list - one label for the step
+        record = {
+            "ts": time.time(),
+            "run_id": run_id,
+            "step": compiled.index,
+            "action": compiled.action,
+            "selector": selector,
+            "wall": wall,
+            "playwright": timings["playwright"],
+            "sleep": timings["sleep"],
+            "backoff": timings["backoff"],
+            "attempts": timings["attempts"],
+            "failure": type(error).__name__ if error else None,
+        }
+        with self._lock:
+            self._observe(record)
+            self.records.append(record)
+            if self.jsonl_path:
+                if self._jsonl is None:
+                    self._jsonl = open(self.jsonl_path, "a")
+                self._jsonl.write(json.dumps(record) + "\n")
+                self._jsonl.flush()
+        return record
+
+    def close(self):
+        """Close the jsonl_path stream - a later record reopens it"""
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+    def record_resources(self, sample):
+        """Resource sample from engine.begin_task(): gauges replace, counter increments add up"""
+        with self._lock:
+            self.resources = {key: value for key, value in sample.items()
+                              if key != "counters" and value is not None}
+            for key, value in sample.get("counters", {}).items():
+                self.lifecycle[key] = self.lifecycle.get(key, 0) + value
+
+    def ingest(self, record):
+        """Add a record produced elsewhere (e.g. by a batch worker process)"""
+        with self._lock:
+            self._observe(record)
+            self.records.append(record)
+
+    def _observe(self, record):
+        action = record["action"]
+        self.by_action.setdefault(action, Histogram(self.buckets)).observe(record["wall"])
+        selector = record["selector"]
+        if isinstance(selector, str):
+            label = selector_label(selector)
+            if label not in self.by_selector and len(self.by_selector) >= self.max_selectors:
+                label = OTHER_SELECTORS
+            self.by_selector.setdefault(label, Histogram(self.buckets)).observe(record["wall"])
+        for phase in PHASES:
+            key = (action, phase)
+            self.phase_totals[key] = self.phase_totals.get(key, 0.0) + record[phase]
+        self.attempts[action] = self.attempts.get(action, 0) + record["attempts"]
+        if record["failure"]:
+            key = (action, record["failure"])
+            self.failures[key] = self.failures.get(key, 0) + 1
+
+    def export_jsonl(self, path):
+        """Write the retained step records, one JSON object per line"""
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        return path
+
+    def to_prometheus(self, prefix="pw"):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        with self._lock:
+            self._histogram_lines(lines, f"{prefix}_step_duration_seconds",
+                                  "Step wall time by action", "action", self.by_action)
+            self._histogram_lines(lines, f"{prefix}_selector_duration_seconds",
+                                  "Step wall time by selector", "selector", self.by_selector)
+
+            name = f"{prefix}_step_phase_seconds_total"
+            lines.append(f"# HELP {name} Time spent in Playwright calls, sleeps and retry backoff")
+            lines.append(f"# TYPE {name} counter")
+            for (action, phase), seconds in sorted(self.phase_totals.items()):
+                lines.append(f'{name}{{action="{_escape(action)}",phase="{phase}"}} {seconds}')
+
+            name = f"{prefix}_step_attempts_total"
+            lines.append(f"# HELP {name} Playwright attempts made, including retries")
+            lines.append(f"# TYPE {name} counter")
+            for action, count in sorted(self.attempts.items()):
+                lines.append(f'{name}{{action="{_escape(action)}"}} {count}')
+
+            name = f"{prefix}_step_failures_total"
+            lines.append(f"# HELP {name} Failed steps by action and error type")
+            lines.append(f"# TYPE {name} counter")
+            for (action, error), count in sorted(self.failures.items()):
+                lines.append(f'{name}{{action="{_escape(action)}",error="{_escape(error)}"}} {count}')
+
+            for key, metric, help_text in RESOURCE_GAUGES:
+                if key in self.resources:
+                    name = f"{prefix}_{metric}"
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {self.resources[key]}")
+
+            name = f"{prefix}_engine_lifecycle_total"
+            lines.append(f"# HELP {name} Pages, routes and listeners cleaned up and contexts/browsers recycled")
+            lines.append(f"# TYPE {name} counter")
+            for event, count in sorted(self.lifecycle.items()):
+                lines.append(f'{name}{{event="{event}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(lines, name, help_text, label, histograms):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, hist in sorted(histograms.items()):
+            value = _escape(key)
+            for bound, count in hist.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{{label}="{value}"}} {hist.sum}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {hist.count}')
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide default registry used by run_actions
+REGISTRY = MetricsRegistry()
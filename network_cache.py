@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    import fcntl
+except ImportError:   # Windows - saves still merge, but without the lock
+    fcntl = None
+
+# Headers that describe the original transfer, not the decoded body we replay
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection",
+                "keep-alive", "set-cookie"}
+MODES = ("record", "replay", "auto")
+
+
+class MatchRules:
+    """
+    Decides which requests are cacheable and what makes two requests "the same".
+
+    ignore_query   - drop the whole query string from the key
+    ignore_params  - drop only these query parameters (cache busters, tracking ids)
+    match_body     - include a hash of the POST body in the key
+    """
+    def __init__(self, methods=("GET",), resource_types=None, ignore_query=False,
+                 ignore_params=("_", "cb", "utm_source", "utm_medium", "utm_campaign"),
+                 match_body=False):
+        self.methods = frozenset(m.upper() for m in methods)
+        self.resource_types = frozenset(resource_types) if resource_types else None
+        self.ignore_query = ignore_query
+        self.ignore_params = frozenset(ignore_params)
+        self.match_body = match_body
+
+    def key(self, request):
+        """Cache key for a Playwright request, or None if it must go to the network"""
+        method = request.method.upper()
+        if method not in self.methods:
+            return None
+        if self.resource_types is not None and request.resource_type not in self.resource_types:
+            return None
+        parts = urlsplit(request.url)
+        if parts.scheme not in ("http", "https"):
+            return None
+        key = f"{method} {parts.scheme}://{parts.netloc}{parts.path}"
+        if not self.ignore_query and parts.query:
+            params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                            if k not in self.ignore_params)
+            if params:
+                key += "?" + urlencode(params)
+        if self.match_body:
+            body = request.post_data_buffer
+            if body:
+                key += " #" + hashlib.sha256(body).hexdigest()[:16]
+        return key
+
+
+class NetworkCache:
+    """
+    On-disk record/replay store for network responses, served through context routing.
+
+    mode="record" - fetch everything from the network and store it
+    mode="replay" - serve hits from the store, misses fall through to the network
+                    (or are aborted when offline=True, for fixture-only runs -
+                    offline also aborts requests the match rules don't cache)
+    mode="auto"   - replay hits, record misses
+
+    Bodies are content-addressed (bodies/<sha256>) so an asset shared by many
+    pages is stored once; the store is capped at max_bytes with LRU eviction.
+    Several processes may share one directory - save() merges their entries.
+    This is its own store (index.json + bodies/), not a HAR file: unlike
+    context.route_from_har it can match on normalized keys, record and replay
+    in one run, evict, and merge concurrent recorders.
+    """
+    def __init__(self, path="netcache", mode="replay", rules=None, max_bytes=500 * 1024 * 1024,
+                 offline=False):
+        if mode not in MODES: raise ValueError(f"Unknown cache mode '{mode}' (use {', '.join(MODES)})")
+        self.path = Path(path)
+        self.bodies = self.path / "bodies"
+        self.bodies.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self.rules = rules or MatchRules()
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.index = self._load_index()
+        self.reset()
+
+    # === STORE ===
+    def _load_index(self):
+        index_path = self.path / "index.json"
+        if not index_path.exists():
+            return {}
+        try:
+            with open(index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Network cache index unreadable - starting empty")
+            return {}
+
+    def save(self):
+        """
+        Write the index. Entries other processes saved since we loaded it are
+        merged in first (newest last_used wins), under an exclusive lock on
+        index.lock, so concurrent recorders don't overwrite each other.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            with self._index_lock():
+                self._merge_saved_index()
+                tmp = self.path / f"index.json.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(self.index, f)
+                os.replace(tmp, self.path / "index.json")
+            self._dirty = False
+
+    @contextmanager
+    def _index_lock(self):
+        with open(self.path / "index.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)   # released when the file closes
+            yield
+
+    def _merge_saved_index(self):
+        for key, entry in self._load_index().items():
+            mine = self.index.get(key)
+            if mine is not None and mine["last_used"] >= entry["last_used"]:
+                continue
+            # Skip entries whose body is gone (evicted here or elsewhere)
+            if self._body_path(entry["body"]).exists():
+                self.index[key] = entry
+        self._evict()
+
+    def _body_path(self, digest):
+        return self.bodies / digest
+
+    def _store(self, key, url, status, headers, body):
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not body_path.exists():
+            tmp = body_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, body_path)
+        with self._lock:
+            previous = self.index.get(key)
+            self.index[key] = {
+                "url": url,
+                "status": status,
+                "headers": {k: v for k, v in headers.items() if k.lower() not in _HOP_HEADERS},
+                "body": digest,
+                "size": len(body),
+                "last_used": time.time(),
+            }
+            self._dirty = True
+            if previous is not None and previous["body"] != digest:
+                # Re-recorded with a new body - drop the old one unless another key shares it
+                self._unlink_unreferenced(previous["body"])
+            self._evict()
+
+    def _unlink_unreferenced(self, digest):
+        if any(entry["body"] == digest for entry in self.index.values()):
+            return
+        try:
+            self._body_path(digest).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop least-recently-used entries until unique body bytes fit max_bytes"""
+        sizes = {}
+        for entry in self.index.values():
+            sizes[entry["body"]] = entry["size"]
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        refs = {}
+        for entry in self.index.values():
+            refs[entry["body"]] = refs.get(entry["body"], 0) + 1
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[key]
+            self.evictions += 1
+            digest = entry["body"]
+            refs[digest] -= 1
+            if refs[digest] == 0:
+                total -= sizes[digest]
+                try:
+                    self._body_path(digest).unlink()
+                except OSError:
+                    pass
+
+    # === ROUTING ===
+    def install(self, context, lifecycle):
+        """Route every request on `context` through the cache, via the engine's EngineLifecycle"""
+        lifecycle.route(context, "**/*", self._route, persistent=True)
+
+    def _route(self, route):
+        request = route.request
+        key = self.rules.key(request)
+        if key is None:
+            if self.offline and urlsplit(request.url).scheme in ("http", "https"):
+                # Not cacheable (POST, filtered resource type...) - still no network when offline
+                route.abort("internetdisconnected")
+            else:
+                route.fallback()
+            return
+
+        entry = self.index.get(key) if self.mode != "record" else None
+        if entry is not None:
+            try:
+                body = self._body_path(entry["body"]).read_bytes()
+            except OSError:
+                entry = None
+            else:
+                with self._lock:
+                    self.hits += 1
+                    self.bytes_served += len(body)
+                    entry["last_used"] = time.time()
+                    self._dirty = True
+                route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+                return
+
+        with self._lock:
+            self.misses += 1
+        if self.offline:
+            route.abort("internetdisconnected")
+        elif self.mode == "replay":
+            route.fallback()
+        else:
+            try:
+                response = route.fetch()
+                body = response.body()
+            except Exception as e:
+                # Network error, closed page... - nothing to record, let Playwright handle it
+                print(f"⚠️ Network cache could not fetch {request.url}: {str(e)[:80]}")
+                route.fallback()
+                return
+            if 200 <= response.status < 300:
+                self._store(key, request.url, response.status, response.headers, body)
+                with self._lock:
+                    self.stored += 1
+            route.fulfill(response=response, body=body)
+
+    # === STATS (engine.run_stats protocol) ===
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+        self.bytes_served = 0
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hit_ratio(), "stored": self.stored,
+                "evictions": self.evictions, "bytes_served": self.bytes_served,
+                "entries": len(self.index)}
+
+    def summary(self):
+        if not (self.hits or self.misses):
+            return None
+        return (f"💾 Network cache ({self.mode}): {self.hits}/{self.hits + self.misses} hits "
+                f"({self.hit_ratio():.0%}), {self.bytes_served / 1024:.0f}KB served, "
+                f"{self.stored} stored, {self.evictions} evicted")
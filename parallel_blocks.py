@@ -0,0 +1,40 @@
+MODES = ("fail_fast", "collect_all")
+
+
+class ParallelBranchError(RuntimeError):
+    """A parallel branch failed (fail_fast) - names the branch and its failing step"""
+    def __init__(self, branch, result):
+        self.branch = branch
+        self.result = result
+        super().__init__(f"branch '{branch}' failed at its step {result.failed_step}: "
+                         f"{result.error_type}: {result.error}")
+
+
+def branches_of(step):
+    """
+    [(name, steps, timeout)] from a parallel step. A branch is a list of steps
+    or {"name", "steps", "timeout"}; timeout (seconds) defaults to the step's.
+    """
+    default_timeout = step.get("timeout")
+    branches = []
+    for idx, branch in enumerate(step.get("branches") or (), 1):
+        if isinstance(branch, dict):
+            branches.append((branch.get("name") or f"branch_{idx}", branch.get("steps"),
+                             branch.get("timeout", default_timeout)))
+        else:
+            branches.append((f"branch_{idx}", branch, default_timeout))
+    return branches
+
+
+def outcome(result):
+    """What a branch contributes to the merged value"""
+    if result.passed:
+        return dict(result.values)
+    return {"error": result.error, "error_type": result.error_type, "failed_step": result.failed_step,
+            "values": dict(result.values)}
+
+
+def summary_line(results):
+    passed = sum(1 for result in results.values() if result.passed)
+    slowest = max((result.elapsed_seconds for result in results.values()), default=0.0)
+    return f"🔀 {passed}/{len(results)} branches passed (slowest {slowest:.1f}s)"
@@ -1,183 +1,665 @@
-from playwright.sync_api import sync_playwright
-import time
-import os
-import random
-from pathlib import Path
-
-class PlaywrightEngine:
-    def __init__(self, timeout=15000, max_retries=3):
-        self.max_retries = max_retries
-        self.timeout = timeout
-        
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=False)
-        self.context = self.browser.new_context(viewport=None)
-        self.page = self.context.new_page()
-        
-        Path("screenshots").mkdir(exist_ok=True)
-        Path("downloads").mkdir(exist_ok=True)
-        Path("traces").mkdir(exist_ok=True)
-
-    def _retry_operation(self, func, *args, **kwargs):
-        """Universal retry - CORRECT ARGUMENT PASSING"""
-        for attempt in range(self.max_retries):
-            try:
-                result = func(*args, **kwargs)
-                print(f"✅ SUCCESS on attempt {attempt + 1}")
-                return result
-            except Exception as e:
-                print(f"⚠️ Attempt {attempt + 1}/{self.max_retries} failed: {str(e)[:50]}")
-                if attempt < self.max_retries - 1:
-                    wait_time = (attempt + 1) * random.uniform(0.5, 1.5)
-                    print(f"⏳ Retrying in {wait_time:.1f}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ FINAL FAILURE after {self.max_retries} attempts")
-                    raise e
-
-    def open(self, url):
-        self._retry_operation(self._open_impl, url)
-
-    def _open_impl(self, url):
-        self.page.goto(url, wait_until="networkidle")
-
-    def click(self, selector):
-        self._retry_operation(self._click_impl, selector)
-
-    def _click_impl(self, selector):
-        self.page.click(selector, timeout=self.timeout)
-
-    def type(self, selector, value):
-        self._retry_operation(self._type_impl, selector, value)
-
-    def _type_impl(self, selector, value):
-        self.page.wait_for_selector(selector, timeout=5000)
-        self.page.click(selector)
-        self.page.fill(selector, value)
-
-    def wait_seconds(self, seconds):
-        time.sleep(seconds)
-
-    def wait_for_selector(self, selector, timeout=10000):
-        self._retry_operation(self._wait_selector_impl, selector, timeout)
-
-    def _wait_selector_impl(self, selector, timeout):
-        self.page.wait_for_selector(selector, timeout=timeout)
-
-    def scroll_to_selector(self, selector):
-        self._retry_operation(self._scroll_selector_impl, selector)
-
-    def _scroll_selector_impl(self, selector):
-        self.page.eval_on_selector(selector, "el => el.scrollIntoView({block: 'center'})")
-
-    def scroll_pixels(self, pixels):
-        self._retry_operation(self._scroll_pixels_impl, pixels)
-
-    def _scroll_pixels_impl(self, pixels):
-        self.page.evaluate(f"window.scrollBy(0, {pixels})")
-
-    def hover(self, selector):
-        self._retry_operation(self._hover_impl, selector)
-
-    def _hover_impl(self, selector):
-        self.page.hover(selector)
-
-    def double_click(self, selector):
-        self._retry_operation(self._dblclick_impl, selector)
-
-    def _dblclick_impl(self, selector):
-        self.page.dblclick(selector)
-
-    def right_click(self, selector):
-        self._retry_operation(self._rightclick_impl, selector)
-
-    def _rightclick_impl(self, selector):
-        self.page.click(selector, button="right")
-
-    def drag_drop(self, source_selector, target_selector):
-        self._retry_operation(self._dragdrop_impl, source_selector, target_selector)
-
-    def _dragdrop_impl(self, source_selector, target_selector):
-        self.page.drag_and_drop(source_selector, target_selector)
-
-    def select_option(self, selector, option, method="text"):
-        self._retry_operation(self._select_impl, selector, option, method)
-
-    def _select_impl(self, selector, option, method):
-        if method == "text":
-            self.page.select_option(selector, label=option)
-        elif method == "value":
-            self.page.select_option(selector, value=option)
-        else:
-            self.page.select_option(selector, index=int(option))
-
-    def clear(self, selector):
-        self._retry_operation(self._clear_impl, selector)
-
-    def _clear_impl(self, selector):
-        self.page.fill(selector, "")
-
-    def screenshot(self, filename=None):
-        return self._retry_operation(self._screenshot_impl, filename)
-
-    def _screenshot_impl(self, filename):
-        if not filename:
-            filename = f"screenshot_{int(time.time())}.png"
-        self.page.screenshot(path=f"screenshots/{filename}")
-        return f"screenshots/{filename}"
-
-    def switch_window(self, window):
-        self._retry_operation(self._switch_impl, window)
-
-    def _switch_impl(self, window):
-        if window == "next":
-            self.context.pages[-1].bring_to_front()
-
-    def back(self):
-        self._retry_operation(self._back_impl)
-
-    def _back_impl(self):
-        self.page.go_back()
-
-    def forward(self):
-        self._retry_operation(self._forward_impl)
-
-    def _forward_impl(self):
-        self.page.go_forward()
-
-    def refresh(self):
-        self._retry_operation(self._refresh_impl)
-
-    def _refresh_impl(self):
-        self.page.reload()
-
-    def close(self):
-        self._retry_operation(self._close_impl)
-
-    def _close_impl(self):
-        self.page.close()
-
-    def get_text(self, selector):
-        return self._retry_operation(self._get_text_impl, selector)
-
-    def _get_text_impl(self, selector):
-        return self.page.inner_text(selector)
-
-    def get_attribute(self, selector, attr):
-        return self._retry_operation(self._get_attr_impl, selector, attr)
-
-    def _get_attr_impl(self, selector, attr):
-        return self.page.get_attribute(selector, attr)
-
-    def is_visible(self, selector):
-        return self._retry_operation(self._is_visible_impl, selector)
-
-    def _is_visible_impl(self, selector):
-        return self.page.is_visible(selector)
-
-    def quit(self):
-        try:
-            self.browser.close()
-            self.playwright.stop()
-        except:
-            pass
+from playwright.sync_api import sync_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+import json
+import time
+import os
+import uuid
+from pathlib import Path
+
+from engine_core import EngineCore, RetryAttempts
+from extraction import EXTRACT_JS, normalize_fields
+from metrics import new_timings
+from resource_blocking import BlockingStats, get_profile
+from screenshot_writer import ScreenshotWriter, format_for
+import visual_diff
+import browser_daemon
+from engine_lifecycle import EngineLifecycle
+from process_stats import browser_root_pids
+from selector_healing import PROBE_JS, SelectorCache, is_candidate_list
+from retry_policy import CircuitBreaker, RetryPolicy
+from storage_snapshots import SessionExpiredError, SnapshotStore
+class PlaywrightEngine(EngineCore):
+    def __init__(self, timeout=15000, max_retries=3, context=None, block_profile=None,
+                 network_cache=None, storage_snapshot=None, snapshot_store=None,
+                 retry_policy=None, action_policies=None, circuit_breaker=None, headless=None,
+                 selector_cache=None, connect=False, trace_recorder=None, lifecycle=None, screenshot_writer=None):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries)
+        self.action_policies = dict(action_policies or {})   # action -> RetryPolicy
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._step_policy = self.retry_policy
+        self._step_deadline = None
+        self._task_deadline = None
+        self._timeouts_clamped = False
+        self.snapshots = snapshot_store or SnapshotStore()
+        self.active_snapshot = None    # steps with "skip_if_session" == this are skipped
+
+        self._lease = None
+        # None: a headed launch, or whatever mode the browser daemon already runs in
+        self._headless = bool(headless)
+        self._browser_pids = []   # root PIDs of the Chromium we launched, for RSS sampling
+        if context is None:
+            self.playwright = sync_playwright().start()
+            viewport = None
+            if connect:
+                # Chromium from browser_daemon - we only own this connection and context
+                daemon = browser_daemon.ensure_running(headless=headless)
+                self._lease = browser_daemon.acquire_lease()
+                try:
+                    self.browser = self.playwright.chromium.connect(daemon["ws_endpoint"])
+                except Exception:
+                    browser_daemon.release_lease(self._lease)
+                    self.playwright.stop()
+                    raise
+                viewport = daemon.get("viewport")
+                print(f"🛰️ Connected to browser daemon at {daemon['ws_endpoint']}")
+            else:
+                self.browser = self._launch_browser()
+            state = self.snapshots.load(storage_snapshot) if storage_snapshot else None
+            self._context_options = {"viewport": viewport}
+            if trace_recorder is not None:
+                self._context_options.update(trace_recorder.context_options())
+            self.context = self.browser.new_context(storage_state=state, **self._context_options)
+            if state is not None:
+                self.active_snapshot = storage_snapshot
+                print(f"🔑 Context started from snapshot '{storage_snapshot}'")
+            self._owns_browser = True
+        else:
+            # Borrowed context (e.g. from BrowserPool) - its owner tears it down
+            self.playwright = None
+            self.browser = context.browser
+            self.context = context
+            self._owns_browser = False
+            self._context_options = {"viewport": None}
+        self.page = self.context.pages[0] if self.context.pages else self.context.new_page()
+        if context is not None and storage_snapshot:
+            # Can't start a borrowed context from the snapshot - apply it instead
+            if self.load_storage_state(storage_snapshot):
+                print(f"🔑 Snapshot '{storage_snapshot}' applied to the borrowed context")
+        self.timings = new_timings()   # reset by run_actions before every step
+        self.hooks = []                # metrics.Hook instances for this engine only
+        self.run_stats = []            # objects with reset()/summary(), reported per run
+        self.lifecycle = lifecycle or EngineLifecycle()   # pages/routes/listeners, cleaned between tasks
+        self.lifecycle.watch(self.context)
+
+        # Cache route first: routes registered later (blocking, mocks) get the first look
+        self.network_cache = network_cache
+        if network_cache is not None:
+            network_cache.install(self.context, self.lifecycle)
+            self.run_stats.append(network_cache)
+
+        self.blocking = None
+        self._base_blocking = None   # profile set outside a task - restored between tasks
+        self._blocking_route = None  # None, "task" or "persistent" - the route _route_blocking is on
+        self.blocking_stats = BlockingStats()
+        self.run_stats.append(self.blocking_stats)
+        self.selector_cache = selector_cache or SelectorCache()
+        self.run_stats.append(self.selector_cache)
+        if block_profile:
+            self.block_resources(block_profile)
+
+        Path("screenshots").mkdir(exist_ok=True)
+        Path("downloads").mkdir(exist_ok=True)
+        Path("traces").mkdir(exist_ok=True)
+        self.download_dir = "downloads"
+        self._owns_writer = screenshot_writer is None   # a pool's shared writer outlives the lease
+        self.screenshot_writer = screenshot_writer or ScreenshotWriter()
+        self.trace_recorder = trace_recorder
+        self._explicit_trace = None   # name of a start_tracing step's trace
+        if trace_recorder is not None:
+            trace_recorder.attach(self.context)
+
+    # === RETRY POLICY ===
+    def _retry_operation(self, func, *args, **kwargs):
+        """Universal retry - classified errors, jittered backoff, deadlines, circuit breaker"""
+        attempts = RetryAttempts(self, func.__name__, args)
+        try:
+            for _ in attempts:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    wait_time = attempts.failed(e)
+                    time.sleep(wait_time)
+                    attempts.backed_off(wait_time)
+                else:
+                    return attempts.succeeded(result)
+        finally:
+            attempts.close()
+
+    # === SELF-HEALING SELECTORS ===
+    def _resolve(self, selector, state="visible", timeout=None, wait=True):
+        """
+        A plain selector as-is; for a list of candidates, the first one that
+        matches - all probed together in one polling page query, last run's
+        winner (per origin) first. The winner is remembered in selector_cache.
+        Lists with Playwright-only candidates (text=, >>...) are probed one
+        locator at a time instead. wait=False probes once and returns None
+        when nothing matches.
+        """
+        if not is_candidate_list(selector):
+            return selector
+        origin, candidates, in_page = self._candidate_order(selector)
+        if not wait:
+            index = (self.page.evaluate(PROBE_JS, [candidates, state]) if in_page
+                     else self._probe_locators(candidates, state))
+        else:
+            timeout = self._clamp(self.timeout if timeout is None else timeout)
+            try:
+                if in_page:
+                    index = self.page.wait_for_function(PROBE_JS, arg=[candidates, state],
+                                                        timeout=timeout, polling=100).json_value()
+                else:
+                    index = self._probe_locators(candidates, state, timeout)
+            except PlaywrightTimeoutError:
+                raise self._no_candidate(candidates, state, timeout)
+        return self._record_winner(origin, selector, candidates, index)
+
+    def _probe_locators(self, candidates, state, timeout=None):
+        """
+        PROBE_JS through Playwright locators, one candidate at a time: 1-based
+        index of the first match. Polls until `timeout` (ms), or probes once
+        and returns 0 when no timeout is given.
+        """
+        for pause in self._probe_rounds(timeout):
+            time.sleep(pause)
+            for index, candidate in enumerate(candidates, 1):
+                locator = self.page.locator(candidate).first
+                try:
+                    if locator.count() if state == "attached" else locator.is_visible():
+                        return index
+                except PlaywrightError:
+                    if self.page.is_closed():
+                        raise
+                    # otherwise an invalid selector - never matches, as in PROBE_JS
+        return 0
+
+    def open(self, url, wait_until="networkidle"):
+        self._retry_operation(self._open_impl, url, wait_until)
+
+    def _open_impl(self, url, wait_until="networkidle"):
+        self.page.goto(url, wait_until=wait_until)
+
+    def click(self, selector):
+        self._retry_operation(self._click_impl, selector)
+
+    def _click_impl(self, selector):
+        self.page.click(self._resolve(selector), timeout=self._clamp(self.timeout))
+
+    def type(self, selector, value):
+        self._retry_operation(self._type_impl, selector, value)
+
+    def _type_impl(self, selector, value):
+        selector = self._resolve(selector, timeout=5000)
+        self.page.wait_for_selector(selector, timeout=self._clamp(5000))
+        self.page.click(selector)
+        self.page.fill(selector, value)
+
+    def wait_seconds(self, seconds):
+        time.sleep(seconds)
+        self.timings["sleep"] += seconds
+
+    def wait_until_ready(self, seconds, until="dom_stable", selector=None, quiet_ms=500):
+        """Wait at most `seconds`, returning early once the page is ready - returns seconds waited"""
+        started = time.perf_counter()
+        timeout_ms = max(int(seconds * 1000), 1)
+        try:
+            if until == "selector":
+                if not selector: raise ValueError("until='selector' needs a 'selector'")
+                if is_candidate_list(selector):
+                    self._resolve(selector, timeout=timeout_ms)
+                else:
+                    self.page.locator(selector).first.wait_for(state="visible", timeout=timeout_ms)
+            elif until == "navigation":
+                self.page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            elif until == "network_idle":
+                self.page.wait_for_load_state("networkidle", timeout=timeout_ms)
+            elif until == "dom_stable":
+                self.page.wait_for_function(self._DOM_STABLE_JS, arg=quiet_ms,
+                                            timeout=timeout_ms, polling=100)
+            else:
+                raise ValueError(f"Unknown wait condition '{until}'")
+        except PlaywrightTimeoutError:
+            pass  # upper bound reached - same outcome as the fixed sleep
+        waited = time.perf_counter() - started
+        self.timings["sleep"] += waited
+        return waited
+
+    def wait_for_selector(self, selector, timeout=10000):
+        self._retry_operation(self._wait_selector_impl, selector, timeout)
+
+    def _wait_selector_impl(self, selector, timeout):
+        self.page.wait_for_selector(self._resolve(selector, timeout=timeout), timeout=self._clamp(timeout))
+
+    def scroll_to_selector(self, selector):
+        self._retry_operation(self._scroll_selector_impl, selector)
+
+    def _scroll_selector_impl(self, selector):
+        self.page.eval_on_selector(self._resolve(selector, "attached"), "el => el.scrollIntoView({block: 'center'})")
+
+    def scroll_pixels(self, pixels):
+        self._retry_operation(self._scroll_pixels_impl, pixels)
+
+    def _scroll_pixels_impl(self, pixels):
+        self.page.evaluate(f"window.scrollBy(0, {pixels})")
+
+    def hover(self, selector):
+        self._retry_operation(self._hover_impl, selector)
+
+    def _hover_impl(self, selector):
+        self.page.hover(self._resolve(selector))
+
+    def double_click(self, selector):
+        self._retry_operation(self._dblclick_impl, selector)
+
+    def _dblclick_impl(self, selector):
+        self.page.dblclick(self._resolve(selector))
+
+    def right_click(self, selector):
+        self._retry_operation(self._rightclick_impl, selector)
+
+    def _rightclick_impl(self, selector):
+        self.page.click(self._resolve(selector), button="right")
+
+    def drag_drop(self, source_selector, target_selector):
+        self._retry_operation(self._dragdrop_impl, source_selector, target_selector)
+
+    def _dragdrop_impl(self, source_selector, target_selector):
+        self.page.drag_and_drop(self._resolve(source_selector), self._resolve(target_selector))
+
+    def select_option(self, selector, option, method="text"):
+        self._retry_operation(self._select_impl, selector, option, method)
+
+    def _select_impl(self, selector, option, method):
+        selector = self._resolve(selector)
+        if method == "text":
+            self.page.select_option(selector, label=option)
+        elif method == "value":
+            self.page.select_option(selector, value=option)
+        else:
+            self.page.select_option(selector, index=int(option))
+
+    def clear(self, selector):
+        self._retry_operation(self._clear_impl, selector)
+
+    def _clear_impl(self, selector):
+        self.page.fill(self._resolve(selector), "")
+
+    def screenshot(self, filename=None, fmt=None, quality=None, selector=None, full_page=False):
+        """Capture now, write in the background - returns the path the frame will land at"""
+        return self._retry_operation(self._screenshot_impl, filename, fmt, quality, selector, full_page)
+
+    def _screenshot_impl(self, filename, fmt=None, quality=None, selector=None, full_page=False):
+        if not filename:
+            filename = f"screenshot_{int(time.time())}.png"
+        fmt = format_for(filename, fmt)
+        # Playwright encodes png/jpeg itself; webp is re-encoded by the writer thread
+        options = {"type": "jpeg" if fmt == "jpeg" else "png"}
+        if fmt == "jpeg" and quality:
+            options["quality"] = quality
+        if selector:
+            data = self.page.locator(self._resolve(selector)).first.screenshot(**options)
+        else:
+            data = self.page.screenshot(full_page=full_page, **options)
+        return self.screenshot_writer.submit(f"screenshots/{filename}", data, fmt, quality)
+
+    def expect_screenshot(self, selector, filename, tolerance=10, max_diff_ratio=0.001, ignore=()):
+        """
+        Compare an element against baselines/<filename> (created on first run).
+        ignore: selectors (masked in both frames) and/or [x, y, w, h] pixel boxes.
+        Writes screenshots/diff_<filename> and raises AssertionError on a mismatch.
+        """
+        mask_selectors = [item for item in ignore if isinstance(item, str)]
+        regions = [tuple(item) for item in ignore if not isinstance(item, str)]
+        data = self._retry_operation(self._element_png_impl, selector, mask_selectors)
+        baseline_path = Path("baselines") / filename
+        if not baseline_path.exists():
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_bytes(data)
+            print(f"🆕 Baseline created: {baseline_path}")
+            return 0.0
+
+        ratio, mask, actual = visual_diff.compare(baseline_path.read_bytes(), data, tolerance, regions)
+        print(f"👁️ Visual diff: {ratio:.4%} of pixels differ (limit {max_diff_ratio:.4%})")
+        if ratio > max_diff_ratio:
+            diff_path = Path("screenshots") / f"diff_{Path(filename).stem}.png"
+            visual_diff.write_diff_image(diff_path, actual, mask)
+            raise AssertionError(f"Screenshot mismatch for {selector}: {ratio:.4%} differ "
+                                 f"(diff: {diff_path})")
+        return ratio
+
+    def _element_png_impl(self, selector, mask_selectors):
+        masks = [self.page.locator(s) for s in mask_selectors]
+        return self.page.locator(self._resolve(selector)).first.screenshot(type="png", mask=masks, animations="disabled")
+
+    def switch_window(self, window):
+        self._retry_operation(self._switch_impl, window)
+
+    def _switch_impl(self, window):
+        if window == "next":
+            self.context.pages[-1].bring_to_front()
+
+    def back(self):
+        self._retry_operation(self._back_impl)
+
+    def _back_impl(self):
+        self.page.go_back()
+
+    def forward(self):
+        self._retry_operation(self._forward_impl)
+
+    def _forward_impl(self):
+        self.page.go_forward()
+
+    def refresh(self):
+        self._retry_operation(self._refresh_impl)
+
+    def _refresh_impl(self):
+        self.page.reload()
+
+    def close(self):
+        self._retry_operation(self._close_impl)
+
+    def _close_impl(self):
+        """Close the current page and carry on in the newest remaining one (a blank page if none)"""
+        self.page.close()
+        pages = [page for page in self.context.pages if not page.is_closed()]
+        self.page = pages[-1] if pages else self.context.new_page()
+
+    def set_download_path(self, path):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self.download_dir = path
+
+    def expect_download(self, selector):
+        return self._retry_operation(self._download_impl, selector)
+
+    def _download_impl(self, selector):
+        with self.page.expect_download(timeout=self._clamp(self.timeout)) as download_info:
+            self.page.click(self._resolve(selector), timeout=self._clamp(self.timeout))
+        download = download_info.value
+        path = str(Path(self.download_dir) / download.suggested_filename)
+        download.save_as(path)
+        return path
+
+    def get_text(self, selector):
+        return self._retry_operation(self._get_text_impl, selector)
+
+    def _get_text_impl(self, selector):
+        return self.page.inner_text(self._resolve(selector, "attached"))
+
+    def get_attribute(self, selector, attr):
+        return self._retry_operation(self._get_attr_impl, selector, attr)
+
+    def _get_attr_impl(self, selector, attr):
+        return self.page.get_attribute(self._resolve(selector, "attached"), attr)
+
+    def extract(self, fields, row_selector=None, batch_size=500):
+        """
+        Yield lists of records - one page.evaluate per batch of rows instead of
+        one round trip per field. fields: {"name": "css"} or {"name": {"selector",
+        "attribute"|"property"}}; without row_selector a single record is produced.
+        """
+        fields = normalize_fields(fields)
+        key = uuid.uuid4().hex   # names this extraction's row list in the page
+        offset = 0
+        while True:
+            batch = self._retry_operation(self._extract_impl, fields, row_selector, key, offset, batch_size)
+            if batch["records"]:
+                yield batch["records"]
+            offset += len(batch["records"])
+            if not batch["records"] or offset >= batch["total"]:
+                return
+
+    def _extract_impl(self, fields, row_selector, key, offset, limit):
+        return self.page.evaluate(EXTRACT_JS, [row_selector, fields, key, offset, limit])
+
+    def is_visible(self, selector):
+        return self._retry_operation(self._is_visible_impl, selector)
+
+    def _is_visible_impl(self, selector):
+        selector = self._resolve(selector, wait=False)
+        return selector is not None and self.page.is_visible(selector)
+
+    # === TRACING & VIDEO ===
+    def start_tracing(self, name="trace"):
+        if self.trace_recorder is not None and self.trace_recorder.trace:
+            print("ℹ️ Trace recorder already traces this run - start_tracing ignored")
+            return
+        self.context.tracing.start(name=name, screenshots=True, snapshots=True, sources=False)
+        self._explicit_trace = name
+
+    def stop_tracing(self, filename=None):
+        """Write the trace started by start_tracing to traces/ - returns its path"""
+        if self._explicit_trace is None:
+            print("ℹ️ No start_tracing trace to stop")
+            return None
+        filename = filename or f"{self._explicit_trace}_{int(time.time())}.zip"
+        path = str(Path("traces") / filename)
+        self.context.tracing.stop(path=path)
+        self._explicit_trace = None
+        return path
+
+    def record_video(self, output_dir="videos"):
+        """
+        Playwright records video per context, from its creation - so move the
+        session (storage state + current URL) into a new recording context.
+        Routes from mock_api/intercept_request are not carried over.
+        """
+        if not self._owns_browser:
+            raise RuntimeError("record_video needs an engine-owned context (not a pool lease)")
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        self._context_options["record_video_dir"] = output_dir
+        self._replace_context(reopen=True)
+
+    def _replace_context(self, reopen=False, relaunch=False):
+        """
+        Carry the session (storage state, optionally the URL) over into a new
+        context - on a freshly launched Chromium with relaunch=True. Engine-level
+        routes are reinstalled; task routes (mock_api, intercept_request) are not.
+        """
+        url, state = self.checkpoint_state()
+        old_context = self.context
+        self.lifecycle.forget(old_context)
+        if relaunch:
+            try:
+                old_context.close()
+                self.browser.close()
+            except Exception as e:
+                print(f"⚠️ Closing the old browser failed: {str(e)[:80]}")
+            self.browser = self._launch_browser()
+        self.context = self.browser.new_context(storage_state=state, **self._context_options)
+        self.page = self.context.new_page()
+        self.lifecycle.watch(self.context)
+        if self.network_cache is not None:
+            self.network_cache.install(self.context, self.lifecycle)
+        self._blocking_route = None
+        if self.blocking is not None:
+            self._route_blocking_profile(persistent=self._base_blocking is not None)
+        if self.trace_recorder is not None:
+            self.trace_recorder.attach(self.context)
+        if not relaunch:
+            old_context.close()
+        if reopen and url and url != "about:blank":
+            self.open(url)
+
+    # === SESSION SNAPSHOTS ===
+    def save_storage_state(self, name, ttl=None, guard_selector=None):
+        path = self.snapshots.save(name, self.context, ttl, guard_selector)
+        self.active_snapshot = name
+        return path
+
+    def load_storage_state(self, name):
+        """Apply a snapshot to the running context - False if missing or expired"""
+        state = self.snapshots.load(name)
+        if state is None:
+            return False
+        self.apply_storage_state(state)
+        self.active_snapshot = name
+        return True
+
+    def apply_storage_state(self, state):
+        """
+        Add a storage_state dict's cookies and localStorage to the running context.
+        localStorage is written once per origin, from a scratch page whose
+        navigation is answered locally - nothing stays registered on the context.
+        """
+        if state.get("cookies"):
+            self.context.add_cookies(state["cookies"])
+        origins = self._local_storage_items(state)
+        if not origins:
+            return
+        page = self.context.new_page()
+        try:
+            page.route("**/*", lambda route: route.fulfill(status=200, content_type="text/html",
+                                                           body=self._BLANK_DOCUMENT))
+            for origin, items in origins:
+                page.goto(origin.rstrip("/") + "/", wait_until="domcontentloaded")
+                page.evaluate(self._SET_LOCAL_STORAGE_JS, items)
+        finally:
+            page.close()
+
+    def check_session(self, name, guard_selector=None):
+        """Invalidate `name` and raise SessionExpiredError if its guard selector is visible"""
+        guard_selector = guard_selector or self.snapshots.guard_selector(name)
+        if not guard_selector:
+            return True
+        if self.page.is_visible(guard_selector):
+            self.snapshots.invalidate(name)
+            if self.active_snapshot == name:
+                self.active_snapshot = None
+            raise SessionExpiredError(f"Session '{name}' expired ({guard_selector} visible)")
+        return True
+
+    # === CHECKPOINTS ===
+    def checkpoint_state(self):
+        return self.page.url, self.context.storage_state()
+
+    def restore_checkpoint(self, url, storage_state):
+        if storage_state:
+            self.apply_storage_state(storage_state)
+        if url and url != "about:blank":
+            self.open(url)
+
+    # === NETWORK ===
+    def block_resources(self, profile, resource_types=(), domains=(), url_patterns=()):
+        """Block requests matching a named profile (see resource_blocking.PROFILES) plus extras"""
+        blocking = get_profile(profile).merged(resource_types, domains, url_patterns)
+        if not self.lifecycle.task_active:
+            self._base_blocking = blocking
+            # A route left by a task goes with the next cleanup - the base profile needs its own
+            if self._blocking_route != "persistent":
+                self._route_blocking_profile(persistent=True)
+        elif self._blocking_route is None:
+            self._route_blocking_profile(persistent=False)
+        self.blocking = blocking
+        print(f"🚫 Blocking profile: {blocking.name}")
+
+    def _route_blocking_profile(self, persistent):
+        self.lifecycle.route(self.context, "**/*", self._route_blocking, persistent=persistent)
+        self._blocking_route = "persistent" if persistent else "task"
+
+    def _route_blocking(self, route):
+        request = route.request
+        if self.blocking is None:
+            route.fallback()   # a task's profile was dropped between tasks
+            return
+        reason = self.blocking.match(request.url, request.resource_type)
+        self.blocking_stats.record(reason)
+        if reason:
+            route.abort("blockedbyclient")
+        else:
+            route.fallback()
+
+    def mock_api(self, url_pattern, response_data, status=200):
+        body = json.dumps(response_data)
+        self.lifecycle.route(self.context, url_pattern, lambda route: route.fulfill(
+            status=status, content_type="application/json", body=body
+        ))
+
+    def intercept_request(self, url_pattern, action="abort"):
+        """
+        abort: fail matching requests. continue: hand them on to the routes
+        registered before this one (network cache, blocking). network: send them
+        straight to the network, bypassing those routes.
+        """
+        if action == "abort":
+            self.lifecycle.route(self.context, url_pattern, lambda route: route.abort())
+        elif action == "continue":
+            self.lifecycle.route(self.context, url_pattern, lambda route: route.fallback())
+        elif action == "network":
+            self.lifecycle.route(self.context, url_pattern, lambda route: route.continue_())
+        else:
+            raise ValueError(f"Unknown intercept action '{action}' (use 'abort', 'continue' or 'network')")
+
+    # === LIFECYCLE ===
+    def _launch_browser(self):
+        marker = f"--pw-engine={uuid.uuid4().hex}"   # tags this Chromium's command line
+        browser = self.playwright.chromium.launch(headless=self._headless, args=[marker])
+        self._browser_pids = browser_root_pids(marker)   # one /proc scan per launch, not per task
+        return browser
+
+    def browser_pids(self):
+        """Root PIDs of the Chromium this engine uses ([] for a borrowed context)"""
+        if self._browser_pids:
+            return self._browser_pids
+        if self._lease:
+            state = browser_daemon.read_state()
+            return [state["server_pid"]] if state else []
+        return []   # BrowserPool samples its own browsers
+
+    def begin_task(self):
+        """
+        Called by run_actions before each task: sample what the last task left
+        behind, close its extra pages and drop its routes/listeners, then
+        recycle the context or browser if a lifecycle limit is exceeded.
+        Returns the resource sample.
+        """
+        lifecycle = self.lifecycle
+        sample = lifecycle.sample(self.context, self.browser_pids())
+        self.page = self._live_page() or self.context.new_page()
+        lifecycle.cleanup(self.context, self.page)
+        if self._blocking_route == "task":
+            self._blocking_route = None
+        self.blocking = self._base_blocking
+        due = lifecycle.recycle_due(sample) if self._owns_browser else None
+        if due:
+            self.recycle(*due)
+        lifecycle.start_task()
+        return sample
+
+    def end_task(self):
+        self.lifecycle.end_task()
+
+    def recycle(self, scope="context", reason=""):
+        """Move to a fresh context - or a relaunched Chromium (scope="browser") - keeping the session"""
+        if not self._owns_browser:
+            raise RuntimeError("recycle needs an engine-owned context (not a pool lease)")
+        relaunch = scope == "browser" and self._lease is None   # never relaunch the daemon's browser
+        print(f"♻️ Recycling {'browser' if relaunch else 'context'}{f': {reason}' if reason else ''}")
+        self._replace_context(relaunch=relaunch)
+        self.lifecycle.counters["browser_recycles" if relaunch else "context_recycles"] += 1
+
+    def _shutdown(self, what, func):
+        try:
+            func()
+        except Exception as e:
+            print(f"⚠️ {what} failed during quit: {type(e).__name__}: {str(e)[:80]}")
+
+    def quit(self):
+        """Release everything the engine holds - a failing step is logged and the rest still run"""
+        self._shutdown("Screenshot writer flush", self.screenshot_writer.flush)
+        if self._owns_writer:
+            self._shutdown("Screenshot writer close", self.screenshot_writer.close)
+        if self.network_cache is not None:
+            self._shutdown("Network cache save", self.network_cache.save)
+        if self.trace_recorder is not None:
+            self._shutdown("Trace recorder close", lambda: self.trace_recorder.close(self))
+        if not self._owns_browser:
+            # The pool resets and reuses the context - just take our listeners/routes off it
+            self._shutdown("Lifecycle detach", lambda: self.lifecycle.detach(self.context))
+            return
+        self._shutdown("Context close", self.context.close)
+        self._shutdown("Browser close", self.browser.close)   # for a daemon browser this only disconnects
+        self._shutdown("Playwright stop", self.playwright.stop)
+        if self._lease:
+            browser_daemon.release_lease(self._lease)
+            self._lease = None
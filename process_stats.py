@@ -0,0 +1,179 @@
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def find_pids_with_arg(marker):
+    """PIDs whose command line contains `marker` (we tag each Chromium launch with one)"""
+    if psutil is not None:
+        pids = []
+        for proc in psutil.process_iter(["pid", "cmdline"]):
+            if any(marker in arg for arg in (proc.info["cmdline"] or [])):
+                pids.append(proc.info["pid"])
+        return pids
+    if not os.path.isdir("/proc"):
+        return []
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                if marker.encode() in f.read():
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return pids
+
+
+def _children_map():
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # "pid (comm) state ppid ..." - comm may contain spaces, split after ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _walk_tree(pids, read_psutil, read_proc):
+    """
+    One reading per process in the trees rooted at `pids` (each process once),
+    or None when neither psutil nor /proc is available. read_psutil(process)
+    gets a psutil.Process, read_proc(pid) a PID; processes that exit mid-walk
+    are skipped.
+    """
+    readings = []
+    seen = set()
+    if psutil is not None:
+        for pid in pids:
+            try:
+                root = psutil.Process(pid)
+                tree = [root] + root.children(recursive=True)
+            except psutil.Error:
+                continue
+            for proc in tree:
+                if proc.pid in seen:
+                    continue
+                seen.add(proc.pid)
+                try:
+                    readings.append(read_psutil(proc))
+                except psutil.Error:
+                    continue
+        return readings
+    if not os.path.isdir("/proc"):
+        return None
+    children = _children_map()
+    stack = list(pids)
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        readings.append(read_proc(pid))
+        stack.extend(children.get(pid, []))
+    return readings
+
+
+def process_tree_rss_mb(pids):
+    """Resident memory of `pids` plus all of their descendants, in MB (None if unsupported)"""
+    readings = _walk_tree(pids, lambda proc: proc.memory_info().rss, _rss_bytes)
+    return None if readings is None else sum(readings) / (1024 * 1024)
+
+
+def _cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK   # utime + stime
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def _psutil_cpu_seconds(proc):
+    times = proc.cpu_times()
+    return times.user + times.system
+
+
+def process_tree_cpu_seconds(pids):
+    """User + system CPU time of `pids` and their live descendants (None if unsupported)"""
+    readings = _walk_tree(pids, _psutil_cpu_seconds, _cpu_seconds)
+    return None if readings is None else sum(readings)
+
+
+def browser_root_pids(marker):
+    """PIDs of the Chromium browser process(es) launched with `marker` in their args"""
+    pids = find_pids_with_arg(marker)
+    # Renderer/GPU helpers are descendants of the browser process and may repeat the
+    # marker - keep only the roots so nothing is counted twice.
+    if len(pids) > 1 and psutil is None and os.path.isdir("/proc"):
+        children = _children_map()
+        descendants = set()
+        for pid in pids:
+            stack = list(children.get(pid, []))
+            while stack:
+                child = stack.pop()
+                descendants.add(child)
+                stack.extend(children.get(child, []))
+        pids = [pid for pid in pids if pid not in descendants]
+    elif len(pids) > 1 and psutil is not None:
+        roots = []
+        for pid in pids:
+            try:
+                if psutil.Process(pid).ppid() not in pids:
+                    roots.append(pid)
+            except psutil.Error:
+                continue
+        pids = roots
+    return pids
+
+
+def browser_rss_mb(marker):
+    """Total RSS of the Chromium process tree launched with `marker` in its args"""
+    pids = browser_root_pids(marker)
+    if not pids:
+        return None
+    return process_tree_rss_mb(pids)
+
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return []
+
+
+def chromium_memory_mb(pids):
+    """
+    RSS of the Chromium trees rooted at `pids`: browser_rss_mb for the whole
+    tree, renderer_rss_mb and renderers for its --type=renderer processes
+    (roughly one per site/tab). None if unsupported.
+    """
+    procs = _walk_tree(pids, lambda proc: (proc.memory_info().rss, proc.cmdline()),
+                       lambda pid: (_rss_bytes(pid), _cmdline(pid)))
+    if procs is None:
+        return None
+    renderer = [rss for rss, cmdline in procs if "--type=renderer" in cmdline]
+    return {"browser_rss_mb": sum(rss for rss, _ in procs) / (1024 * 1024),
+            "renderer_rss_mb": sum(renderer) / (1024 * 1024),
+            "renderers": len(renderer)}
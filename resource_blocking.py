@@ -0,0 +1,116 @@
+import fnmatch
+import re
+import threading
+from urllib.parse import urlsplit
+
+ANALYTICS_DOMAINS = frozenset({
+    "google-analytics.com", "googletagmanager.com", "analytics.google.com",
+    "segment.io", "segment.com", "cdn.segment.com", "mixpanel.com", "amplitude.com",
+    "hotjar.com", "fullstory.com", "clarity.ms", "newrelic.com", "nr-data.net",
+    "scorecardresearch.com", "quantserve.com", "chartbeat.com", "heap.io",
+    "connect.facebook.net", "bat.bing.com", "sentry.io",
+})
+AD_DOMAINS = frozenset({
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com",
+    "adservice.google.com", "adnxs.com", "criteo.com", "criteo.net", "taboola.com",
+    "outbrain.com", "amazon-adsystem.com", "adsrvr.org", "rubiconproject.com",
+    "pubmatic.com", "openx.net", "moatads.com", "casalemedia.com", "yieldmo.com",
+})
+
+# Named profiles - keys are BlockingProfile arguments
+PROFILES = {
+    "none": {},
+    "no_media": {"resource_types": ("image", "media", "font")},
+    "no_tracking": {"domains": ANALYTICS_DOMAINS | AD_DOMAINS},
+    "lean": {"resource_types": ("image", "media", "font"), "domains": ANALYTICS_DOMAINS | AD_DOMAINS},
+    "text_only": {"resource_types": ("image", "media", "font", "stylesheet"),
+                  "domains": ANALYTICS_DOMAINS | AD_DOMAINS},
+}
+
+
+class BlockingStats:
+    """
+    Allowed/blocked request counts, blocked ones by reason. A blocked request
+    is never sent, so there is no size to measure - no bytes-saved figure.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.allowed = 0
+        self.blocked = 0
+        self.by_reason = {}
+
+    def record(self, reason):
+        with self._lock:
+            if reason is None:
+                self.allowed += 1
+                return
+            self.blocked += 1
+            self.by_reason[reason] = self.by_reason.get(reason, 0) + 1
+
+    def as_dict(self):
+        return {"allowed": self.allowed, "blocked": self.blocked, "by_reason": dict(self.by_reason)}
+
+    def summary(self):
+        if not self.blocked:
+            return None
+        total = self.allowed + self.blocked
+        reasons = ", ".join(f"{reason}={count}" for reason, count in sorted(self.by_reason.items()))
+        return f"🚫 Blocked {self.blocked}/{total} requests ({reasons})"
+
+
+class BlockingProfile:
+    """
+    Compiled request matcher: resource types and domains are set lookups, URL
+    globs are folded into one regex - no per-request loop over patterns.
+    """
+    def __init__(self, name="custom", resource_types=(), domains=(), url_patterns=()):
+        self.name = name
+        self.resource_types = frozenset(resource_types)
+        self.domains = frozenset(d.lower().lstrip(".") for d in domains)
+        self.url_patterns = tuple(url_patterns)
+        self._url_re = (re.compile("|".join(fnmatch.translate(p) for p in self.url_patterns))
+                        if self.url_patterns else None)
+        self._host_cache = {}
+
+    def merged(self, resource_types=(), domains=(), url_patterns=()):
+        return BlockingProfile(
+            self.name,
+            self.resource_types | frozenset(resource_types),
+            self.domains | frozenset(domains),
+            self.url_patterns + tuple(url_patterns),
+        )
+
+    def _host_blocked(self, host):
+        blocked = self._host_cache.get(host)
+        if blocked is None:
+            labels = host.split(".")
+            blocked = any(".".join(labels[idx:]) in self.domains for idx in range(len(labels) - 1))
+            if len(self._host_cache) < 4096:
+                self._host_cache[host] = blocked
+        return blocked
+
+    def match(self, url, resource_type):
+        """Reason string if the request should be blocked, else None"""
+        if resource_type in self.resource_types:
+            return resource_type
+        if self.domains:
+            host = (urlsplit(url).hostname or "").lower()
+            if host and self._host_blocked(host):
+                return "domain"
+        if self._url_re is not None and self._url_re.match(url):
+            return "url"
+        return None
+
+
+def get_profile(profile):
+    """BlockingProfile from a profile name, a dict of BlockingProfile args, or a profile"""
+    if isinstance(profile, BlockingProfile):
+        return profile
+    if isinstance(profile, dict):
+        return BlockingProfile(**profile)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown blocking profile '{profile}' (known: {', '.join(PROFILES)})")
+    return BlockingProfile(profile, **PROFILES[profile])
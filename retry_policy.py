@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+# Messages that no amount of retrying will fix
+FATAL_MESSAGES = (
+    "is not a valid selector",
+    "Unexpected token",
+    "Unknown engine",
+    "SyntaxError",
+    "strict mode violation",
+    "has been closed",
+    "Target closed",
+    "Browser closed",
+    "net::ERR_NAME_NOT_RESOLVED",
+    "net::ERR_INVALID_URL",
+    "Cannot navigate to invalid URL",
+)
+# Errors that say the site itself is unhealthy - these feed the circuit breaker
+SITE_FAILURE_MESSAGES = (
+    "net::ERR_CONNECTION",
+    "net::ERR_TIMED_OUT",
+    "net::ERR_EMPTY_RESPONSE",
+    "net::ERR_ADDRESS_UNREACHABLE",
+    "net::ERR_HTTP2",
+    "net::ERR_SSL",
+    "NS_ERROR_NET",
+)
+NAVIGATION_OPERATIONS = ("_open_impl", "_back_impl", "_forward_impl", "_refresh_impl")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The step or task ran out of its time budget"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Requests to this origin are failing fast until the breaker's cool-down ends"""
+
+
+def classify(error):
+    """RETRYABLE or FATAL for an exception raised by a Playwright call"""
+    if isinstance(error, (DeadlineExceeded, CircuitOpenError, ValueError, TypeError,
+                          AssertionError, KeyError)):
+        return FATAL
+    message = str(error)
+    if any(fragment in message for fragment in FATAL_MESSAGES):
+        return FATAL
+    return RETRYABLE
+
+
+def is_site_failure(error, operation):
+    message = str(error)
+    if any(fragment in message for fragment in SITE_FAILURE_MESSAGES):
+        return True
+    # A navigation that times out outright is a site problem, a slow selector is not
+    return operation in NAVIGATION_OPERATIONS and type(error).__name__ == "TimeoutError"
+
+
+class Deadline:
+    """Absolute point in time; remaining() shrinks as the step/task runs"""
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    @staticmethod
+    def earliest(*deadlines):
+        deadlines = [d for d in deadlines if d is not None]
+        return min(deadlines, key=lambda d: d.expires_at) if deadlines else None
+
+
+class RetryPolicy:
+    """
+    How one step retries: attempt count, jittered exponential backoff
+    (delay = uniform(0, min(max_delay, base_delay * multiplier ** n)) with
+    "full" jitter) and an optional per-step deadline in seconds.
+    """
+    FIELDS = ("max_attempts", "base_delay", "max_delay", "multiplier", "jitter", "step_deadline")
+    JITTERS = ("full", "equal", "none")
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, multiplier=2.0,
+                 jitter="full", step_deadline=None):
+        if max_attempts < 1: raise ValueError("'max_attempts' must be >= 1")
+        if jitter not in self.JITTERS: raise ValueError(f"Unknown jitter '{jitter}'")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.step_deadline = step_deadline
+
+    @classmethod
+    def from_dict(cls, options):
+        unknown = set(options) - set(cls.FIELDS)
+        if unknown: raise ValueError(f"Unknown retry option(s): {', '.join(sorted(unknown))}")
+        return cls(**options)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def with_overrides(self, options):
+        if not options:
+            return self
+        return RetryPolicy.from_dict({**self.as_dict(), **options})
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (1 = first retry)"""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        if self.jitter == "full":
+            return random.uniform(0, ceiling)
+        if self.jitter == "equal":
+            return ceiling / 2 + random.uniform(0, ceiling / 2)
+        return ceiling
+
+
+class CircuitBreaker:
+    """
+    Per-origin breaker: after `failure_threshold` consecutive site failures the
+    origin is "open" and calls fail fast with CircuitOpenError for `reset_timeout`
+    seconds. Then exactly one trial call is let through (half-open) - everyone
+    else keeps failing fast until that probe succeeds (closed) or fails (open
+    again). A probe that ends without a verdict is released by end_probe(), and
+    one that never reports back stops blocking after another `reset_timeout`.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened_at = {}
+        self._probing = {}   # origin -> monotonic start of the half-open trial call
+
+    def check(self, origin):
+        """Raise CircuitOpenError to fail fast; a probe token when this call is the half-open probe"""
+        if not origin:
+            return None
+        with self._lock:
+            opened_at = self._opened_at.get(origin)
+            if opened_at is None:
+                return None
+            now = time.monotonic()
+            if now - opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit open for {origin} - failing fast")
+            probe_started = self._probing.get(origin)
+            if probe_started is not None and now - probe_started < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit half-open for {origin} - trial call in flight")
+            # Half-open: this call is the probe
+            self._probing[origin] = now
+            return now
+
+    def end_probe(self, origin, probe):
+        """The probe finished without a site verdict (e.g. a bad selector) - let the next call try"""
+        with self._lock:
+            if self._probing.get(origin) == probe:
+                del self._probing[origin]
+
+    def record_success(self, origin):
+        with self._lock:
+            self._failures.pop(origin, None)
+            self._opened_at.pop(origin, None)
+            self._probing.pop(origin, None)
+
+    def record_failure(self, origin):
+        if not origin:
+            return
+        with self._lock:
+            if self._probing.pop(origin, None) is not None:
+                # Failed trial call - straight back to open
+                self._failures[origin] = self.failure_threshold
+                self._opened_at[origin] = time.monotonic()
+                print(f"🔌 Circuit re-opened for {origin} - trial call failed")
+                return
+            failures = self._failures.get(origin, 0) + 1
+            self._failures[origin] = failures
+            if failures >= self.failure_threshold:
+                self._opened_at[origin] = time.monotonic()
+                print(f"🔌 Circuit opened for {origin} after {failures} failures")
+
+    def state(self, origin):
+        with self._lock:
+            opened_at = self._opened_at.get(origin)
+            probing = origin in self._probing
+        if opened_at is None:
+            return "closed"
+        if time.monotonic() - opened_at < self.reset_timeout:
+            return "open"
+        return "probing" if probing else "half-open"
@@ -0,0 +1,44 @@
+import csv
+import json
+from itertools import islice
+
+
+class BadRow(ValueError):
+    """A source line that isn't a usable row - yielded in its place so the run records it and carries on"""
+
+
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _jsonl_rows(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield BadRow(f"{path}:{line_no}: invalid JSON ({e})")
+                continue
+            if not isinstance(row, dict):
+                yield BadRow(f"{path}:{line_no}: each line must be a JSON object")
+                continue
+            yield row
+
+
+def iter_rows(path, offset=0, limit=None):
+    """
+    Lazily yield input rows (dicts) from a .csv or .jsonl file - one line is
+    read per row, so a source of any size streams in constant memory.
+    A .jsonl line that isn't a JSON object is yielded as a BadRow (file, line
+    number and error) instead of ending the stream.
+    """
+    if str(path).endswith(".csv"):
+        rows = _csv_rows(path)
+    elif str(path).endswith((".jsonl", ".ndjson")):
+        rows = _jsonl_rows(path)
+    else:
+        raise ValueError(f"Unsupported row source '{path}' (use .csv or .jsonl)")
+    return islice(rows, offset, None if limit is None else offset + limit)
@@ -1,10 +1,26 @@
 from playwright_engine import PlaywrightEngine  # ← CHANGED
 from action_runner import run_actions
+from task_compiler import compile_task
 from task import TASK
+from trace_recorder import TraceRecorder
+from http_engine import HybridEngine
+import sys
 
-engine = PlaywrightEngine(max_retries=3)
+plan = compile_task(TASK)  # fail fast on a bad TASK - before Chromium starts
+# --daemon: attach to browser_daemon's Chromium instead of launching one
+# --trace: keep a Playwright trace in traces/ only if the run fails
+# --hybrid: leading static open/get_text/extract steps go over plain HTTP (needs lxml);
+#           Chromium starts only if a step needs it
+recorder = TraceRecorder() if "--trace" in sys.argv else None
+
+def make_engine():
+    return PlaywrightEngine(max_retries=3, connect="--daemon" in sys.argv, trace_recorder=recorder)
+
+engine = HybridEngine(make_engine, max_retries=3, trace_recorder=recorder) if "--hybrid" in sys.argv else make_engine()
 
 try:
-    run_actions(engine, TASK)
+    result = run_actions(engine, plan, resume="--resume" in sys.argv)
 finally:
     engine.quit()
+
+sys.exit(0 if result.passed else 1)
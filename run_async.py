@@ -0,0 +1,7 @@
+import asyncio
+
+from async_action_runner import run_tasks
+from task import TASK
+
+# Same TASK four times over - one Chromium, four isolated contexts
+asyncio.run(run_tasks([TASK] * 4, concurrency=4, max_retries=3))
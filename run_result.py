@@ -0,0 +1,43 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RunResult:
+    """What run_actions returns - where a run got to, why it stopped, what it extracted"""
+    total_steps: int
+    last_completed_step: int = 0
+    failed_step: int = None
+    error: str = None
+    error_type: str = None
+    values: dict = field(default_factory=dict)
+    resumed_from: int = None
+    elapsed_seconds: float = 0.0
+    artifacts: list = field(default_factory=list)   # retained traces/videos
+
+    @property
+    def passed(self):
+        return self.failed_step is None
+
+    def fail(self, step_idx, error):
+        self.failed_step = step_idx
+        self.error = str(error)
+        self.error_type = type(error).__name__
+
+    def as_dict(self):
+        return {
+            "passed": self.passed,
+            "total_steps": self.total_steps,
+            "last_completed_step": self.last_completed_step,
+            "failed_step": self.failed_step,
+            "error": self.error,
+            "error_type": self.error_type,
+            "values": self.values,
+            "resumed_from": self.resumed_from,
+            "elapsed_seconds": self.elapsed_seconds,
+            "artifacts": self.artifacts,
+        }
+
+
+def value_key(step, step_idx):
+    """Name an extracted value is stored under: the step's "name", else step_<n>"""
+    return step.get("name") or f"step_{step_idx}"
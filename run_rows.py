@@ -0,0 +1,39 @@
+"""
+Run one task template over every row of a CSV/JSONL file.
+
+    python run_rows.py rows.csv --task search_task.json --output results.jsonl --concurrency 8
+
+Step fields may contain {{column}} placeholders, e.g.
+    {"action": "type", "selector": "#ask-input", "value": "{{query}}"}
+"""
+import argparse
+import asyncio
+
+from async_action_runner import run_rows
+from batch_runner import load_task
+from row_sources import iter_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fan a task template out over input rows")
+    parser.add_argument("rows", help=".csv (header row = column names) or .jsonl file")
+    parser.add_argument("--task", default="task.py", help=".json or .py (TASK) template")
+    parser.add_argument("--output", default="row_results.jsonl", help="one JSON result record per row")
+    parser.add_argument("--concurrency", type=int, default=4, help="rows in flight at once")
+    parser.add_argument("--offset", type=int, default=0, help="skip this many rows")
+    parser.add_argument("--limit", type=int, default=None, help="run at most this many rows")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--headed", action="store_true", help="show the browser window")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run_rows(
+        load_task(args.task), iter_rows(args.rows, args.offset, args.limit),
+        concurrency=args.concurrency, output=args.output,
+        max_retries=args.max_retries, headless=not args.headed,
+    ))
+    print(f"📁 Results: {summary['output']}")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
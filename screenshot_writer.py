@@ -0,0 +1,104 @@
+import hashlib
+import io
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+
+FORMATS = ("png", "jpeg", "webp")
+_EXTENSIONS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+
+
+def format_for(filename, fmt=None):
+    """Explicit format, else the one implied by the file extension, else png"""
+    if fmt:
+        if fmt not in FORMATS: raise ValueError(f"Unknown screenshot format '{fmt}' (use {', '.join(FORMATS)})")
+        return fmt
+    return _EXTENSIONS.get(Path(filename).suffix.lower(), "png")
+
+
+class ScreenshotWriter:
+    """
+    Background thread that writes captured frames to disk so the next step can
+    start immediately. Identical frames (same bytes, format and quality) are
+    written once; later filenames become hard links (or copies) of the first file.
+    """
+    def __init__(self, max_pending=32):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._seen = {}             # (sha256, fmt, quality) -> first path written
+        self._lock = threading.Lock()
+        self.errors = []
+        self.written = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+        self._thread = threading.Thread(target=self._run, name="screenshot-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, path, data, fmt="png", quality=None):
+        """Queue raw Playwright bytes (png/jpeg); webp is re-encoded off-thread"""
+        self._queue.put((str(path), data, fmt, quality))
+        return str(path)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                self._write(*item)
+            except Exception as e:
+                self.errors.append(f"{item[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, data, fmt, quality):
+        # webp is encoded here, so the same capture saved at two qualities must not collide
+        key = (hashlib.sha256(data).hexdigest(), fmt, quality)
+        with self._lock:
+            existing = self._seen.get(key)
+            # Whatever was first written at `path` is about to be replaced
+            for seen_key in [k for k, seen_path in self._seen.items() if seen_path == path and k != key]:
+                del self._seen[seen_key]
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        if existing and existing != path and os.path.exists(existing):
+            if os.path.exists(path):
+                os.unlink(path)
+            try:
+                os.link(existing, path)
+            except OSError:
+                shutil.copyfile(existing, path)
+            self.deduplicated += 1
+            return
+        if fmt == "webp":
+            data = _to_webp(data, quality)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._seen[key] = path
+        self.written += 1
+        self.bytes_written += len(data)
+
+    def flush(self):
+        """Block until every queued frame is on disk; raise if any write failed"""
+        self._queue.join()
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise IOError("Screenshot write failed: " + "; ".join(errors))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+def _to_webp(data, quality):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError("WebP screenshots need Pillow: pip install pillow")
+    out = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(out, format="WEBP", quality=quality or 80)
+    return out.getvalue()
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+# One in-page pass over every candidate: index of the first one with a matching
+# element in the wanted state, or 0 (falsy, so wait_for_function keeps polling).
+# Candidates are CSS, or XPath when prefixed with "xpath=" or starting with "//".
+PROBE_JS = """([candidates, state]) => {
+    const find = (sel) => {
+        try {
+            if (sel.startsWith('xpath=') || sel.startsWith('//')) {
+                const xpath = sel.startsWith('xpath=') ? sel.slice(6) : sel;
+                const node = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                return node ? [node] : [];
+            }
+            return Array.from(document.querySelectorAll(sel.startsWith('css=') ? sel.slice(4) : sel));
+        } catch (e) {
+            return [];   // not CSS/XPath - never matches
+        }
+    };
+    const visible = (el) => {
+        if (!el.getClientRects || !el.getClientRects().length) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    for (let i = 0; i < candidates.length; i++) {
+        const matches = find(candidates[i]);
+        if (state === 'attached' ? matches.length : matches.some(visible)) return i + 1;
+    }
+    return 0;
+}"""
+
+# Playwright-only syntax PROBE_JS can't evaluate (other selector engines, chaining,
+# Playwright pseudo-classes) - lists using it are probed one locator at a time.
+# http_engine uses it too: lxml can't evaluate any of it either.
+LOCATOR_ONLY = re.compile(
+    r"^(?!css=|xpath=)[\w-]+=|^[\"']|^\.\.|>>|:(?:has-text|text|text-is|text-matches|visible|nth-match|"
+    r"left-of|right-of|above|below|near)\b")
+LOCATOR_POLL_INTERVAL = 0.1
+
+
+def is_candidate_list(selector):
+    return isinstance(selector, (list, tuple))
+
+
+def needs_locator_probe(candidates):
+    """True when a candidate uses syntax only Playwright's locators understand (text=, >>...)"""
+    return any(LOCATOR_ONLY.search(candidate.strip()) for candidate in candidates)
+
+
+class SelectorCache:
+    """
+    Which candidate selector resolved last time, per origin and step - the
+    winner is probed first next run. Entries are keyed by origin plus the
+    step's candidate list, so editing a step's candidates starts it fresh.
+    The file is rewritten atomically whenever a winner changes.
+    """
+    def __init__(self, path="selector_cache.json"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = None   # loaded on first use
+        self.reset()
+
+    def reset(self):
+        self.hits = 0       # cached winner resolved again
+        self.healed = 0     # a different candidate than last time (or than the first) won
+
+    @staticmethod
+    def key(origin, candidates):
+        digest = hashlib.sha256("\n".join(candidates).encode()).hexdigest()[:16]
+        return f"{origin or 'local'}|{digest}"
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def order(self, origin, candidates):
+        """Candidates with the cached winner (if still listed) moved to the front"""
+        with self._lock:
+            winner = self._load().get(self.key(origin, candidates))
+        if winner in candidates:
+            return [winner] + [c for c in candidates if c != winner]
+        return list(candidates)
+
+    def record(self, origin, candidates, winner):
+        key = self.key(origin, candidates)
+        with self._lock:
+            entries = self._load()
+            previous = entries.get(key)
+            if previous == winner:
+                self.hits += 1
+                return
+            if previous is not None or winner != candidates[0]:
+                self.healed += 1
+            entries[key] = winner
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def summary(self):
+        if not self.hits and not self.healed:
+            return None
+        return f"🩹 Selectors: {self.hits} resolved via cached winner, {self.healed} healed to a fallback"
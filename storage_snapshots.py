@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class SessionExpiredError(RuntimeError):
+    """A snapshot's guard selector showed up - the saved session is no longer valid"""
+
+
+class SnapshotStore:
+    """
+    Named storage_state snapshots (cookies + localStorage) with TTLs.
+
+    Loaded states are parsed once and shared: every context started from the same
+    snapshot gets the same dict, so treat it as read-only. Files are replaced
+    atomically, so parallel readers never see a half-written snapshot.
+    """
+    def __init__(self, path="snapshots", default_ttl=3600):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._cache = {}    # name -> (mtime, record)
+
+    def _file(self, name):
+        if not name or "/" in name or "\\" in name or name.startswith("."):
+            raise ValueError(f"Invalid snapshot name '{name}'")
+        return self.path / f"{name}.json"
+
+    def save(self, name, context, ttl=None, guard_selector=None):
+        return self.save_state(name, context.storage_state(), ttl, guard_selector)
+
+    def save_state(self, name, state, ttl=None, guard_selector=None):
+        """Store an already captured storage_state dict (async contexts await it first)"""
+        record = {
+            "saved_at": time.time(),
+            "ttl": self.default_ttl if ttl is None else ttl,
+            "guard_selector": guard_selector,
+            "state": state,
+        }
+        target = self._file(name)
+        tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp, target)
+        with self._lock:
+            self._cache.pop(name, None)
+        return str(target)
+
+    def _record(self, name):
+        target = self._file(name)
+        try:
+            mtime = target.stat().st_mtime
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        try:
+            with open(target) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._cache[name] = (mtime, record)
+        return record
+
+    def is_fresh(self, record):
+        ttl = record.get("ttl")
+        return not ttl or time.time() - record["saved_at"] < ttl
+
+    def load(self, name):
+        """Shared storage_state dict for `name`, or None if missing or past its TTL"""
+        record = self._record(name)
+        if record is None or not self.is_fresh(record):
+            return None
+        return record["state"]
+
+    def guard_selector(self, name):
+        record = self._record(name)
+        return record.get("guard_selector") if record else None
+
+    def invalidate(self, name):
+        with self._lock:
+            self._cache.pop(name, None)
+        try:
+            self._file(name).unlink()
+            print(f"🗑️ Snapshot '{name}' invalidated")
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,443 @@
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from types import MappingProxyType
+
+from extraction import normalize_fields
+from parallel_blocks import MODES as PARALLEL_MODES, branches_of
+from resource_blocking import PROFILES as BLOCKING_PROFILES
+from retry_policy import RetryPolicy
+from screenshot_writer import FORMATS as SCREENSHOT_FORMATS
+
+# Fields a step must carry, per action (mirrors the checks inside each handle_*)
+REQUIRED_FIELDS = {
+    "open": ("url",),
+    "click": ("selector",),
+    "type": ("selector",),
+    "wait_for": ("selector",),
+    "scroll_pixels": ("pixels",),
+    "hover": ("selector",),
+    "double_click": ("selector",),
+    "right_click": ("selector",),
+    "drag_drop": ("source", "target"),
+    "select_option": ("selector", "option"),
+    "clear": ("selector",),
+    "get_text": ("selector",),
+    "get_attribute": ("selector",),
+    "assert_visible": ("selector",),
+    "assert_text": ("selector", "expected"),
+    "mock_api": ("url_pattern",),
+    "expect_download": ("selector",),
+    "expect_screenshot": ("selector", "filename"),
+    "intercept_request": ("url_pattern",),
+    "save_storage_state": ("name",),
+    "load_storage_state": ("name",),
+    "check_session": ("name",),
+    "set_retry_policy": ("policy",),
+    "extract": ("fields",),
+    "parallel": ("branches",),
+}
+# At least one of these must be present
+ONE_OF_FIELDS = {
+    "scroll_to": ("selector", "pixels"),
+}
+# Zero is a legal value for these, so only a missing/None value is an error
+NUMERIC_FIELDS = ("seconds", "timeout", "pixels", "ttl", "batch_size", "quality", "tolerance",
+                  "max_diff_ratio")
+
+# These may hold one selector or an ordered list of candidates (see selector_healing)
+SELECTOR_FIELDS = ("selector", "source", "target")
+
+# Actions only the async runner can execute, with the reason given to sync callers
+ASYNC_ONLY_ACTIONS = {
+    "parallel": "runs its branches concurrently - use async_action_runner.run_actions",
+}
+
+# In the runners' HANDLERS tables, but neither engine implements them yet -
+# rejected up front instead of failing with an AttributeError mid-run
+UNIMPLEMENTED_ACTIONS = frozenset((
+    "emulate_mobile", "pdf", "set_geolocation", "grant_permissions", "clear_cookies",
+    "wait_for_response", "wait_for_request",
+))
+
+WAIT_ACTIONS = ("wait", "wait_seconds")
+WAIT_CONDITIONS = ("selector", "navigation", "dom_stable", "network_idle")
+OPEN_WAIT_UNTIL = ("commit", "domcontentloaded", "load", "networkidle")
+
+# {{column}} in any string step field is filled from an input row (see compile_template)
+PLACEHOLDER = re.compile(r"\{\{\s*([\w.-]+)\s*\}\}")
+
+PLAN_CACHE_SIZE = 256
+_PLAN_CACHE = OrderedDict()
+
+
+class TaskValidationError(ValueError):
+    """Raised with every problem found in a task, before any browser work starts"""
+    def __init__(self, problems):
+        self.problems = list(problems)
+        super().__init__("Invalid task:\n  " + "\n  ".join(self.problems))
+
+
+class FrozenDict(dict):
+    """Read-only dict for values nested in a compiled step - still a dict for json and normalize_fields"""
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("compiled step values are immutable")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _freeze_step(step):
+    """Read-only copy of a validated step, nested dicts and lists included"""
+    frozen = {field: _freeze(value) for field, value in step.items()}
+    if isinstance(frozen.get("ignore"), str):
+        frozen["ignore"] = (frozen["ignore"],)   # one selector to mask
+    return MappingProxyType(frozen)
+
+
+class CompiledStep:
+    """One pre-validated step: deep-frozen fields plus the bound handler that runs it"""
+    __slots__ = ("index", "action", "handler", "step", "smart_step")
+
+    def __init__(self, index, action, handler, step, smart_step):
+        object.__setattr__(self, "index", index)
+        object.__setattr__(self, "action", action)
+        object.__setattr__(self, "handler", handler)
+        object.__setattr__(self, "step", step)
+        object.__setattr__(self, "smart_step", smart_step)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledStep is immutable")
+
+    def __repr__(self):
+        return f"CompiledStep({self.index}, {self.action!r})"
+
+
+class ExecutionPlan:
+    """Immutable, validated sequence of CompiledSteps - build with compile_task()"""
+    __slots__ = ("steps", "digest")
+
+    def __init__(self, steps, digest):
+        object.__setattr__(self, "steps", tuple(steps))
+        object.__setattr__(self, "digest", digest)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ExecutionPlan is immutable")
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getitem__(self, idx):
+        return self.steps[idx]
+
+    def __repr__(self):
+        return f"ExecutionPlan({len(self.steps)} steps, {self.digest[:12]})"
+
+
+def task_digest(task):
+    """Content hash of a task list - equal tasks share one compiled plan"""
+    payload = json.dumps(task, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _action_problem(action, handlers):
+    """Why `action` can't run with these handlers, or None"""
+    if not isinstance(action, str):
+        return f"unknown action '{action}'"
+    if action in UNIMPLEMENTED_ACTIONS:
+        return f"'{action}' is not implemented by the engines"
+    if action not in handlers:
+        if action in ASYNC_ONLY_ACTIONS:
+            return f"'{action}' {ASYNC_ONLY_ACTIONS[action]}"
+        return f"unknown action '{action}'"
+    return None
+
+
+def validate_step(step, handlers):
+    """Every problem with one step, as a list of messages (empty when valid)"""
+    if not isinstance(step, dict):
+        return [f"step must be a dict, got {type(step).__name__}"]
+    action = step.get("action")
+    if not action:
+        return ["missing 'action' key"]
+    problem = _action_problem(action, handlers)
+    if problem:
+        return [problem]
+
+    problems = []
+    for field in REQUIRED_FIELDS.get(action, ()):
+        value = step.get(field)
+        if value is None or (field not in NUMERIC_FIELDS and not value):
+            problems.append(f"'{action}' missing '{field}'")
+    one_of = ONE_OF_FIELDS.get(action)
+    if one_of and not any(step.get(field) for field in one_of):
+        problems.append(f"'{action}' needs one of {', '.join(repr(f) for f in one_of)}")
+    for field in NUMERIC_FIELDS:
+        value = step.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            problems.append(f"'{field}' must be a number, got {value!r}")
+    for field in SELECTOR_FIELDS:
+        value = step.get(field)
+        if isinstance(value, (list, tuple)) and (
+                not value or not all(isinstance(c, str) and c for c in value)):
+            problems.append(f"'{field}' candidates must be a non-empty list of selector strings")
+        elif value is not None and not isinstance(value, (str, list, tuple)):
+            problems.append(f"'{field}' must be a selector or a list of candidate selectors")
+    if step.get("until") and step["until"] not in WAIT_CONDITIONS:
+        problems.append(f"unknown wait condition '{step['until']}'")
+    if step.get("until") == "selector" and not step.get("selector"):
+        problems.append("until='selector' needs a 'selector'")
+    if action == "intercept_request" and step.get("mode", "abort") not in ("abort", "continue", "network"):
+        problems.append(f"unknown intercept mode '{step['mode']}'")
+    if action == "block_resources":
+        profile = step.get("profile", "none")
+        if isinstance(profile, str) and profile not in BLOCKING_PROFILES:
+            problems.append(f"unknown blocking profile '{profile}'")
+    if action == "extract" and step.get("fields"):
+        try:
+            normalize_fields(step["fields"])
+        except ValueError as e:
+            problems.append(str(e))
+        sink = step.get("sink")
+        if sink and not str(sink).endswith((".jsonl", ".ndjson", ".csv")):
+            problems.append(f"unsupported sink '{sink}' (use .jsonl or .csv)")
+    if action == "screenshot" and step.get("format") and step["format"] not in SCREENSHOT_FORMATS:
+        problems.append(f"unknown screenshot format '{step['format']}'")
+    if action == "expect_screenshot":
+        problems.extend(_validate_ignore(step.get("ignore")))
+    for field in ("retry", "policy"):
+        options = step.get(field)
+        if options is None or (field == "policy" and action != "set_retry_policy"):
+            continue
+        if not isinstance(options, dict):
+            problems.append(f"'{field}' must be a dict of {', '.join(RetryPolicy.FIELDS)}")
+            continue
+        try:
+            RetryPolicy().with_overrides(options)
+        except (ValueError, TypeError) as e:
+            problems.append(f"bad '{field}': {e}")
+    if action == "parallel":
+        problems.extend(_validate_branches(step, handlers))
+    if step.get("wait_until") and step["wait_until"] not in OPEN_WAIT_UNTIL:
+        problems.append(f"unknown wait_until '{step['wait_until']}'")
+    return problems
+
+
+def _validate_ignore(ignore):
+    """expect_screenshot's ignore: a selector, or a list of selectors and [x, y, w, h] boxes"""
+    if ignore is None or isinstance(ignore, str):
+        return []
+    if not isinstance(ignore, (list, tuple)):
+        return [f"'ignore' must be a list of selectors and/or [x, y, w, h] boxes, got {ignore!r}"]
+    problems = []
+    for item in ignore:
+        if isinstance(item, str) and item:
+            continue
+        if not (isinstance(item, (list, tuple)) and len(item) == 4 and all(
+                isinstance(n, (int, float)) and not isinstance(n, bool) for n in item)):
+            problems.append(f"ignore entries must be selectors or [x, y, w, h], got {item!r}")
+    return problems
+
+
+def _validate_branches(step, handlers):
+    if not isinstance(step.get("branches"), (list, tuple)):
+        return ["'branches' must be a list of step lists"] if step.get("branches") else []
+    problems = []
+    if step.get("mode", "fail_fast") not in PARALLEL_MODES:
+        problems.append(f"unknown parallel mode '{step['mode']}' (use {', '.join(PARALLEL_MODES)})")
+    names = set()
+    for name, steps, timeout in branches_of(step):
+        if name in names:
+            problems.append(f"duplicate branch name '{name}'")
+        names.add(name)
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))):
+            problems.append(f"branch '{name}' timeout must be a number, got {timeout!r}")
+        if not isinstance(steps, (list, tuple)) or not steps:
+            problems.append(f"branch '{name}' needs a non-empty list of steps")
+            continue
+        for sub_idx, sub_step in enumerate(steps, 1):
+            problems.extend(f"branch '{name}' step {sub_idx}: {problem}"
+                            for problem in validate_step(sub_step, handlers))
+    return problems
+
+
+def _smart_wait_step(step, next_step):
+    """Readiness condition for a wait step, derived from the step that follows it"""
+    if step.get("until"):
+        return step
+    next_selector = next_step.get("selector") if next_step else None
+    if next_selector and next_step.get("action") not in WAIT_ACTIONS:
+        return MappingProxyType({**step, "until": "selector", "selector": next_selector})
+    return MappingProxyType({**step, "until": "dom_stable"})
+
+
+def _compile_steps(task, handlers):
+    frozen = [_freeze_step(step) for step in task]
+    steps = []
+    for step_idx, step in enumerate(frozen, 1):
+        action = step["action"]
+        smart_step = step
+        if action in WAIT_ACTIONS:
+            smart_step = _smart_wait_step(step, frozen[step_idx] if step_idx < len(frozen) else None)
+        steps.append(CompiledStep(step_idx, action, handlers[action], step, smart_step))
+    return steps
+
+
+def compile_task(task, handlers=None):
+    """
+    Validate a whole TASK list and resolve it into an ExecutionPlan.
+    Raises TaskValidationError listing every bad step. Plans are cached by content hash.
+    """
+    if isinstance(task, ExecutionPlan):
+        return task
+    if handlers is None:
+        from action_runner import HANDLERS as handlers
+
+    key = (task_digest(task), id(handlers))
+    plan = _PLAN_CACHE.get(key)
+    if plan is not None:
+        _PLAN_CACHE.move_to_end(key)
+        return plan
+
+    problems = []
+    for step_idx, step in enumerate(task, 1):
+        problems.extend(f"[Step {step_idx}] {problem}" for problem in validate_step(step, handlers))
+    if problems:
+        raise TaskValidationError(problems)
+
+    plan = ExecutionPlan(_compile_steps(task, handlers), key[0])
+    _PLAN_CACHE[key] = plan
+    if len(_PLAN_CACHE) > PLAN_CACHE_SIZE:
+        _PLAN_CACHE.popitem(last=False)
+    return plan
+
+
+def _placeholders(value):
+    """Every {{name}} used anywhere inside a step value"""
+    if isinstance(value, str):
+        return set(PLACEHOLDER.findall(value))
+    if isinstance(value, dict):
+        return set().union(*(_placeholders(v) for v in value.values())) if value else set()
+    if isinstance(value, (list, tuple)):
+        return set().union(*(_placeholders(v) for v in value)) if value else set()
+    return set()
+
+
+def _render(value, row, numeric=False):
+    if isinstance(value, str):
+        whole = PLACEHOLDER.fullmatch(value)
+        if whole:
+            # A field that is just "{{name}}" keeps the row's own type (JSONL numbers, lists...)
+            value = row[whole.group(1)]
+            if numeric and isinstance(value, str):
+                try:
+                    value = float(value) if any(c in value for c in ".eE") else int(value)
+                except ValueError:
+                    pass   # left as a string - validate_step reports it
+            return value
+        return PLACEHOLDER.sub(lambda m: str(row[m.group(1)]), value)
+    if isinstance(value, dict):
+        return {k: _render(v, row) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_render(v, row) for v in value]
+    return value
+
+
+class TaskTemplate:
+    """
+    A TASK whose step fields contain {{column}} placeholders. Steps without
+    placeholders are compiled once and shared by every row; render(row) only
+    rebuilds (and re-validates) the templated steps.
+    """
+    __slots__ = ("plan", "columns", "_templated", "_rebind", "_handlers")
+
+    def __init__(self, plan, templated, handlers):
+        self.plan = plan
+        self._templated = templated   # step position -> placeholder names
+        self._handlers = handlers
+        self.columns = frozenset().union(*templated.values()) if templated else frozenset()
+        # Wait steps take their smart condition from the next step, so a wait
+        # in front of a templated step has to be rebuilt too
+        rebind = set(templated)
+        for pos in templated:
+            if pos > 0 and plan[pos - 1].action in WAIT_ACTIONS:
+                rebind.add(pos - 1)
+        self._rebind = sorted(rebind)
+
+    def __len__(self):
+        return len(self.plan)
+
+    def __repr__(self):
+        return f"TaskTemplate({len(self.plan)} steps, columns={sorted(self.columns)})"
+
+    def render(self, row):
+        """ExecutionPlan for one input row; TaskValidationError if the row doesn't fit"""
+        if not self._templated:
+            return self.plan
+        missing = sorted(name for name in self.columns if name not in row)
+        if missing:
+            raise TaskValidationError([f"row has no value for {', '.join(repr(m) for m in missing)}"])
+
+        steps = list(self.plan.steps)
+        problems = []
+        for pos in self._templated:
+            compiled = steps[pos]
+            step = {field: _render(value, row, field in NUMERIC_FIELDS) for field, value in compiled.step.items()}
+            problems.extend(f"[Step {compiled.index}] {problem}" for problem in validate_step(step, self._handlers))
+            step = _freeze_step(step)
+            steps[pos] = CompiledStep(compiled.index, compiled.action, compiled.handler, step, step)
+        if problems:
+            raise TaskValidationError(problems)
+        for pos in self._rebind:
+            compiled = steps[pos]
+            if compiled.action in WAIT_ACTIONS:
+                next_step = steps[pos + 1].step if pos + 1 < len(steps) else None
+                steps[pos] = CompiledStep(compiled.index, compiled.action, compiled.handler, compiled.step,
+                                          _smart_wait_step(compiled.step, next_step))
+
+        rendered = [dict(steps[pos].step) for pos in self._templated]
+        return ExecutionPlan(steps, task_digest([self.plan.digest, rendered]))
+
+
+def compile_template(task, handlers=None):
+    """
+    Validate a TASK containing {{column}} placeholders once, for reuse across
+    many input rows. Templated steps are checked for a known, literal action
+    up front and fully validated per row by TaskTemplate.render().
+    """
+    if handlers is None:
+        from action_runner import HANDLERS as handlers
+
+    templated = {}
+    problems = []
+    for step_idx, step in enumerate(task, 1):
+        names = _placeholders(step) if isinstance(step, dict) else set()
+        if not names:
+            problems.extend(f"[Step {step_idx}] {problem}" for problem in validate_step(step, handlers))
+            continue
+        templated[step_idx - 1] = names
+        if _placeholders(step.get("action")):
+            problems.append(f"[Step {step_idx}] 'action' cannot be a placeholder")
+        elif _action_problem(step.get("action"), handlers):
+            problems.append(f"[Step {step_idx}] {_action_problem(step.get('action'), handlers)}")
+    if problems:
+        raise TaskValidationError(problems)
+
+    plan = ExecutionPlan(_compile_steps(task, handlers), task_digest(task))
+    return TaskTemplate(plan, templated, handlers)
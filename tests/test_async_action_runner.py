@@ -0,0 +1,252 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import async_action_runner
+from async_action_runner import run_actions, run_rows, run_tasks
+from metrics import MetricsRegistry, new_timings
+from parallel_blocks import ParallelBranchError
+from row_sources import iter_rows
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+
+class FakeEngine:
+    """Just enough of AsyncPlaywrightEngine for the runners: open() takes a while, get_text() echoes"""
+    def __init__(self, log, **kwargs):
+        self.log = log
+        self.browser = object()
+        self.page = None
+        self.timings = new_timings()
+        self.hooks = []
+        self.run_stats = []
+        self.active_snapshot = None
+        self.run_context = None
+        self.context = FakeContext()
+
+    async def start(self, new_page=True):
+        self.log["engines"].append(self)
+        return self
+
+    async def begin_task(self):
+        return None
+
+    def end_task(self):
+        pass
+
+    def begin_step(self, action, overrides=None, task_deadline=None):
+        self.task_deadline = task_deadline
+
+    def bind_page(self, page):
+        bound = FakeEngine(self.log)
+        bound.page = page
+        bound.context = self.context
+        bound.hooks = self.hooks
+        bound.run_context = self.run_context
+        self.log["bound"].append(bound)
+        return bound
+
+    async def open(self, url, wait_until="networkidle"):
+        self.log["active"] += 1
+        self.log["peak"] = max(self.log["peak"], self.log["active"])
+        try:
+            await asyncio.sleep(0.01 if "slow" not in url else 10)
+        finally:
+            self.log["active"] -= 1
+        if "broken" in url:
+            raise RuntimeError(f"cannot open {url}")
+
+    async def get_text(self, selector):
+        self.timings["attempts"] += 1
+        if "missing" in selector:
+            raise RuntimeError(f"no element {selector}")
+        return f"text of {selector}"
+
+    async def quit(self):
+        self.log["quits"].append(self)
+
+
+@pytest.fixture
+def log(monkeypatch, tmp_path):
+    """Swap AsyncPlaywrightEngine for FakeEngine - returns what the fakes recorded"""
+    monkeypatch.chdir(tmp_path)   # the runners' default SnapshotStore() creates ./snapshots
+    log = {"active": 0, "peak": 0, "engines": [], "workers": [], "quits": [], "fail_workers": 0,
+           "bound": []}
+
+    def engine_class(**kwargs):
+        return FakeEngine(log, **kwargs)
+
+    async def from_browser(browser, **kwargs):
+        if log["fail_workers"]:
+            log["fail_workers"] -= 1
+            raise RuntimeError("context crashed")
+        worker = FakeEngine(log, **kwargs)
+        log["workers"].append(worker)
+        return worker
+
+    engine_class.from_browser = from_browser
+    monkeypatch.setattr(async_action_runner, "AsyncPlaywrightEngine", engine_class)
+    return log
+
+
+def task(url, selector="h1"):
+    return [{"action": "open", "url": url}, {"action": "get_text", "selector": selector, "name": "title"}]
+
+
+def test_run_tasks_caps_concurrency(log):
+    summary = asyncio.run(run_tasks([task(f"https://a.example/{n}") for n in range(6)],
+                                    concurrency=2, metrics=None))
+    assert summary["passed"] == 6 and summary["failed"] == 0
+    assert log["peak"] == 2
+    assert [result.values["title"] for result in summary["results"]] == ["text of h1"] * 6
+    # every worker and then the shared browser were closed
+    assert {id(e) for e in log["quits"][:-1]} == {id(w) for w in log["workers"]}
+    assert log["quits"][-1] is log["engines"][0]
+
+
+def test_run_tasks_reports_failures_per_task(log):
+    log["fail_workers"] = 1
+    tasks = [task("https://a.example/"), task("https://a.example/broken"), task("https://b.example/")]
+    summary = asyncio.run(run_tasks(tasks, concurrency=1, metrics=None))
+    results = summary["results"]
+    # a context that fails to start is that task's failure - the other tasks still run
+    assert not results[0].passed and results[0].failed_step == 1
+    assert results[0].error_type == "RuntimeError" and results[0].error == "context crashed"
+    assert not results[1].passed and results[1].failed_step == 1
+    assert results[2].passed
+    assert summary["passed"] == 1 and summary["failed"] == 2
+
+
+def test_run_tasks_validates_before_launching(log):
+    with pytest.raises(async_action_runner.TaskValidationError):
+        asyncio.run(run_tasks([task("https://a.example/"), [{"action": "teleport"}]], metrics=None))
+    assert log["engines"] == []
+
+
+def test_run_rows_pulls_rows_lazily(log):
+    def rows():
+        for n in range(7):
+            # a row is read only once fewer than `concurrency` are unfinished
+            assert n - len(log["quits"]) <= 3
+            yield {"slug": n}
+
+    summary = asyncio.run(run_rows(task("https://a.example/{{slug}}"), rows(), concurrency=3, metrics=None))
+    assert summary["rows"] == 7 and summary["passed"] == 7
+    assert log["peak"] <= 3
+    assert [record["row"] for record in summary["results"]] == list(range(1, 8))
+    assert summary["results"][0]["input"] == {"slug": 0}
+
+
+def test_run_rows_records_bad_rows_without_a_context(log):
+    rows = [{"slug": "a"}, {}, {"slug": "b"}]
+    summary = asyncio.run(run_rows(task("https://a.example/{{slug}}"), rows, metrics=None))
+    failed = summary["results"][1]
+    assert not failed["passed"] and failed["failed_step"] == 0
+    assert "no value for 'slug'" in failed["error"]
+    assert len(log["workers"]) == 2
+
+
+def test_run_rows_records_bad_source_lines_and_carries_on(log, tmp_path):
+    source = tmp_path / "rows.jsonl"
+    source.write_text('{"slug": "a"}\nnot json\n{"slug": "b"}\n', encoding="utf-8")
+    summary = asyncio.run(run_rows(task("https://a.example/{{slug}}"), iter_rows(source), metrics=None))
+    assert summary["rows"] == 3 and summary["passed"] == 2
+    failed = next(record for record in summary["results"] if record["row"] == 2)
+    assert failed["input"] is None and failed["failed_step"] == 0
+    assert failed["error_type"] == "BadRow" and "rows.jsonl:2: invalid JSON" in failed["error"]
+    assert len(log["workers"]) == 2
+
+
+def test_run_rows_finishes_in_flight_rows_when_the_source_fails(log, tmp_path):
+    def rows():
+        yield {"slug": "a"}
+        yield {"slug": "b"}
+        raise OSError("input file went away")
+
+    output = tmp_path / "out.jsonl"
+    with pytest.raises(OSError):
+        asyncio.run(run_rows(task("https://a.example/{{slug}}"), rows(), concurrency=2, output=output,
+                             metrics=None))
+    # both started rows ran to the end and were written before the error surfaced
+    assert [json.loads(line)["passed"] for line in output.read_text().splitlines()] == [True, True]
+    assert log["quits"][-1] is log["engines"][0]
+
+
+def test_run_rows_cancels_in_flight_rows_before_quitting(log):
+    async def run():
+        rows = [{"slug": "slow"}, {"slug": "fast"}, {"slug": "never-started"}]
+        await asyncio.wait_for(run_rows(task("https://a.example/{{slug}}"), rows, concurrency=2,
+                                        metrics=None), timeout=0.5)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    # the slow row was cancelled mid-step and closed its context before the browser quit
+    assert len(log["workers"]) == 3
+    assert {id(e) for e in log["quits"][:-1]} == {id(w) for w in log["workers"]}
+    assert log["quits"][-1] is log["engines"][0]
+    assert log["active"] == 0
+
+
+def parallel(*branches, mode="fail_fast"):
+    return [{"action": "parallel", "name": "pages", "mode": mode, "branches": list(branches)}]
+
+
+def branch(name, *selectors):
+    return {"name": name, "steps": [{"action": "get_text", "selector": selector, "name": selector}
+                                    for selector in selectors]}
+
+
+def test_parallel_merges_branch_values_by_name(log):
+    engine = FakeEngine(log)
+    registry = MetricsRegistry()
+    task = parallel(branch("left", "h1", "h2"), branch("right", "h3"))
+    result = asyncio.run(run_actions(engine, task, metrics=registry, task_deadline=60))
+    assert result.passed
+    assert result.values["pages"] == {"left": {"h1": "text of h1", "h2": "text of h2"},
+                                      "right": {"h3": "text of h3"}}
+    assert all(page.closed for page in engine.context.pages) and len(engine.context.pages) == 2
+    # branch steps go through the top-level step path: own timings, task deadline, metrics
+    left, right = log["bound"]
+    assert left.timings is not right.timings is not engine.timings
+    assert left.task_deadline is engine.task_deadline is not None
+    assert [(r["action"], r["attempts"]) for r in registry.records] == \
+        [("get_text", 1)] * 3 + [("parallel", 0)]
+
+
+def test_parallel_fail_fast_raises_for_the_failing_branch(log):
+    engine = FakeEngine(log)
+    task = parallel(branch("left", "h1"), branch("right", "h2", "#missing"))
+    result = asyncio.run(run_actions(engine, task, metrics=None))
+    assert not result.passed and result.failed_step == 1
+    assert result.error_type == ParallelBranchError.__name__
+    assert "branch 'right' failed at its step 2" in result.error
+
+
+def test_parallel_collect_all_reports_the_failed_branch(log):
+    engine = FakeEngine(log)
+    registry = MetricsRegistry()
+    task = parallel(branch("left", "h1"), branch("right", "h2", "#missing"), mode="collect_all")
+    result = asyncio.run(run_actions(engine, task, metrics=registry))
+    assert result.passed
+    right = result.values["pages"]["right"]
+    assert right["failed_step"] == 2 and right["values"] == {"h2": "text of h2"}
+    assert result.values["pages"]["left"] == {"h1": "text of h1"}
+    assert registry.failures == {("get_text", "RuntimeError"): 1}
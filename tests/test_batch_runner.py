@@ -0,0 +1,98 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+import batch_runner
+from batch_runner import discover_tasks, load_task, run_batch
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the fake workers need fork")
+
+
+def fake_worker(conn, options):
+    """Stands in for _worker_main: no browser, behaviour picked by the task path"""
+    while True:
+        path = conn.recv()
+        if path is None:
+            break
+        if "crash" in path:
+            os._exit(3)
+        if "hang" in path:
+            time.sleep(60)
+        passed = "fail" not in path
+        record = {"ts": time.time(), "run_id": path, "step": 1, "action": "open", "selector": None,
+                  "wall": 0.5, "playwright": 0.4, "sleep": 0.0, "backoff": 0.0, "attempts": 1,
+                  "failure": None if passed else "TimeoutError"}
+        payload = {"passed": passed, "last_completed_step": 1}
+        if "traced" in path:
+            payload["trace"] = {"retained": not passed, "bytes_written": 1024, "tracing_seconds": 0.01,
+                                "cpu_seconds": 0.2, "rss_mb": 150.0}
+        conn.send(("done", path, payload, [record]))
+
+
+@pytest.fixture(autouse=True)
+def fake_workers(monkeypatch):
+    monkeypatch.setattr(batch_runner, "multiprocessing", multiprocessing.get_context("fork"))
+    monkeypatch.setattr(batch_runner, "_worker_main", fake_worker)
+
+
+def by_task(report):
+    return {result["task"]: result for result in report["results"]}
+
+
+def test_report_merges_results_and_metrics():
+    report, merged = run_batch(["a", "b-fail", "c"], workers=2)
+    assert report["tasks"] == 3 and report["passed"] == 2 and report["failed"] == 1
+    assert report["crashed"] == report["timed_out"] == report["restarts"] == 0
+    assert report["workers"] == 2
+    assert report["actions"] == {"open": {"count": 3, "total_seconds": pytest.approx(1.5)}}
+    assert merged.failures == {("open", "TimeoutError"): 1}
+    assert {result["worker"] for result in report["results"]} <= {1, 2}
+    assert "tracing" not in report
+
+
+def test_crashed_worker_is_replaced():
+    report, _ = run_batch(["a", "crash", "b", "c"], workers=1)
+    results = by_task(report)
+    assert results["crash"]["error_type"] == "WorkerCrashed"
+    assert results["crash"]["error"] == "worker exited with code 3"
+    assert report["crashed"] == 1 and report["restarts"] == 1
+    # only the crashed task failed - its replacement ran the rest
+    assert report["passed"] == 3
+    assert results["b"]["worker"] == 2
+
+
+def test_hung_worker_is_killed_after_the_task_timeout():
+    started = time.monotonic()
+    report, _ = run_batch(["hang", "a"], workers=1, task_timeout=1)
+    assert time.monotonic() - started < 30
+    results = by_task(report)
+    assert results["hang"]["error_type"] == "TaskTimeout"
+    assert results["a"]["passed"]
+    assert report["timed_out"] == 1 and report["restarts"] == 1
+
+
+def test_tracing_summary():
+    report, _ = run_batch(["traced-a", "traced-fail"], workers=1, trace_sample=0.1)
+    assert report["tracing"]["runs"] == 2 and report["tracing"]["retained"] == 1
+    assert report["tracing"]["bytes_written"] == 2048
+    assert report["tracing"]["peak_rss_mb"] == 150.0
+
+
+def test_discover_tasks(tmp_path):
+    (tmp_path / "b.json").write_text(json.dumps([{"action": "open", "url": "https://a.example"}]))
+    (tmp_path / "a.py").write_text("TASK = [{'action': 'wait'}]\n")
+    (tmp_path / "_helpers.py").write_text("")
+    (tmp_path / "notes.txt").write_text("")
+    assert discover_tasks(tmp_path) == [str(tmp_path / "a.py"), str(tmp_path / "b.json")]
+    # a .json task file is a one-task manifest; a .txt manifest lists paths
+    assert discover_tasks(tmp_path / "b.json") == [str(tmp_path / "b.json")]
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# smoke tests\nb.json\n\n/abs/task.py\n")
+    assert discover_tasks(manifest) == [str(tmp_path / "b.json"), "/abs/task.py"]
+    assert load_task(str(tmp_path / "a.py")) == [{"action": "wait"}]
+    with pytest.raises(ValueError, match="does not define TASK"):
+        load_task(str(tmp_path / "_helpers.py"))
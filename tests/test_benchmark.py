@@ -0,0 +1,58 @@
+import pytest
+
+from benchmark import MIN_REGRESSION_MS, compare, percentile
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    ([7], 95, 7),
+    ([1, 2, 3, 4], 50, 2.5),
+    ([4, 1, 3, 2], 0, 1),
+    ([4, 1, 3, 2], 100, 4),
+    ([10, 20, 30, 40, 50], 95, 48),
+])
+def test_percentile(values, pct, expected):
+    assert percentile(values, pct) == pytest.approx(expected)
+
+
+def latency(p50, p95=None):
+    return {"p50_ms": p50, "p95_ms": p50 if p95 is None else p95}
+
+
+def results(actions=(), fast_path=None, tasks_per_minute=None):
+    return {"actions": dict(actions), "fast_path": fast_path,
+            "throughput": {"tasks_per_minute": tasks_per_minute} if tasks_per_minute is not None else None}
+
+
+def test_compare_flags_latency_over_the_threshold():
+    baseline = results({"click": latency(100), "fill": latency(100)})
+    current = results({"click": latency(125), "fill": latency(115)})
+    assert compare(current, baseline, threshold=0.2) == [
+        "click p50_ms: 100.0 -> 125.0ms (+25%)",
+        "click p95_ms: 100.0 -> 125.0ms (+25%)",
+    ]
+    assert compare(current, baseline, threshold=0.3) == []
+
+
+def test_compare_ignores_slowdowns_below_min_regression_ms():
+    baseline = results({"hover": latency(2)})
+    assert compare(results({"hover": latency(2 + MIN_REGRESSION_MS)}), baseline) == []
+    assert compare(results({"hover": latency(3 + MIN_REGRESSION_MS)}), baseline) != []
+
+
+def test_compare_with_a_zero_baseline():
+    regressions = compare(results({"check": latency(0, 50)}), results({"check": latency(0, 0)}))
+    assert regressions == ["check p95_ms: 0.0 -> 50.0ms (was 0ms)"]
+
+
+def test_compare_fast_path_and_throughput():
+    fast = {"http": latency(10), "browser": latency(200), "matches_browser": True}
+    baseline = results(fast_path=fast, tasks_per_minute=120)
+    assert compare(results(fast_path=fast, tasks_per_minute=110), baseline) == []
+
+    slower = {**fast, "http": latency(30), "matches_browser": False}
+    assert compare(results(fast_path=slower, tasks_per_minute=90), baseline) == [
+        "fast_path: HTTP results differ from the browser's",
+        "fast_path p50_ms: 10.0 -> 30.0ms (+200%)",
+        "fast_path p95_ms: 10.0 -> 30.0ms (+200%)",
+        "throughput: 120.0 -> 90.0 tasks/min (-25%)",
+    ]
@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import subprocess
+
+import pytest
+
+import browser_daemon
+
+DEAD_PID = 2 ** 22 + 1   # above Linux's pid_max
+
+
+def write_state(state_dir, **state):
+    state = {"pid": os.getpid(), "server_pid": os.getpid(), "ws_endpoint": "ws://127.0.0.1:1/x",
+             "headless": True, **state}
+    browser_daemon._write_state(state, state_dir)
+    return state
+
+
+def test_health_reports_why_the_daemon_is_down(tmp_path):
+    assert browser_daemon.health(tmp_path) == (False, "not running")
+    write_state(tmp_path, server_pid=DEAD_PID)
+    assert browser_daemon.health(tmp_path) == (False, f"browser server process {DEAD_PID} is gone")
+    write_state(tmp_path)
+    ok, reason = browser_daemon.health(tmp_path, timeout=0.5)
+    assert not ok and reason.startswith("websocket port not accepting connections")
+
+
+def test_leases_of_dead_processes_are_removed(tmp_path):
+    lease = browser_daemon.acquire_lease(tmp_path)
+    stale = tmp_path / "leases" / f"{DEAD_PID}-deadbeef"
+    stale.write_text("0")
+    assert browser_daemon._live_leases(tmp_path / "leases") == 1
+    assert not stale.exists()
+    browser_daemon.release_lease(lease)
+    browser_daemon.release_lease(lease)   # a second release is harmless
+    assert browser_daemon._live_leases(tmp_path / "leases") == 0
+
+
+class FakeServer:
+    def __init__(self, output):
+        self.pid = os.getpid()
+        self.stdout = io.StringIO(output)
+
+
+def test_launch_server_keeps_draining_the_output(tmp_path, monkeypatch, capsys):
+    launched = []
+
+    def popen(command, **kwargs):
+        assert kwargs["stdout"] is subprocess.PIPE
+        launched.append(FakeServer("ws://127.0.0.1:9222/abc\nlistening\nrenderer crashed\n"))
+        return launched[-1]
+
+    monkeypatch.setattr(browser_daemon.subprocess, "Popen", popen)
+    server, ws_endpoint = browser_daemon._launch_server({"headless": True, "args": []}, tmp_path)
+    assert ws_endpoint == "ws://127.0.0.1:9222/abc"
+    assert json.loads((tmp_path / "server_config.json").read_text())["headless"] is True
+    for thread in browser_daemon.threading.enumerate():
+        if thread.name == "browser-server-output":
+            thread.join(5)
+    assert server.stdout.closed
+    assert capsys.readouterr().out == "[browser server] listening\n[browser server] renderer crashed\n"
+
+
+def test_launch_server_without_an_endpoint_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(browser_daemon.subprocess, "Popen", lambda command, **kwargs: FakeServer("oops\n"))
+    killed = []
+    monkeypatch.setattr(browser_daemon, "_kill_server", killed.append)
+    with pytest.raises(RuntimeError, match="did not report a websocket endpoint"):
+        browser_daemon._launch_server({"headless": True, "args": []}, tmp_path)
+    assert len(killed) == 1
+
+
+@pytest.mark.parametrize("headless, warns", [(None, False), (True, False), (False, True)])
+def test_ensure_running_reuses_a_healthy_daemon(tmp_path, monkeypatch, capsys, headless, warns):
+    state = write_state(tmp_path, headless=True)
+    monkeypatch.setattr(browser_daemon, "health", lambda state_dir: (True, "ok"))
+    monkeypatch.setattr(browser_daemon, "start", lambda **kwargs: pytest.fail("must not start a daemon"))
+    assert browser_daemon.ensure_running(headless, tmp_path) == state
+    assert ("runs with headless=True, not headless=False" in capsys.readouterr().out) is warns
+
+
+def test_ensure_running_starts_a_headless_daemon_by_default(tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(browser_daemon, "health", lambda state_dir: (False, "not running"))
+    monkeypatch.setattr(browser_daemon, "start", lambda **kwargs: started.append(kwargs) or {})
+    browser_daemon.ensure_running(state_dir=tmp_path)
+    browser_daemon.ensure_running(headless=False, state_dir=tmp_path)
+    assert [kwargs["headless"] for kwargs in started] == [True, False]
+
+
+def test_viewport_option():
+    assert browser_daemon._viewport("1280X800") == {"width": 1280, "height": 800}
+    assert browser_daemon._viewport(None) is None
+
+
+def test_failed_connect_releases_the_lease(tmp_path, monkeypatch):
+    pytest.importorskip("playwright")
+    import playwright_engine
+
+    class FakePlaywright:
+        stopped = False
+
+        def __init__(self):
+            self.chromium = self
+
+        def start(self):
+            return self
+
+        def connect(self, ws_endpoint):
+            raise RuntimeError("connection refused")
+
+        def stop(self):
+            self.stopped = True
+
+    playwright = FakePlaywright()
+    monkeypatch.setattr(browser_daemon, "STATE_DIR", tmp_path)
+    monkeypatch.setattr(browser_daemon, "ensure_running", lambda headless: {"ws_endpoint": "ws://127.0.0.1:1/x"})
+    monkeypatch.setattr(playwright_engine, "sync_playwright", lambda: playwright)
+    with pytest.raises(RuntimeError, match="connection refused"):
+        playwright_engine.PlaywrightEngine(connect=True)
+    assert playwright.stopped
+    assert browser_daemon._live_leases(tmp_path / "leases") == 0
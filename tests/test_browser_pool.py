@@ -0,0 +1,190 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+        self.url = "about:blank"
+
+    def on(self, event, handler):
+        pass
+
+    def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+    def goto(self, url):
+        self.url = url
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = []
+        self.closed = False
+        self.fail_reset = False
+
+    def on(self, event, handler):
+        pass
+
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def unroute_all(self, behavior=None):
+        pass
+
+    def clear_cookies(self):
+        if self.fail_reset:
+            raise RuntimeError("context crashed")
+
+    def clear_permissions(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, args):
+        self.args = args
+        self.contexts = []
+        self.closed = False
+
+    def new_context(self, viewport=None):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEngine:
+    def __init__(self, context=None, **kwargs):
+        self.context = context
+        self.kwargs = kwargs
+        self.trace_recorder = kwargs.get("trace_recorder")
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def launched(monkeypatch):
+    """Swap Playwright for fakes; returns every browser the pool launches"""
+    browsers = []
+
+    def launch(headless=True, args=()):
+        browsers.append(FakeBrowser(args))
+        return browsers[-1]
+
+    driver = SimpleNamespace(chromium=SimpleNamespace(launch=launch), stop=lambda: None)
+    monkeypatch.setattr(browser_pool, "sync_playwright", lambda: SimpleNamespace(start=lambda: driver))
+    monkeypatch.setattr(browser_pool, "PlaywrightEngine", FakeEngine)
+    monkeypatch.setattr(browser_pool, "browser_rss_mb", lambda marker: None)
+    return browsers
+
+
+def test_warm_contexts_are_hits_and_overflow_is_a_miss(launched):
+    pool = BrowserPool(size=1, contexts_per_browser=2)
+    engines = [pool.acquire() for _ in range(3)]
+    assert len(launched) == 1
+    assert pool.stats()["hits"] == 2 and pool.stats()["misses"] == 1
+    assert engines[0].context in launched[0].contexts
+    assert pool.stats()["leased_contexts"] == 3
+
+    for engine in engines:
+        pool.release(engine)
+    stats = pool.stats()
+    assert stats["idle_contexts"] == 3 and stats["leased_contexts"] == 0
+    assert stats["resets"] == 3
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+
+
+def test_release_resets_and_reuses_the_context(launched):
+    pool = BrowserPool(size=1, contexts_per_browser=1)
+    with pool.lease() as engine:
+        context = engine.context
+        context.new_page()
+    assert len(context.pages) == 1   # the extra page was closed
+    assert context.pages[0].url == "about:blank"
+    with pool.lease() as engine:
+        assert engine.context is context
+    assert pool.stats()["hits"] == 2
+
+
+def test_failed_reset_replaces_the_context(launched):
+    pool = BrowserPool(size=1, contexts_per_browser=1)
+    engine = pool.acquire()
+    engine.context.fail_reset = True
+    pool.release(engine)
+    assert engine.context.closed
+    assert pool.stats()["reset_failures"] == 1
+    with pool.lease() as again:
+        assert again.context is not engine.context
+
+
+def test_browser_recycles_after_task_count(launched):
+    pool = BrowserPool(size=1, contexts_per_browser=1, recycle_after=2)
+    for _ in range(2):
+        with pool.lease():
+            pass
+    assert launched[0].closed
+    assert len(launched) == 2 and not launched[1].closed
+    assert pool.stats()["recycles"] == 1 and pool.stats()["browsers"] == 1
+
+
+def test_retiring_browser_waits_for_outstanding_leases(launched):
+    pool = BrowserPool(size=1, contexts_per_browser=2, recycle_after=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    assert not launched[0].closed      # `second` still holds a context on it
+    third = pool.acquire()             # served by an early replacement
+    assert third.context.browser is launched[1]
+    pool.release(second)
+    assert launched[0].closed
+    assert pool.stats()["recycles"] == 1
+    pool.release(third)
+
+
+def test_browser_recycles_past_rss_ceiling(launched, monkeypatch):
+    readings = iter([400.0, 2000.0])
+    monkeypatch.setattr(browser_pool, "browser_rss_mb", lambda marker: next(readings))
+    pool = BrowserPool(size=1, contexts_per_browser=1, recycle_after=None, max_rss_mb=1000)
+    with pool.lease():
+        pass
+    assert pool.stats()["recycles"] == 0
+    with pool.lease():
+        pass
+    assert launched[0].closed
+    assert pool.stats()["recycles"] == 1
+
+
+def test_release_rejects_foreign_engines(launched):
+    pool = BrowserPool(size=1)
+    with pytest.raises(ValueError):
+        pool.release(FakeEngine(context=FakeContext(None)))
+
+
+def test_leases_share_one_screenshot_writer(launched):
+    pool = BrowserPool(size=1, contexts_per_browser=2)
+    first, second = pool.acquire(), pool.acquire()
+    writer = pool.screenshot_writer
+    assert first.kwargs["screenshot_writer"] is writer is second.kwargs["screenshot_writer"]
+    pool.release(first)
+    pool.release(second)
+    with pool.lease() as third:
+        assert third.kwargs["screenshot_writer"] is writer
+    pool.close()
+    assert pool.screenshot_writer is None and not writer._thread.is_alive()
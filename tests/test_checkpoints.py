@@ -0,0 +1,91 @@
+import pytest
+
+from action_runner import run_actions
+from checkpoints import CheckpointStore
+from metrics import new_timings
+
+TASK = [
+    {"action": "open", "url": "https://shop.example/"},
+    {"action": "get_text", "selector": "h1", "name": "title"},
+    {"action": "click", "selector": "#checkout", "checkpoint": True},
+    {"action": "get_text", "selector": ".total", "name": "total"},
+    {"action": "click", "selector": "#pay"},
+]
+
+
+class FakeEngine:
+    """Records what ran; clicks on selectors in `broken` fail"""
+    def __init__(self, broken=()):
+        self.timings = new_timings()
+        self.broken = set(broken)
+        self.url = "about:blank"
+        self.calls = []
+        self.restored = None
+
+    def open(self, url, wait_until="networkidle"):
+        self.calls.append(("open", url))
+        self.url = url
+
+    def click(self, selector):
+        self.calls.append(("click", selector))
+        if selector in self.broken:
+            raise RuntimeError(f"{selector} is not clickable")
+        self.url = f"https://shop.example/{selector.lstrip('#')}"
+
+    def get_text(self, selector):
+        self.calls.append(("get_text", selector))
+        return f"text of {selector}"
+
+    def checkpoint_state(self):
+        return self.url, {"cookies": [{"name": "cart", "value": "3"}], "origins": []}
+
+    def restore_checkpoint(self, url, storage_state):
+        self.restored = (url, storage_state)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(tmp_path / "checkpoints")
+
+
+def test_resume_picks_up_after_the_last_checkpoint(store):
+    failed = run_actions(FakeEngine(broken={"#pay"}), TASK, metrics=None, checkpoints=store)
+    assert failed.failed_step == 5 and failed.last_completed_step == 4
+    key = next(p.stem for p in store.path.glob("*.json"))
+    saved = store.load(key)
+    assert saved["step"] == 3 and saved["url"] == "https://shop.example/checkout"
+    assert saved["values"] == {"title": "text of h1"}
+
+    engine = FakeEngine()
+    resumed = run_actions(engine, TASK, metrics=None, checkpoints=store, resume=True)
+    assert resumed.passed and resumed.resumed_from == 3
+    assert engine.restored == ("https://shop.example/checkout", saved["storage_state"])
+    # steps 1-3 are not run again; their values come from the checkpoint
+    assert engine.calls == [("get_text", ".total"), ("click", "#pay")]
+    assert resumed.values == {"title": "text of h1", "total": "text of .total"}
+    assert resumed.last_completed_step == 5
+    assert store.load(key) is None   # a passing run clears its checkpoint
+
+
+def test_resume_without_a_checkpoint_starts_at_step_one(store):
+    engine = FakeEngine()
+    result = run_actions(engine, TASK, metrics=None, checkpoints=store, resume=True)
+    assert result.passed and result.resumed_from is None
+    assert engine.restored is None and engine.calls[0] == ("open", "https://shop.example/")
+
+
+def test_checkpoint_after_and_explicit_key(store):
+    task = [dict(step, checkpoint=False) for step in TASK]
+    result = run_actions(FakeEngine(broken={"#checkout"}), task, metrics=None, checkpoints=store,
+                         checkpoint_after=[2], checkpoint_key="shop-run")
+    assert result.failed_step == 3
+    assert store.load("shop-run")["step"] == 2
+
+
+def test_store_round_trip_and_clear(store):
+    store.save("k", 4, "https://a.example/", None, {"when": object()})
+    saved = store.load("k")
+    assert saved["step"] == 4 and saved["values"]["when"].startswith("<object")
+    store.clear("k")
+    store.clear("k")
+    assert store.load("k") is None
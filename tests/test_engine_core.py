@@ -0,0 +1,210 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import async_playwright_engine
+from async_playwright_engine import AsyncPlaywrightEngine
+from engine_core import PLAYWRIGHT_DEFAULT_TIMEOUT
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from retry_policy import CircuitBreaker, Deadline, DeadlineExceeded, RetryPolicy
+from selector_healing import SelectorCache
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+        self.first = self
+
+    async def count(self):
+        return int(self.selector in self.page.present)
+
+    async def is_visible(self):
+        return self.selector in self.page.present
+
+
+class FakePage:
+    """The page calls the engine core makes - timeouts and locator probes"""
+    def __init__(self, url="https://shop.example/cart", present=()):
+        self.url = url
+        self.present = set(present)
+        self.timeouts = []
+
+    def set_default_timeout(self, timeout):
+        self.timeouts.append(timeout)
+
+    def set_default_navigation_timeout(self, timeout):
+        pass
+
+    def is_closed(self):
+        return False
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = AsyncPlaywrightEngine(retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01, jitter="none"),
+                                   circuit_breaker=CircuitBreaker(failure_threshold=2),
+                                   selector_cache=SelectorCache(tmp_path / "selectors.json"))
+    engine.page = FakePage()
+    yield engine
+    engine.screenshot_writer.close()
+
+
+def flaky(failures, error=RuntimeError("flaky")):
+    calls = []
+
+    async def _click_impl():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return "clicked"
+    return _click_impl, calls
+
+
+def test_retry_until_success(engine):
+    func, calls = flaky(2)
+    assert asyncio.run(engine._retry_operation(func)) == "clicked"
+    assert len(calls) == 3
+    assert engine.timings["attempts"] == 3
+    assert engine.timings["backoff"] == pytest.approx(0.01 + 0.02)
+
+
+def test_fatal_error_is_not_retried(engine):
+    func, calls = flaky(5, ValueError("bad step"))
+    with pytest.raises(ValueError):
+        asyncio.run(engine._retry_operation(func))
+    assert len(calls) == 1
+
+
+def test_final_failure_after_max_attempts(engine):
+    func, calls = flaky(5)
+    with pytest.raises(RuntimeError, match="flaky"):
+        asyncio.run(engine._retry_operation(func))
+    assert len(calls) == 3
+
+
+def test_site_failures_open_the_circuit(engine):
+    func, _ = flaky(5, RuntimeError("net::ERR_CONNECTION_REFUSED"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine._retry_operation(func))
+    assert engine.circuit_breaker.state("https://shop.example") == "open"
+
+
+def test_expired_deadline_stops_before_the_call(engine):
+    engine.begin_step("click", task_deadline=Deadline(0))
+    func, calls = flaky(0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(engine._retry_operation(func))
+    assert calls == []
+
+
+def test_deadline_clamps_default_timeouts_and_backoff(engine):
+    engine.begin_step("click", {"base_delay": 5}, task_deadline=Deadline(2))
+    func, calls = flaky(1)
+    with pytest.raises(RuntimeError):
+        # the 5s backoff doesn't fit in the 2s budget - no second attempt
+        asyncio.run(engine._retry_operation(func))
+    assert len(calls) == 1
+    assert 0 < engine.page.timeouts[0] <= 2000
+    # the next step without a deadline restores Playwright's default
+    engine.begin_step("click")
+    asyncio.run(engine._retry_operation(flaky(0)[0]))
+    assert engine.page.timeouts[-1] == PLAYWRIGHT_DEFAULT_TIMEOUT
+
+
+def test_resolve_probes_locator_candidates_and_remembers_the_winner(engine):
+    engine.page.present = {"text=Buy"}
+    candidates = ["#buy", "text=Buy"]
+    assert asyncio.run(engine._resolve(candidates, timeout=500)) == "text=Buy"
+    assert engine.selector_cache.healed == 1
+    assert engine.selector_cache.order("https://shop.example", candidates)[0] == "text=Buy"
+    assert asyncio.run(engine._resolve(candidates, wait=False)) == "text=Buy"
+    assert engine.selector_cache.hits == 1
+
+
+def test_resolve_without_a_match(engine):
+    candidates = ["#buy", "text=Buy"]
+    assert asyncio.run(engine._resolve(candidates, wait=False)) is None
+    with pytest.raises(PlaywrightTimeoutError, match="None of 2 candidate selectors visible"):
+        asyncio.run(engine._resolve(candidates, timeout=20))
+
+
+def test_plain_selector_is_not_probed(engine):
+    engine.page = SimpleNamespace(url="https://shop.example/")   # no locator() - must not be called
+    assert asyncio.run(engine._resolve("#buy")) == "#buy"
+
+
+class RouteContext:
+    """Routes registered on a context - just what block_resources and begin_task touch"""
+    def __init__(self, page):
+        self.pages = [page]
+        self.routes = []
+
+    async def route(self, pattern, handler):
+        self.routes.append(handler)
+
+    async def unroute(self, pattern, handler):
+        self.routes.remove(handler)
+
+    def on(self, event, handler):
+        pass
+
+
+def test_base_blocking_profile_outlives_the_task_route(engine):
+    engine.context = RouteContext(engine.page)
+
+    async def scenario():
+        await engine.begin_task()
+        await engine.block_resources("no_media")   # task-scoped route
+        engine.end_task()
+        await engine.block_resources("lean")       # between tasks: the base profile
+        await engine.begin_task()                  # drops the task's route
+        return engine.context.routes
+
+    routes = asyncio.run(scenario())
+    assert routes == [engine._route_blocking] and engine.blocking.name == "lean"
+
+
+def test_browser_pids_are_resolved_once_per_launch(engine, monkeypatch):
+    scans = []
+
+    def browser_root_pids(marker):
+        scans.append(marker)
+        return [100 + len(scans)]
+
+    async def launch(headless, args):
+        return SimpleNamespace(args=args)
+
+    monkeypatch.setattr(async_playwright_engine, "browser_root_pids", browser_root_pids)
+    engine.playwright = SimpleNamespace(chromium=SimpleNamespace(launch=launch))
+    browser = asyncio.run(engine._launch_browser())
+    assert engine.browser_pids() == engine.browser_pids() == [101]
+    assert scans == browser.args
+    asyncio.run(engine._launch_browser())   # a relaunch resolves the new browser's PIDs
+    assert engine.browser_pids() == [102] and len(scans) == 2
+
+
+def test_extract_batches_slice_one_row_snapshot(engine):
+    calls = []
+
+    async def evaluate(script, args):
+        calls.append(args)
+        row_selector, fields, key, offset, limit = args
+        return {"total": 5, "records": [{"n": n} for n in range(offset, min(offset + limit, 5))]}
+
+    engine.page.evaluate = evaluate
+
+    async def scenario():
+        return [batch async for batch in engine.extract({"n": "span"}, "li", batch_size=2)]
+
+    batches = asyncio.run(scenario())
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [args[3] for args in calls] == [0, 2, 4]
+    assert len({args[2] for args in calls}) == 1   # one snapshot key for the whole extraction
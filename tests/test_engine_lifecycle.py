@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+import engine_lifecycle
+from engine_lifecycle import AsyncEngineLifecycle, EngineLifecycle
+
+
+class FakePage:
+    def __init__(self, context, fail_close=False):
+        self.context = context
+        self.fail_close = fail_close
+        self.handlers = []
+
+    def on(self, event, handler):
+        self.handlers.append((event, handler))
+
+    def remove_listener(self, event, handler):
+        self.handlers.remove((event, handler))
+
+    def close(self):
+        if self.fail_close:
+            raise RuntimeError("target crashed")
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+        self.routes = []
+        self.handlers = []
+
+    def new_page(self, **kwargs):
+        self.pages.append(FakePage(self, **kwargs))
+        return self.pages[-1]
+
+    def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    def unroute(self, pattern, handler):
+        self.routes.remove((pattern, handler))
+
+    def on(self, event, handler):
+        self.handlers.append((event, handler))
+
+    def remove_listener(self, event, handler):
+        self.handlers.remove((event, handler))
+
+
+def handler(*args):
+    pass
+
+
+def test_cleanup_removes_only_task_scoped_routes_and_listeners():
+    lifecycle = EngineLifecycle()
+    context = FakeContext()
+    own_page = context.new_page()
+    lifecycle.watch(context)
+    lifecycle.route(context, "**/*", handler)                    # engine setup - stays
+    lifecycle.start_task()
+    lifecycle.route(context, "**/api/*", handler)                # task route
+    lifecycle.route(context, "**/ws", handler, persistent=True)  # explicitly kept
+    lifecycle.on(own_page, "dialog", handler)
+    context.new_page()                                           # a popup the task left open
+    lifecycle.end_task()
+
+    lifecycle.cleanup(context, keep_page=own_page)
+    assert context.pages == [own_page]
+    assert [pattern for pattern, _ in context.routes] == ["**/*", "**/ws"]
+    assert own_page.handlers == [] and len(context.handlers) == 1   # the page watcher stays
+    counters = lifecycle.counters
+    assert counters["pages_closed"] == 1 and counters["routes_removed"] == 1
+    assert counters["listeners_removed"] == 1 and counters["tasks"] == 1
+
+
+def test_cleanup_errors_are_counted_not_raised():
+    lifecycle = EngineLifecycle()
+    context = FakeContext()
+    own_page = context.new_page()
+    context.new_page(fail_close=True)
+    lifecycle.cleanup(context, keep_page=own_page)
+    assert lifecycle.counters["cleanup_errors"] == 1 and lifecycle.counters["pages_closed"] == 0
+
+
+def test_detach_and_forget_drop_everything_on_a_context():
+    lifecycle = EngineLifecycle()
+    context, other = FakeContext(), FakeContext()
+    lifecycle.route(context, "**/*", handler)
+    lifecycle.on(context.new_page(), "console", handler)
+    lifecycle.route(other, "**/*", handler)
+    lifecycle.detach(context)
+    assert context.routes == [] and context.pages[0].handlers == []
+    assert len(other.routes) == 1
+    lifecycle.forget(other)   # closing context - nothing to unroute, just stop tracking
+    assert len(other.routes) == 1 and lifecycle.sample(other)["routes"] == 0
+
+
+def test_sample_reports_peaks_and_counter_increments(monkeypatch):
+    monkeypatch.setattr(engine_lifecycle, "chromium_memory_mb",
+                        lambda pids: {"browser_rss_mb": 800.0, "renderer_rss_mb": 500.0, "renderers": 3})
+    lifecycle = EngineLifecycle()
+    context = FakeContext()
+    context.new_page()
+    lifecycle.start_task()
+    lifecycle.route(context, "**/*", handler)
+    first = lifecycle.sample(context, browser_pids=[1])
+    assert first["pages"] == 1 and first["routes"] == 1 and first["renderers"] == 3
+    assert first["counters"]["tasks"] == 1
+    lifecycle.start_task()
+    second = lifecycle.sample(context)   # no pids - no memory numbers
+    assert second["browser_rss_mb"] is None
+    assert second["counters"]["tasks"] == 1   # increments since the previous sample
+    assert lifecycle.stats()["peak_browser_rss_mb"] == 800.0 and lifecycle.stats()["tasks"] == 2
+
+
+@pytest.mark.parametrize("limits, sample, due", [
+    ({}, {"pages": 50, "browser_rss_mb": 9000, "renderer_rss_mb": 9000}, None),
+    ({"max_browser_rss_mb": 1000}, {"pages": 1, "browser_rss_mb": 1500.0, "renderer_rss_mb": 900.0},
+     ("browser", "browser RSS 1500MB > 1000MB")),
+    ({"max_browser_rss_mb": 1000, "max_renderer_rss_mb": 600},
+     {"pages": 1, "browser_rss_mb": 900.0, "renderer_rss_mb": 700.0}, ("context", "renderer RSS 700MB > 600MB")),
+    ({"max_pages": 3}, {"pages": 4, "browser_rss_mb": None, "renderer_rss_mb": None},
+     ("context", "4 pages open > 3")),
+])
+def test_recycle_due(limits, sample, due):
+    assert EngineLifecycle(**limits).recycle_due(sample) == due
+
+
+def test_recycle_after_counts_tasks_in_the_current_context():
+    lifecycle = EngineLifecycle(recycle_after=2)
+    sample = {"pages": 1, "browser_rss_mb": None, "renderer_rss_mb": None}
+    lifecycle.start_task()
+    assert lifecycle.recycle_due(sample) is None
+    lifecycle.start_task()
+    assert lifecycle.recycle_due(sample) == ("context", "2 tasks in this context")
+    lifecycle.forget(FakeContext())   # a fresh context starts counting again
+    assert lifecycle.recycle_due(sample) is None
+
+
+class AsyncFakeContext(FakeContext):
+    async def route(self, pattern, handler):
+        super().route(pattern, handler)
+
+    async def unroute(self, pattern, handler):
+        super().unroute(pattern, handler)
+
+
+def test_async_lifecycle_cleanup():
+    lifecycle = AsyncEngineLifecycle()
+    context = AsyncFakeContext()
+
+    async def scenario():
+        await lifecycle.route(context, "**/*", handler)
+        lifecycle.start_task()
+        await lifecycle.route(context, "**/api/*", handler)
+        lifecycle.end_task()
+        await lifecycle.cleanup(context, keep_page=None)
+        assert [pattern for pattern, _ in context.routes] == ["**/*"]
+        await lifecycle.detach(context)
+
+    asyncio.run(scenario())
+    assert context.routes == [] and lifecycle.counters["routes_removed"] == 2
@@ -0,0 +1,58 @@
+import csv
+import json
+
+import pytest
+
+from extraction import CsvSink, JsonlSink, normalize_fields, open_sink
+
+
+def test_normalize_fields():
+    assert normalize_fields({
+        "title": "h2",
+        "link": {"selector": "a", "attribute": "href"},
+        "price": {"selector": ".price", "property": "textContent"},
+        "row_id": {"attribute": "data-id"},
+    }) == {
+        "title": {"selector": "h2", "attribute": None, "property": None},
+        "link": {"selector": "a", "attribute": "href", "property": None},
+        "price": {"selector": ".price", "attribute": None, "property": "textContent"},
+        "row_id": {"selector": "", "attribute": "data-id", "property": None},   # the row itself
+    }
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({}, "non-empty dict"),
+    (["h2"], "non-empty dict"),
+    ({"title": 3}, "field 'title' must be a selector string or a dict"),
+    ({"title": {"selector": "h2", "attr": "x"}}, "field 'title' has unknown key(s): attr"),
+    ({"title": {"attribute": "a", "property": "b"}}, "'attribute' or 'property', not both"),
+])
+def test_normalize_fields_rejects(fields, message):
+    with pytest.raises(ValueError) as excinfo:
+        normalize_fields(fields)
+    assert message in str(excinfo.value)
+
+
+def test_sinks(tmp_path):
+    records = [{"title": "Ünïcode", "price": "1"}, {"title": "b", "price": None}]
+    jsonl = open_sink(tmp_path / "out" / "rows.jsonl", ["title", "price"])
+    assert isinstance(jsonl, JsonlSink)
+    jsonl.write(records)
+    jsonl.close()
+    with open(jsonl.path, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == records
+
+    path = tmp_path / "rows.csv"
+    for append in (False, True):
+        sink = open_sink(path, ["title", "price"], append=append)
+        assert isinstance(sink, CsvSink)
+        sink.write(records)
+        sink.close()
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 4 and rows[0] == {"title": "Ünïcode", "price": "1"}   # one header
+
+
+def test_unsupported_sink(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported sink"):
+        open_sink(tmp_path / "rows.xlsx", ["a"])
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+import http_engine
+from http_engine import NeedsBrowser, http_eligible, http_prefix, is_static_selector
+from retry_policy import Deadline, DeadlineExceeded
+from task_compiler import compile_task
+
+needs_lxml = pytest.mark.skipif(not http_engine.available(), reason="lxml not installed")
+
+
+def parse(markup):
+    return http_engine.lxml_html.fragment_fromstring(markup)
+
+
+@pytest.mark.parametrize("selector, static", [
+    ("h2.title", True),
+    ("ul > li:nth-child(2) a[href]", True),
+    ("text=Buy", False),
+    ("#cart >> .item", False),
+    ("button:has-text('Buy')", False),
+    ("//a", False),
+    ("css=h2", False),
+    (["#a", "#b"], False),
+    ("", False),
+])
+def test_is_static_selector(selector, static):
+    assert is_static_selector(selector) is static
+
+
+def test_http_eligible():
+    assert http_eligible({"action": "get_text", "selector": "h1"})
+    assert not http_eligible({"action": "click", "selector": "h1"})
+    assert not http_eligible({"action": "get_text", "selector": "h1", "browser": True})
+    assert http_eligible({"action": "extract", "rows": "li", "fields": {"name": "a", "row": {"attribute": "id"}}})
+    assert not http_eligible({"action": "extract", "fields": {"name": {"selector": "a", "property": "value"}}})
+
+
+
+def test_http_prefix_counts_leading_static_steps():
+    plan = compile_task([{"action": "open", "url": "https://a.example/"},
+                         {"action": "get_text", "selector": "h1"},
+                         {"action": "click", "selector": "#more"},
+                         {"action": "get_text", "selector": "h2"}])
+    assert http_prefix(plan.steps) == 2
+    # a plan that doesn't start with open has no page to fetch
+    assert http_prefix(plan.steps[1:]) == 0
+
+
+@needs_lxml
+@pytest.mark.parametrize("markup, expected", [
+    ("<div>  Hello\n   <b>big</b>   world  </div>", "Hello big world"),
+    ("<div><p>One</p><p>Two</p></div>", "One\n\nTwo"),
+    ("<div>a<br>b</div>", "a\nb"),
+    ("<div><h1>Title</h1>text <span>inline</span></div>", "Title\ntext inline"),
+    ("<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>", "a\tb\nc"),
+    ("<div>shown<span style='display: none'>hidden</span><script>x()</script></div>", "shown"),
+    ("<div><pre>  keep\n  this</pre></div>", "  keep\n  this"),
+    ("<div hidden>  raw   text </div>", "  raw   text "),
+])
+def test_inner_text(markup, expected):
+    assert http_engine.inner_text(parse(markup)) == expected
+
+
+@needs_lxml
+def test_unknown_charset_needs_browser(monkeypatch):
+    engine = http_engine.HttpEngine()
+    response = SimpleNamespace(status=200, getheader=lambda name, default=None: {
+        "Content-Type": "text/html; charset=x-no-such-charset"}.get(name, default))
+    monkeypatch.setattr(engine, "_fetch", lambda url: (url, response, b"<p>hi</p>"))
+    with pytest.raises(NeedsBrowser, match="unknown charset 'x-no-such-charset'"):
+        engine._load("https://a.example/")
+
+
+@needs_lxml
+def test_expired_task_deadline_is_not_retried(monkeypatch):
+    engine = http_engine.HttpEngine(max_retries=3)
+    engine.begin_step("open", task_deadline=Deadline(0))
+    monkeypatch.setattr(http_engine.time, "sleep", lambda seconds: pytest.fail("backed off"))
+    with pytest.raises(DeadlineExceeded):
+        engine.open("https://a.example/")
+    assert engine.timings["attempts"] == 1
+
+
+@needs_lxml
+def test_backoff_is_capped_at_the_task_deadline(monkeypatch):
+    engine = http_engine.HttpEngine(max_retries=2)
+    engine.begin_step("open", {"base_delay": 5, "jitter": "none"}, task_deadline=Deadline(0.5))
+    sleeps = []
+    monkeypatch.setattr(http_engine.time, "sleep", sleeps.append)
+
+    def refused(url, headers, timeout=None):
+        raise ConnectionRefusedError("refused")
+
+    monkeypatch.setattr(engine.pool, "request", refused)
+    with pytest.raises(NeedsBrowser):
+        engine.open("https://a.example/")
+    assert len(sleeps) == 1 and sleeps[0] <= 0.5
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+import metrics
+from metrics import Histogram, MetricsRegistry, new_timings
+from task_compiler import compile_task
+
+
+@pytest.fixture
+def plan():
+    return compile_task([
+        {"action": "open", "url": "https://example.com"},
+        {"action": "click", "selector": ["#buy", "text=Buy"]},
+    ])
+
+
+def timings(playwright=0.0, sleep=0.0, backoff=0.0, attempts=1):
+    return {**new_timings(), "playwright": playwright, "sleep": sleep, "backoff": backoff,
+            "attempts": attempts}
+
+
+def test_histogram_buckets():
+    hist = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        hist.observe(value)
+    assert hist.counts == [2, 1, 1]
+    assert list(hist.cumulative()) == [(0.1, 2), (1, 3), (float("inf"), 4)]
+    assert hist.count == 4 and hist.sum == pytest.approx(3.65)
+
+
+def test_record_step_aggregates(plan):
+    registry = MetricsRegistry(buckets=(1, 10))
+    registry.record_step("run", plan[0], timings(playwright=0.4), 0.5)
+    registry.record_step("run", plan[0], timings(playwright=2, backoff=1, attempts=2), 3.5,
+                         TimeoutError("slow"))
+    record = registry.record_step("run", plan[1], timings(sleep=0.2), 0.3)
+
+    assert record["selector"] == "#buy || text=Buy"
+    assert registry.by_action["open"].count == 2
+    assert registry.by_selector["#buy || text=Buy"].count == 1
+    assert registry.phase_totals[("open", "playwright")] == pytest.approx(2.4)
+    assert registry.phase_totals[("open", "backoff")] == 1
+    assert registry.attempts == {"open": 3, "click": 1}
+    assert registry.failures == {("open", "TimeoutError"): 1}
+
+
+def test_selector_series_are_bounded():
+    registry = MetricsRegistry(max_selectors=3)
+    long_selector = "div.results > ul > li:nth-child(2) > a[href*='/product/'][data-track='yes']"
+    steps = compile_task([{"action": "click", "selector": selector}
+                          for selector in ("#a", long_selector, "#c", "#d", "#e")])
+    for compiled in steps:
+        registry.record_step("run", compiled, timings(), 0.1)
+
+    label = metrics.selector_label(long_selector)
+    assert len(label) == metrics.MAX_SELECTOR_LABEL and label == metrics.selector_label(long_selector)
+    assert list(registry.by_selector) == ["#a", label, "#c", metrics.OTHER_SELECTORS]
+    assert registry.by_selector[metrics.OTHER_SELECTORS].count == 2
+    # records keep the full selector
+    assert registry.records[1]["selector"] == long_selector
+
+
+def test_keep_records_bounds_memory(plan):
+    registry = MetricsRegistry(keep_records=2)
+    for _ in range(5):
+        registry.record_step("run", plan[0], timings(), 0.1)
+    assert len(registry.records) == 2
+    assert registry.by_action["open"].count == 5
+
+
+def test_export_jsonl_and_streaming(plan, tmp_path):
+    stream = tmp_path / "stream.jsonl"
+    registry = MetricsRegistry(jsonl_path=str(stream))
+    registry.record_step("r1", plan[0], timings(), 0.1)
+    registry.record_step("r1", plan[1], timings(), 0.2, ValueError("x"))
+
+    exported = registry.export_jsonl(str(tmp_path / "export.jsonl"))
+    for path in (exported, stream):
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert [r["action"] for r in records] == ["open", "click"]
+        assert records[1]["failure"] == "ValueError"
+    stream_file = registry._jsonl
+    registry.record_step("r2", plan[0], timings(), 0.1)
+    assert registry._jsonl is stream_file   # one handle for the whole stream
+    registry.close()
+    assert stream_file.closed and len(stream.read_text().splitlines()) == 3
+
+
+def test_to_prometheus(plan):
+    registry = MetricsRegistry(buckets=(1,))
+    registry.record_step("run", plan[0], timings(playwright=0.5), 0.5)
+    registry.record_step("run", plan[1], timings(), 2, RuntimeError("boom"))
+    registry.record_resources({"pages": 3, "browser_rss_mb": None, "counters": {"pages_closed": 2}})
+    registry.record_resources({"pages": 1, "counters": {"pages_closed": 1}})
+    text = registry.to_prometheus()
+
+    assert '# TYPE pw_step_duration_seconds histogram' in text
+    assert 'pw_step_duration_seconds_bucket{action="open",le="1.0"} 1' in text
+    assert 'pw_step_duration_seconds_bucket{action="click",le="1.0"} 0' in text
+    assert 'pw_step_duration_seconds_bucket{action="click",le="+Inf"} 1' in text
+    assert 'pw_step_phase_seconds_total{action="open",phase="playwright"} 0.5' in text
+    assert 'pw_step_failures_total{action="click",error="RuntimeError"} 1' in text
+    assert "pw_engine_open_pages 1" in text
+    assert "pw_browser_rss_megabytes" not in text
+    assert 'pw_engine_lifecycle_total{event="pages_closed"} 3' in text
+
+
+def test_label_values_are_escaped():
+    assert metrics._escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+def test_hooks_for_merges_engine_and_global_hooks():
+    class Engine:
+        hooks = [metrics.Hook()]
+
+    hook = metrics.Hook()
+    metrics.add_hook(hook)
+    try:
+        assert metrics.hooks_for(Engine()) == Engine.hooks + [hook]
+    finally:
+        metrics.remove_hook(hook)
+    assert metrics.hooks_for(object()) == []
@@ -0,0 +1,148 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from engine_lifecycle import EngineLifecycle
+from network_cache import MatchRules, NetworkCache
+
+
+def request(url, method="GET", resource_type="document", body=None):
+    return SimpleNamespace(url=url, method=method, resource_type=resource_type, post_data_buffer=body)
+
+
+class FakeRoute:
+    def __init__(self, req, fetch_error=None, status=200, body=b"payload"):
+        self.request = req
+        self.calls = []
+        self._fetch_error = fetch_error
+        self._response = SimpleNamespace(status=status, headers={"content-type": "text/plain",
+                                                                 "content-length": "7"},
+                                          body=lambda: body)
+
+    def fetch(self):
+        if self._fetch_error:
+            raise self._fetch_error
+        return self._response
+
+    def fallback(self):
+        self.calls.append(("fallback",))
+
+    def abort(self, code):
+        self.calls.append(("abort", code))
+
+    def fulfill(self, **kwargs):
+        self.calls.append(("fulfill", kwargs))
+
+
+def test_key_normalises_query():
+    rules = MatchRules()
+    assert rules.key(request("https://a.example/p?b=2&a=1&utm_source=x&_=123")) == \
+        "GET https://a.example/p?a=1&b=2"
+    assert rules.key(request("https://a.example/p?_=1")) == "GET https://a.example/p"
+    assert MatchRules(ignore_query=True).key(request("https://a.example/p?a=1")) == "GET https://a.example/p"
+
+
+def test_key_skips_uncacheable_requests():
+    rules = MatchRules(resource_types=["document", "script"])
+    assert rules.key(request("https://a.example/", method="POST")) is None
+    assert rules.key(request("https://a.example/i.png", resource_type="image")) is None
+    assert rules.key(request("data:text/plain,hi")) is None
+
+
+def test_key_can_include_post_body():
+    rules = MatchRules(methods=["post"], match_body=True)
+    one = rules.key(request("https://a.example/api", "POST", body=b'{"q": 1}'))
+    two = rules.key(request("https://a.example/api", "POST", body=b'{"q": 2}'))
+    assert one.startswith("POST https://a.example/api #") and one != two
+
+
+def test_bad_mode(tmp_path):
+    with pytest.raises(ValueError, match="Unknown cache mode"):
+        NetworkCache(tmp_path, mode="mirror")
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    cache = NetworkCache(tmp_path, mode="record", max_bytes=10)
+    cache._store("a", "https://a.example/a", 200, {}, b"aaaa")
+    cache._store("b", "https://a.example/b", 200, {}, b"bbbb")
+    cache.index["a"]["last_used"] += 100   # "a" was just replayed
+    cache._store("c", "https://a.example/c", 200, {}, b"cccc")
+
+    assert set(cache.index) == {"a", "c"}
+    assert cache.evictions == 1
+    assert sorted(p.name for p in cache.bodies.iterdir()) == sorted(
+        cache.index[key]["body"] for key in ("a", "c"))
+
+
+def test_shared_bodies_are_counted_once(tmp_path):
+    cache = NetworkCache(tmp_path, mode="record", max_bytes=10)
+    for key in ("a", "b", "c"):
+        cache._store(key, f"https://a.example/{key}", 200, {}, b"same-body")
+    assert len(cache.index) == 3 and cache.evictions == 0
+    assert len(list(cache.bodies.iterdir())) == 1
+
+
+def test_rerecording_drops_the_old_body(tmp_path):
+    cache = NetworkCache(tmp_path, mode="record")
+    cache._store("a", "https://a.example/a", 200, {"Content-Encoding": "gzip", "X-Id": "1"}, b"old")
+    cache._store("a", "https://a.example/a", 200, {}, b"new")
+    assert len(list(cache.bodies.iterdir())) == 1
+    cache._store("b", "https://a.example/b", 200, {"Content-Encoding": "gzip", "X-Id": "1"}, b"x")
+    assert cache.index["b"]["headers"] == {"X-Id": "1"}
+
+
+def test_save_merges_other_processes_entries(tmp_path):
+    first = NetworkCache(tmp_path, mode="record")
+    second = NetworkCache(tmp_path, mode="record")
+    first._store("a", "https://a.example/a", 200, {}, b"from first")
+    second._store("b", "https://a.example/b", 200, {}, b"from second")
+    first.save()
+    second.save()
+
+    with open(tmp_path / "index.json") as f:
+        assert set(json.load(f)) == {"a", "b"}
+    assert set(NetworkCache(tmp_path).index) == {"a", "b"}
+
+
+def test_replay_and_record_routing(tmp_path):
+    cache = NetworkCache(tmp_path, mode="auto")
+    route = FakeRoute(request("https://a.example/p"))
+    cache._route(route)
+    assert route.calls[0][0] == "fulfill" and cache.stored == 1
+
+    replay = FakeRoute(request("https://a.example/p"))
+    cache._route(replay)
+    assert replay.calls == [("fulfill", {"status": 200, "headers": {"content-type": "text/plain"},
+                                         "body": b"payload"})]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_failed_fetch_falls_back(tmp_path):
+    cache = NetworkCache(tmp_path, mode="record")
+    route = FakeRoute(request("https://a.example/p"), fetch_error=OSError("connection reset"))
+    cache._route(route)
+    assert route.calls == [("fallback",)]
+    assert cache.index == {}
+
+
+def test_offline_aborts_misses(tmp_path):
+    cache = NetworkCache(tmp_path, mode="replay", offline=True)
+    route = FakeRoute(request("https://a.example/p", method="POST"))
+    cache._route(route)
+    assert route.calls == [("abort", "internetdisconnected")]
+
+
+def test_install_registers_a_persistent_lifecycle_route(tmp_path):
+    routes = []
+    context = SimpleNamespace(pages=[], route=lambda pattern, handler: routes.append((pattern, handler)),
+                              unroute=lambda pattern, handler: routes.remove((pattern, handler)))
+    lifecycle = EngineLifecycle()
+    lifecycle.start_task()   # even when installed mid-task, the cache route outlives the task
+    cache = NetworkCache(tmp_path / "cache")
+    cache.install(context, lifecycle)
+    assert routes == [("**/*", cache._route)]
+    lifecycle.cleanup(context, keep_page=None)
+    assert routes == [("**/*", cache._route)]
+    lifecycle.detach(context)
+    assert routes == [] and lifecycle.counters["routes_removed"] == 1
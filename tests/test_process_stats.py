@@ -0,0 +1,70 @@
+import types
+
+import pytest
+
+import process_stats
+
+# 1 -> 2 -> 4, 1 -> 3; 10 is an unrelated root
+CHILDREN = {1: [2, 3], 2: [4], 10: []}
+RSS = {1: 100, 2: 200, 3: 300, 4: 400, 10: 1000}
+
+
+@pytest.fixture
+def proc_tree(monkeypatch):
+    """A fake /proc: no psutil, fixed parent/child links and RSS per PID"""
+    monkeypatch.setattr(process_stats, "psutil", None)
+    monkeypatch.setattr(process_stats.os.path, "isdir", lambda path: True)
+    monkeypatch.setattr(process_stats, "_children_map", lambda: CHILDREN)
+    monkeypatch.setattr(process_stats, "_rss_bytes", lambda pid: RSS[pid])
+
+
+def test_walk_tree_visits_each_process_once(proc_tree):
+    readings = process_stats._walk_tree([1, 2], None, lambda pid: pid)
+    assert sorted(readings) == [1, 2, 3, 4]
+
+
+def test_walk_tree_unsupported_platform(monkeypatch):
+    monkeypatch.setattr(process_stats, "psutil", None)
+    monkeypatch.setattr(process_stats.os.path, "isdir", lambda path: False)
+    assert process_stats._walk_tree([1], None, lambda pid: pid) is None
+    assert process_stats.process_tree_rss_mb([1]) is None
+
+
+def test_process_tree_rss_mb_sums_descendants(proc_tree):
+    assert process_stats.process_tree_rss_mb([1, 10]) == 2000 / (1024 * 1024)
+
+
+def test_chromium_memory_mb_splits_renderers(proc_tree, monkeypatch):
+    cmdlines = {3: ["chrome", "--type=renderer"], 4: ["chrome", "--type=renderer"]}
+    monkeypatch.setattr(process_stats, "_cmdline", lambda pid: cmdlines.get(pid, ["chrome"]))
+    memory = process_stats.chromium_memory_mb([1])
+    assert memory["renderers"] == 2
+    assert memory["renderer_rss_mb"] == 700 / (1024 * 1024)
+    assert memory["browser_rss_mb"] == 1000 / (1024 * 1024)
+
+
+def test_psutil_walk_skips_only_processes_that_exit(monkeypatch):
+    class Error(Exception):
+        pass
+
+    class Process:
+        def __init__(self, pid):
+            if pid not in RSS:
+                raise Error(pid)
+            self.pid = pid
+
+        def children(self, recursive=False):
+            found, stack = [], list(CHILDREN.get(self.pid, []))
+            while stack:
+                pid = stack.pop()
+                found.append(Process(pid))
+                stack.extend(CHILDREN.get(pid, []))
+            return found
+
+        def memory_info(self):
+            if self.pid == 3:
+                raise Error(self.pid)   # exited between children() and the read
+            return types.SimpleNamespace(rss=RSS[self.pid])
+
+    monkeypatch.setattr(process_stats, "psutil", types.SimpleNamespace(Process=Process, Error=Error))
+    assert process_stats.process_tree_rss_mb([1, 99]) == 700 / (1024 * 1024)
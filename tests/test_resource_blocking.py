@@ -0,0 +1,63 @@
+import pytest
+
+from resource_blocking import BlockingProfile, BlockingStats, PROFILES, get_profile
+
+
+@pytest.mark.parametrize("url, resource_type, reason", [
+    ("https://shop.example/logo.png", "image", "image"),
+    ("https://shop.example/app.js", "script", None),
+    ("https://www.google-analytics.com/collect", "xhr", "domain"),
+    ("https://stats.g.doubleclick.net/pixel", "image", "image"),
+    ("https://stats.g.doubleclick.net/pixel", "script", "domain"),
+    ("https://notdoubleclick.net/app.js", "script", None),
+    ("https://DOUBLECLICK.NET/x", "script", "domain"),
+    ("data:text/plain,hi", "other", None),
+])
+def test_lean_profile(url, resource_type, reason):
+    assert get_profile("lean").match(url, resource_type) == reason
+
+
+def test_domain_match_never_blocks_a_bare_tld():
+    profile = BlockingProfile(domains=["com"])
+    assert profile.match("https://example.com/", "document") is None
+
+
+def test_url_patterns_are_globs():
+    profile = BlockingProfile(url_patterns=["*/ads/*", "*.mp4"])
+    assert profile.match("https://site.example/ads/banner", "document") == "url"
+    assert profile.match("https://cdn.example/intro.mp4", "media") == "url"
+    assert profile.match("https://site.example/adsense", "document") is None
+
+
+def test_merged_adds_rules_without_changing_the_original():
+    base = get_profile("no_media")
+    merged = base.merged(resource_types=["stylesheet"], domains=[".Tracker.example"],
+                         url_patterns=["*/beacon"])
+    assert merged.name == "no_media"
+    assert merged.match("https://a.example/s.css", "stylesheet") == "stylesheet"
+    assert merged.match("https://cdn.tracker.example/t.js", "script") == "domain"
+    assert merged.match("https://a.example/beacon", "xhr") == "url"
+    assert base.match("https://a.example/s.css", "stylesheet") is None
+
+
+def test_get_profile_accepts_names_dicts_and_profiles():
+    profile = BlockingProfile(resource_types=["font"])
+    assert get_profile(profile) is profile
+    assert get_profile({"resource_types": ["font"]}).match("https://a.example/f.woff2", "font") == "font"
+    assert get_profile("none").match("https://a.example/f.woff2", "font") is None
+    assert set(PROFILES) >= {"none", "no_media", "no_tracking", "lean", "text_only"}
+    with pytest.raises(ValueError, match="Unknown blocking profile 'heavy'"):
+        get_profile("heavy")
+
+
+def test_stats_count_blocked_requests_by_reason():
+    stats = BlockingStats()
+    assert stats.summary() is None
+    stats.record(None)
+    stats.record("image")
+    stats.record("domain")
+    stats.record("image")
+    assert stats.as_dict() == {"allowed": 1, "blocked": 3, "by_reason": {"image": 2, "domain": 1}}
+    assert stats.summary() == "🚫 Blocked 3/4 requests (domain=1, image=2)"
+    stats.reset()
+    assert stats.as_dict()["blocked"] == 0
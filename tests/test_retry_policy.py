@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+import retry_policy
+from retry_policy import (FATAL, RETRYABLE, CircuitBreaker, CircuitOpenError, Deadline,
+                          DeadlineExceeded, RetryPolicy, classify, is_site_failure)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry_policy, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.mark.parametrize("error, expected", [
+    (TimeoutError("Timeout 5000ms exceeded"), RETRYABLE),
+    (Exception("net::ERR_CONNECTION_RESET"), RETRYABLE),
+    (Exception("'#a[' is not a valid selector"), FATAL),
+    (Exception("Target closed"), FATAL),
+    (Exception("net::ERR_NAME_NOT_RESOLVED at https://nope.invalid"), FATAL),
+    (ValueError("Missing 'selector'"), FATAL),
+    (DeadlineExceeded("budget"), FATAL),
+    (CircuitOpenError("open"), FATAL),
+])
+def test_classify(error, expected):
+    assert classify(error) == expected
+
+
+def test_site_failures():
+    assert is_site_failure(Exception("net::ERR_TIMED_OUT"), "_click_impl")
+    assert is_site_failure(TimeoutError("slow"), "_open_impl")
+    assert not is_site_failure(TimeoutError("slow"), "_click_impl")
+    assert not is_site_failure(Exception("'#a[' is not a valid selector"), "_open_impl")
+
+
+@pytest.mark.parametrize("jitter", RetryPolicy.JITTERS)
+def test_backoff_stays_within_ceiling(jitter):
+    policy = RetryPolicy(base_delay=0.5, max_delay=3, multiplier=2, jitter=jitter)
+    for attempt, ceiling in ((1, 0.5), (2, 1), (3, 2), (4, 3), (10, 3)):
+        for _ in range(50):
+            delay = policy.backoff(attempt)
+            floor = {"full": 0, "equal": ceiling / 2, "none": ceiling}[jitter]
+            assert floor <= delay <= ceiling
+
+
+def test_overrides_and_validation():
+    policy = RetryPolicy(max_attempts=5).with_overrides({"jitter": "none", "step_deadline": 10})
+    assert policy.as_dict() == {"max_attempts": 5, "base_delay": 0.5, "max_delay": 8.0,
+                                "multiplier": 2.0, "jitter": "none", "step_deadline": 10}
+    assert policy.with_overrides(None) is policy
+    with pytest.raises(ValueError, match="Unknown retry option"):
+        RetryPolicy.from_dict({"retries": 3})
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(ValueError, match="Unknown jitter"):
+        RetryPolicy(jitter="random")
+
+
+def test_deadline(clock):
+    first, second = Deadline(5), Deadline(2)
+    assert Deadline.earliest(None, first, second) is second
+    assert Deadline.earliest(None) is None
+    clock[0] += 3
+    assert second.expired() and second.remaining() == 0.0
+    assert first.remaining() == 2
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    assert breaker.check("https://a.example") is None
+    breaker.record_failure("https://a.example")
+    breaker.record_success("https://a.example")   # success resets the count
+    breaker.record_failure("https://a.example")
+    assert breaker.state("https://a.example") == "closed"
+    breaker.record_failure("https://a.example")
+    assert breaker.state("https://a.example") == "open"
+    with pytest.raises(CircuitOpenError, match="failing fast"):
+        breaker.check("https://a.example")
+    assert breaker.check("https://b.example") is None
+    assert breaker.check(None) is None
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure("o")
+    clock[0] += 10
+    assert breaker.state("o") == "half-open"
+    probe = breaker.check("o")
+    assert probe is not None and breaker.state("o") == "probing"
+    with pytest.raises(CircuitOpenError, match="trial call in flight"):
+        breaker.check("o")
+
+    breaker.record_failure("o")   # failed probe - open again
+    assert breaker.state("o") == "open"
+    clock[0] += 10
+    breaker.check("o")
+    breaker.record_success("o")
+    assert breaker.state("o") == "closed" and breaker.check("o") is None
+
+
+def test_end_probe_releases_only_its_own_token(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure("o")
+    clock[0] += 10
+    stale = breaker.check("o")
+    clock[0] += 10   # probe never reported back - another call may try
+    fresh = breaker.check("o")
+    breaker.end_probe("o", stale)
+    with pytest.raises(CircuitOpenError):
+        breaker.check("o")
+    breaker.end_probe("o", fresh)
+    assert breaker.check("o") is not None
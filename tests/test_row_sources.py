@@ -0,0 +1,54 @@
+import pytest
+
+from row_sources import BadRow, iter_rows
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"q": "a", "n": 1}\n\n{"q": "b", "n": 2}\n{"q": "c", "n": 3}\n', encoding="utf-8")
+    return path
+
+
+def test_csv_rows(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("q,n\nshoes,1\n\"a, b\",2\n", encoding="utf-8")
+    assert list(iter_rows(path)) == [{"q": "shoes", "n": "1"}, {"q": "a, b", "n": "2"}]
+
+
+def test_jsonl_rows_keep_types_and_skip_blank_lines(jsonl):
+    assert [row["n"] for row in iter_rows(jsonl)] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("offset, limit, expected", [
+    (0, None, ["a", "b", "c"]),
+    (1, None, ["b", "c"]),
+    (1, 1, ["b"]),
+    (0, 0, []),
+    (5, 2, []),
+])
+def test_offset_and_limit(jsonl, offset, limit, expected):
+    assert [row["q"] for row in iter_rows(jsonl, offset, limit)] == expected
+
+
+def test_rows_are_read_lazily(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"q": "a"}\n', encoding="utf-8")
+    rows = iter_rows(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"q": "b"}\n')   # appended after the first read is still picked up
+    assert [row["q"] for row in rows] == ["a", "b"]
+
+
+def test_bad_jsonl_lines_are_yielded_as_bad_rows(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"q": "a"}\n[1, 2]\n{"q": \n{"q": "d"}\n', encoding="utf-8")
+    rows = list(iter_rows(path))
+    assert rows[0] == {"q": "a"} and rows[3] == {"q": "d"}
+    assert isinstance(rows[1], BadRow) and "rows.jsonl:2: each line must be a JSON object" in str(rows[1])
+    assert isinstance(rows[2], BadRow) and "rows.jsonl:3: invalid JSON" in str(rows[2])
+
+
+def test_unsupported_source(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported row source"):
+        iter_rows(tmp_path / "rows.xlsx")
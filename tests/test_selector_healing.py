@@ -0,0 +1,38 @@
+import pytest
+
+from selector_healing import SelectorCache, needs_locator_probe
+
+
+@pytest.mark.parametrize("candidate, locator_only", [
+    ("#buy", False),
+    ("input[name=q]", False),
+    ("li:nth-child(2) > a", False),
+    ("css=.buy", False),
+    ("xpath=//button", False),
+    ("//button[@type='submit']", False),
+    ("text=Buy now", True),
+    ("role=button[name='Buy']", True),
+    ("data-testid=buy", True),
+    ('"Buy now"', True),
+    ("button:has-text('Buy')", True),
+    ("#cart >> text=Checkout", True),
+    ("button:visible", True),
+])
+def test_needs_locator_probe(candidate, locator_only):
+    assert needs_locator_probe(["#fallback", candidate]) is locator_only
+
+
+def test_cache_moves_winner_first_and_counts_heals(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = SelectorCache(path)
+    candidates = ["#buy", "text=Buy"]
+    assert cache.order("https://a.example", candidates) == candidates
+
+    cache.record("https://a.example", candidates, "text=Buy")
+    assert cache.healed == 1
+    reloaded = SelectorCache(path)
+    assert reloaded.order("https://a.example", candidates) == ["text=Buy", "#buy"]
+    assert reloaded.order("https://b.example", candidates) == candidates
+    reloaded.record("https://a.example", candidates, "text=Buy")
+    assert reloaded.hits == 1
+    assert reloaded.summary().startswith("🩹 Selectors: 1 resolved")
@@ -0,0 +1,84 @@
+import json
+import time
+
+import pytest
+
+from action_runner import run_actions
+from metrics import new_timings
+from storage_snapshots import SnapshotStore
+
+STATE = {"cookies": [{"name": "sid", "value": "abc", "domain": "a.example", "path": "/"}],
+         "origins": [{"origin": "https://a.example", "localStorage": [{"name": "k", "value": "v"}]}]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(tmp_path / "snapshots", default_ttl=60)
+
+
+def test_saved_state_loads_and_is_shared(store):
+    path = store.save_state("login", STATE, guard_selector="#login")
+    assert json.load(open(path))["ttl"] == 60
+    first = store.load("login")
+    assert first == STATE
+    assert store.load("login") is first   # parsed once, shared by every reader
+    assert store.guard_selector("login") == "#login"
+    store.save_state("login", {"cookies": [], "origins": []})
+    assert store.load("login") == {"cookies": [], "origins": []}   # a new save replaces the cached copy
+
+
+def test_expired_and_missing_snapshots_load_as_none(store):
+    for name, ttl in (("short", 10), ("forever", 0)):
+        path = store.save_state(name, STATE, ttl=ttl)
+        with open(path) as f:
+            record = json.load(f)
+        record["saved_at"] = time.time() - 11
+        with open(path, "w") as f:
+            json.dump(record, f)
+    assert store.load("short") is None
+    assert store.load("forever") == STATE
+    assert store.load("never-saved") is None and store.guard_selector("never-saved") is None
+
+
+def test_corrupt_snapshot_loads_as_none(store):
+    (store.path / "broken.json").write_text("{not json")
+    assert store.load("broken") is None
+
+
+def test_invalidate(store):
+    store.save_state("login", STATE)
+    store.load("login")
+    store.invalidate("login")
+    assert store.load("login") is None
+    store.invalidate("login")   # already gone - no error
+
+
+@pytest.mark.parametrize("name", ["", "../escape", "a/b", ".hidden", "c\\d"])
+def test_invalid_names(store, name):
+    with pytest.raises(ValueError, match="Invalid snapshot name"):
+        store.save_state(name, STATE)
+
+
+class FakeEngine:
+    def __init__(self, active_snapshot):
+        self.active_snapshot = active_snapshot
+        self.timings = new_timings()
+        self.clicked = []
+
+    def open(self, url, wait_until="networkidle"):
+        pass
+
+    def click(self, selector):
+        self.clicked.append(selector)
+
+
+@pytest.mark.parametrize("active_snapshot, clicked", [("login", ["#home"]), (None, ["#login", "#home"])])
+def test_login_steps_are_skipped_when_started_from_the_snapshot(active_snapshot, clicked):
+    engine = FakeEngine(active_snapshot)
+    result = run_actions(engine, [
+        {"action": "open", "url": "https://a.example/"},
+        {"action": "click", "selector": "#login", "skip_if_session": "login"},
+        {"action": "click", "selector": "#home"},
+    ], metrics=None)
+    assert result.passed and result.last_completed_step == 3
+    assert engine.clicked == clicked
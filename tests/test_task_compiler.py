@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from action_runner import HANDLERS
+from task_compiler import (TaskValidationError, WAIT_ACTIONS, compile_task, compile_template,
+                           validate_step)
+
+TASK = [
+    {"action": "open", "url": "https://example.com"},
+    {"action": "wait", "seconds": 2},
+    {"action": "click", "selector": "#go"},
+]
+
+
+def test_valid_task_compiles_to_plan():
+    plan = compile_task(TASK)
+    assert [compiled.action for compiled in plan] == ["open", "wait", "click"]
+    assert [compiled.index for compiled in plan] == [1, 2, 3]
+    assert plan[2].handler is HANDLERS["click"]
+
+
+def test_every_problem_is_reported():
+    task = [
+        {"action": "open"},
+        {"action": "teleport"},
+        {"action": "wait", "seconds": "2"},
+        {"selector": "#x"},
+    ]
+    with pytest.raises(TaskValidationError) as excinfo:
+        compile_task(task)
+    assert excinfo.value.problems == [
+        "[Step 1] 'open' missing 'url'",
+        "[Step 2] unknown action 'teleport'",
+        "[Step 3] 'seconds' must be a number, got '2'",
+        "[Step 4] missing 'action' key",
+    ]
+
+
+@pytest.mark.parametrize("step, problem", [
+    ({"action": "scroll_pixels", "pixels": 0}, None),
+    ({"action": "scroll_to"}, "'scroll_to' needs one of 'selector', 'pixels'"),
+    ({"action": "click", "selector": []}, "'selector' candidates must be a non-empty list of selector strings"),
+    ({"action": "wait", "until": "forever"}, "unknown wait condition 'forever'"),
+    ({"action": "wait", "until": "selector"}, "until='selector' needs a 'selector'"),
+    ({"action": "open", "url": "/", "wait_until": "idle"}, "unknown wait_until 'idle'"),
+    ({"action": "click", "selector": "#a", "retry": {"max_attempts": 0}}, "bad 'retry': 'max_attempts' must be >= 1"),
+    ({"action": "click", "selector": "#a", "retry": {"tries": 2}}, "bad 'retry': Unknown retry option(s): tries"),
+    ({"action": "intercept_request", "url_pattern": "**/api/*", "mode": "network"}, None),
+    ({"action": "intercept_request", "url_pattern": "**/api/*", "mode": "pass"}, "unknown intercept mode 'pass'"),
+    ({"action": "pdf"}, "'pdf' is not implemented by the engines"),
+    ({"action": "set_geolocation", "latitude": 0, "longitude": 0}, "'set_geolocation' is not implemented by the engines"),
+    ({"action": "expect_screenshot", "selector": "#c", "filename": "c.png", "ignore": ".ts"}, None),
+    ({"action": "expect_screenshot", "selector": "#c", "filename": "c.png", "ignore": 5},
+     "'ignore' must be a list of selectors and/or [x, y, w, h] boxes, got 5"),
+    ({"action": "expect_screenshot", "selector": "#c", "filename": "c.png", "ignore": [[0, 0, "w", 1]]},
+     "ignore entries must be selectors or [x, y, w, h], got [0, 0, 'w', 1]"),
+])
+def test_validate_step(step, problem):
+    problems = validate_step(step, HANDLERS)
+    assert (problem in problems) if problem else not problems
+
+
+def test_parallel_is_rejected_by_sync_handlers():
+    step = {"action": "parallel", "branches": {"a": [{"action": "wait"}]}}
+    problems = validate_step(step, HANDLERS)
+    assert len(problems) == 1 and "async_action_runner" in problems[0]
+
+
+def test_plan_cache_returns_same_plan():
+    plan = compile_task(TASK)
+    assert compile_task([dict(step) for step in TASK]) is plan
+    assert compile_task(plan) is plan
+    # Another handler table compiles its own plan
+    assert compile_task(TASK, dict(HANDLERS)) is not plan
+
+
+def test_plan_is_immutable():
+    plan = compile_task(TASK)
+    with pytest.raises(AttributeError):
+        plan.steps = ()
+    with pytest.raises(AttributeError):
+        plan[0].action = "click"
+    with pytest.raises(TypeError):
+        plan[0].step["url"] = "https://other.example"
+
+
+def test_nested_step_values_are_frozen():
+    task = [{"action": "extract", "fields": {"title": "h1"}},
+            {"action": "expect_screenshot", "selector": "#c", "filename": "c.png", "ignore": ".ts"}]
+    plan = compile_task(task)
+    fields = plan[0].step["fields"]
+    with pytest.raises(TypeError):
+        fields["price"] = ".price"
+    assert fields == {"title": "h1"} and json.dumps(fields) == '{"title": "h1"}'
+    # one selector is normalized to a one-entry tuple, not masked character by character
+    assert plan[1].step["ignore"] == (".ts",)
+    # the plan holds a copy - editing the task afterwards doesn't leak into it
+    task[0]["fields"]["price"] = ".price"
+    assert "price" not in plan[0].step["fields"]
+
+
+def test_smart_wait_targets_next_selector():
+    plan = compile_task(TASK)
+    wait = plan[1]
+    assert wait.action in WAIT_ACTIONS
+    assert dict(wait.smart_step) == {"action": "wait", "seconds": 2, "until": "selector", "selector": "#go"}
+    assert plan[2].smart_step is plan[2].step
+
+
+def test_template_renders_rows():
+    template = compile_template([
+        {"action": "open", "url": "https://example.com/{{ slug }}"},
+        {"action": "wait", "seconds": "{{delay}}"},
+        {"action": "type", "selector": "#q", "text": "{{query}}"},
+        {"action": "click", "selector": "#go"},
+    ])
+    assert template.columns == {"slug", "delay", "query"}
+
+    plan = template.render({"slug": "a b", "delay": "1.5", "query": "shoes"})
+    assert plan[0].step["url"] == "https://example.com/a b"
+    assert plan[1].step["seconds"] == 1.5
+    assert plan[2].step["text"] == "shoes"
+    # Untemplated steps are shared with the compiled template
+    assert plan[3] is template.plan[3]
+    assert template.render({"slug": "b", "delay": 1, "query": "hats"}).digest != plan.digest
+
+
+def test_template_rejects_bad_rows():
+    template = compile_template([{"action": "wait", "seconds": "{{delay}}"}])
+    with pytest.raises(TaskValidationError, match="no value for 'delay'"):
+        template.render({})
+    with pytest.raises(TaskValidationError, match="'seconds' must be a number"):
+        template.render({"delay": "soon"})
+
+
+def test_template_without_placeholders_reuses_plan():
+    template = compile_template(TASK)
+    assert template.render({"anything": 1}) is template.plan
+
+
+def test_template_action_cannot_be_placeholder():
+    with pytest.raises(TaskValidationError, match="'action' cannot be a placeholder"):
+        compile_template([{"action": "{{verb}}", "selector": "#a"}])
@@ -0,0 +1,113 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import trace_recorder
+from run_result import RunResult
+from task_compiler import compile_task
+from trace_recorder import TraceRecorder
+
+PLAN = compile_task([{"action": "open", "url": "https://a.example/"}, {"action": "click", "selector": "#buy"}])
+
+
+class FakeTracing:
+    def __init__(self):
+        self.calls = []
+
+    def start(self, **options):
+        self.calls.append(("start", options))
+
+    def start_chunk(self, title=None):
+        self.calls.append(("start_chunk", title))
+
+    def stop_chunk(self, path=None):
+        self.calls.append(("stop_chunk", path))
+        if path:
+            Path(path).write_bytes(b"x" * 2048)
+
+    def stop(self):
+        self.calls.append(("stop",))
+
+
+class FakeVideo:
+    def __init__(self):
+        self.saved = []
+        self.deleted = False
+
+    def save_as(self, path):
+        Path(path).write_bytes(b"v" * 100)
+        self.saved.append(path)
+
+    def delete(self):
+        self.deleted = True
+
+
+def result(failed_step=None):
+    run = RunResult(total_steps=len(PLAN))
+    if failed_step:
+        run.fail(failed_step, TimeoutError("slow"))
+    return run
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = TraceRecorder(tmp_path / "traces")
+    recorder.attach(SimpleNamespace(tracing=FakeTracing()))
+    return recorder
+
+
+def test_failed_run_is_kept_and_named_after_the_step(recorder):
+    recorder.begin("run-abcdef123")
+    path = recorder.finish(result(failed_step=2), PLAN)
+    assert path.endswith("_run-abcd_fail-step2-click.zip") and Path(path).exists()
+    assert recorder._context.tracing.calls[-2:] == [("start_chunk", "run-abcdef123"), ("stop_chunk", path)]
+    assert recorder.last_run["retained"] and recorder.last_run["bytes_written"] == 2048
+    assert recorder.stats()["retained"] == 1 and recorder.stats()["bytes_written"] == 2048
+
+
+def test_passing_runs_are_discarded_unless_sampled(recorder, monkeypatch):
+    recorder.sample_rate = 0.25
+    draws = iter([0.9, 0.1])
+    monkeypatch.setattr(trace_recorder.random, "random", lambda: next(draws))
+    recorder.begin("run-1")
+    assert recorder.finish(result(), PLAN) is None
+    assert recorder._context.tracing.calls[-1] == ("stop_chunk", None)   # chunk dropped, nothing written
+    recorder.begin("run-2")
+    kept = recorder.finish(result(), PLAN)
+    assert kept.endswith("_passed.zip")
+    stats = recorder.stats()
+    assert stats["runs"] == 2 and stats["retained"] == 1 and stats["discarded"] == 1
+    assert recorder.summary().startswith("🎞️ Tracing: 1/2 runs retained (sample 25%)")
+
+
+def test_finish_without_begin_is_a_no_op(recorder):
+    assert recorder.finish(result(failed_step=1), PLAN) is None
+    assert recorder.stats()["runs"] == 0 and recorder.summary() is None
+
+
+def test_sample_rate_is_validated(tmp_path):
+    with pytest.raises(ValueError, match="between 0 and 1"):
+        TraceRecorder(tmp_path, sample_rate=1.5)
+
+
+def test_session_video_is_kept_only_after_a_retained_run(tmp_path):
+    recorder = TraceRecorder(tmp_path / "traces", trace=False, video=True)
+    assert recorder.context_options() == {"record_video_dir": str(recorder.video_buffer)}
+    videos = [FakeVideo(), FakeVideo()]
+    closed = []
+    engine = SimpleNamespace(context=SimpleNamespace(pages=[SimpleNamespace(video=video) for video in videos],
+                                                     close=lambda: closed.append(True)))
+    recorder.begin("run-1")
+    recorder.finish(result(failed_step=1), PLAN)
+    kept = recorder.close(engine)
+    assert closed == [True]
+    assert kept.endswith("_fail-step1-open_1.webm")
+    assert [len(video.saved) for video in videos] == [1, 1] and all(video.deleted for video in videos)
+
+    dropped = [FakeVideo()]
+    engine.context.pages = [SimpleNamespace(video=dropped[0])]
+    recorder.begin("run-2")
+    recorder.finish(result(), PLAN)
+    assert recorder.close(engine) is None
+    assert dropped[0].saved == [] and dropped[0].deleted
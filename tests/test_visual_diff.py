@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import visual_diff
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture(autouse=True)
+def with_numpy(monkeypatch):
+    # visual_diff only binds numpy when Pillow imports too; diff_mask needs numpy alone
+    monkeypatch.setattr(visual_diff, "np", np)
+
+
+def frame(height=4, width=6, value=100):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_diff_mask_tolerance():
+    baseline, actual = frame(), frame()
+    actual[0, 0] = (110, 100, 100)   # exactly at tolerance - not different
+    actual[1, 1] = (100, 89, 100)
+    actual[2, 2] = (0, 0, 0)
+    mask = visual_diff.diff_mask(baseline, actual, tolerance=10)
+    assert mask.dtype == bool and mask.shape == (4, 6)
+    assert [tuple(p) for p in np.argwhere(mask)] == [(1, 1), (2, 2)]
+
+
+def test_diff_mask_handles_uint8_wraparound():
+    mask = visual_diff.diff_mask(frame(value=0), frame(value=255), tolerance=254)
+    assert mask.all()
+
+
+def test_ignore_regions_are_clipped():
+    mask = visual_diff.diff_mask(frame(), frame(value=0), tolerance=0,
+                                 ignore_regions=[(4, 2, 10, 10), (-3, -3, 4, 4), (9, 9, 2, 2)])
+    assert mask.sum() == 24 - 4 - 1
+    assert not mask[2:, 4:].any() and not mask[0, 0]
+
+
+def test_missing_dependencies(monkeypatch):
+    monkeypatch.setattr(visual_diff, "np", None)
+    with pytest.raises(RuntimeError, match="numpy and Pillow"):
+        visual_diff.diff_mask(frame(), frame())
+
+
+def test_compare_png_bytes(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(visual_diff, "Image", Image)
+
+    def png(array):
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    baseline, actual = frame(), frame()
+    actual[0, :3] = 0
+    ratio, mask, decoded = visual_diff.compare(png(baseline), png(actual))
+    assert ratio == pytest.approx(3 / 24)
+    assert (decoded == actual).all()
+
+    assert visual_diff.compare(png(baseline), png(frame(height=5)))[:2] == (1.0, None)
+    path = visual_diff.write_diff_image(str(tmp_path / "diff.png"), decoded, mask)
+    assert tuple(np.asarray(Image.open(path))[0, 0]) == (255, 0, 0)
@@ -0,0 +1,150 @@
+import os
+import random
+import time
+from pathlib import Path
+
+from process_stats import process_tree_cpu_seconds, process_tree_rss_mb
+
+
+class TraceRecorder:
+    """
+    Retain-on-failure tracing for PlaywrightEngine(trace_recorder=...).
+
+    Tracing runs for the whole context; every run_actions call records into its
+    own trace chunk, which is thrown away when the run passes and written to
+    traces/ when it fails (or for `sample_rate` of passing runs). Artifacts are
+    named after the failing step, e.g. trace_<time>_<run>_fail-step4-click.zip.
+
+    video=True also records the page (engine-owned contexts only). Playwright
+    finishes a video only when its page closes, so a video covers the engine's
+    whole session and is kept at quit() if any of its runs was retained.
+
+    CPU time and RSS of this process tree (Python, Playwright driver, Chromium),
+    time spent in tracing calls and bytes written are tracked per run - compare
+    against trace=False (measurement only) to tune sample_rate.
+    """
+    def __init__(self, path="traces", sample_rate=0.0, trace=True, video=False,
+                 screenshots=True, snapshots=True, sources=False):
+        if not 0.0 <= sample_rate <= 1.0: raise ValueError("'sample_rate' must be between 0 and 1")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.trace = trace
+        self.video = video
+        self.video_buffer = self.path / ".video_buffer"
+        self.trace_options = {"screenshots": screenshots, "snapshots": snapshots, "sources": sources}
+        self._context = None
+        self._run = None
+        self._video_tag = None   # set once a run asks for the session video to be kept
+        self.last_run = None     # overhead numbers of the most recent run
+        self.totals = {"runs": 0, "retained": 0, "discarded": 0, "bytes_written": 0,
+                       "tracing_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": 0.0}
+
+    def attach(self, context):
+        """Start context-level tracing - chunks are cut per run by begin/finish"""
+        self._context = context
+        if self.trace:
+            context.tracing.start(**self.trace_options)
+            if self._run is not None:
+                # Context replaced mid-run (record_video) - keep cutting this run's chunk
+                context.tracing.start_chunk(title=self._run["run_id"])
+
+    def context_options(self):
+        """Extra new_context() options the engine should use"""
+        if not self.video:
+            return {}
+        self.video_buffer.mkdir(parents=True, exist_ok=True)
+        return {"record_video_dir": str(self.video_buffer)}
+
+    def begin(self, run_id):
+        started = time.perf_counter()
+        if self.trace and self._context is not None:
+            self._context.tracing.start_chunk(title=run_id)
+        self._run = {
+            "run_id": run_id,
+            "tracing_seconds": time.perf_counter() - started,
+            "cpu_start": process_tree_cpu_seconds([os.getpid()]),
+        }
+
+    def finish(self, result, plan):
+        """Keep or drop this run's chunk - returns the retained artifact path, or None"""
+        run = self._run
+        if run is None:
+            return None
+        self._run = None
+        if result.passed:
+            keep = random.random() < self.sample_rate
+            tag = "passed"
+        else:
+            keep = True
+            action = plan[result.failed_step - 1].action if result.failed_step else "setup"
+            tag = f"fail-step{result.failed_step}-{action}"
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}_{run['run_id'][:8]}_{tag}"
+
+        path = None
+        started = time.perf_counter()
+        if self.trace and self._context is not None:
+            if keep:
+                path = str(self.path / f"trace_{stem}.zip")
+                self._context.tracing.stop_chunk(path=path)
+            else:
+                self._context.tracing.stop_chunk()   # no path - the chunk is discarded
+        run["tracing_seconds"] += time.perf_counter() - started
+        if keep and self.video:
+            self._video_tag = stem
+
+        cpu_end = process_tree_cpu_seconds([os.getpid()])
+        cpu = cpu_end - run["cpu_start"] if cpu_end is not None and run["cpu_start"] is not None else 0.0
+        rss = process_tree_rss_mb([os.getpid()]) or 0.0
+        size = os.path.getsize(path) if path and os.path.exists(path) else 0
+        self.last_run = {"retained": keep, "artifact": path, "bytes_written": size, "cpu_seconds": cpu,
+                         "rss_mb": rss, "tracing_seconds": run["tracing_seconds"]}
+        totals = self.totals
+        totals["runs"] += 1
+        totals["retained" if keep else "discarded"] += 1
+        totals["bytes_written"] += size
+        totals["tracing_seconds"] += run["tracing_seconds"]
+        totals["cpu_seconds"] += cpu
+        totals["peak_rss_mb"] = max(totals["peak_rss_mb"], rss)
+        print(f"🎞️ Trace {'retained → ' + path if path else ('retained' if keep else 'discarded')}"
+              f" | tracing {run['tracing_seconds'] * 1000:.0f}ms, CPU {cpu:.2f}s, RSS {rss:.0f} MB"
+              f"{f', {size / 1024:.0f} KB written' if size else ''}")
+        return path
+
+    def close(self, engine):
+        """At engine quit: stop tracing, then keep or delete the session video"""
+        if self.trace and self._context is not None:
+            try:
+                self._context.tracing.stop()
+            except Exception as e:
+                print(f"⚠️ Could not stop tracing: {e}")
+        self._context = None
+        videos = [page.video for page in engine.context.pages if page.video]
+        if not videos:
+            return None
+        engine.context.close()   # a video is only complete once its page has closed
+        kept = None
+        for idx, video in enumerate(videos):
+            if self._video_tag:
+                kept = str(self.path / f"video_{self._video_tag}{f'_{idx}' if idx else ''}.webm")
+                video.save_as(kept)
+                self.totals["bytes_written"] += os.path.getsize(kept)
+            video.delete()
+        self._video_tag = None
+        return kept
+
+    def stats(self):
+        totals = dict(self.totals)
+        runs = totals["runs"] or 1
+        totals["sample_rate"] = self.sample_rate
+        totals["tracing_ms_per_run"] = totals["tracing_seconds"] / runs * 1000
+        totals["cpu_seconds_per_run"] = totals["cpu_seconds"] / runs
+        return totals
+
+    def summary(self):
+        s = self.stats()
+        if not s["runs"]:
+            return None
+        return (f"🎞️ Tracing: {s['retained']}/{s['runs']} runs retained (sample {self.sample_rate:.0%}), "
+                f"{s['bytes_written'] / (1024 * 1024):.1f} MB written, {s['tracing_ms_per_run']:.0f} ms tracing "
+                f"and {s['cpu_seconds_per_run']:.2f}s CPU per run, peak RSS {s['peak_rss_mb']:.0f} MB")
@@ -0,0 +1,57 @@
+import io
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+    Image = None
+
+
+def _require():
+    if np is None:
+        raise RuntimeError("expect_screenshot needs numpy and Pillow: pip install numpy pillow")
+
+
+def decode(data):
+    """RGB uint8 array (H, W, 3) from PNG/JPEG bytes"""
+    _require()
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+def diff_mask(baseline, actual, tolerance=10, ignore_regions=()):
+    """
+    Boolean (H, W) mask of pixels whose largest channel difference exceeds
+    `tolerance` (0-255). ignore_regions are (x, y, width, height) boxes in
+    image pixels that never count as different.
+    """
+    _require()
+    delta = np.abs(baseline.astype(np.int16) - actual.astype(np.int16)).max(axis=2)
+    mask = delta > tolerance
+    height, width = mask.shape
+    for x, y, w, h in ignore_regions:
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x + w), width), min(int(y + h), height)
+        if x1 > x0 and y1 > y0:
+            mask[y0:y1, x0:x1] = False
+    return mask
+
+
+def compare(baseline_bytes, actual_bytes, tolerance=10, ignore_regions=()):
+    """(ratio of differing pixels, mask, actual array) - ratio 1.0 on a size mismatch"""
+    baseline = decode(baseline_bytes)
+    actual = decode(actual_bytes)
+    if baseline.shape != actual.shape:
+        return 1.0, None, actual
+    mask = diff_mask(baseline, actual, tolerance, ignore_regions)
+    return float(mask.mean()), mask, actual
+
+
+def write_diff_image(path, actual, mask):
+    """Dimmed actual frame with differing pixels painted red"""
+    _require()
+    out = (actual.astype(np.float32) * 0.35).astype(np.uint8)
+    if mask is not None:
+        out[mask] = (255, 0, 0)
+    Image.fromarray(out).save(path)
+    return path